@@ -0,0 +1,77 @@
+"""
+Micro-benchmark del emparejamiento difuso de conceptos.
+
+Compara el barrido cuadrático original (`fuzzy_match` contra todos los pares)
+con `ConceptMatcher` sobre conceptos de respuestas largas de CoachQuant,
+comprobando que ambos devuelven el mismo solapamiento.
+
+Uso:
+    PYTHONPATH=src python scripts/benchmark_concept_matcher.py --limit 200 --repeat 3
+"""
+import re
+import json
+import time
+import argparse
+
+from unidecode import unidecode
+
+from project.metrics.concept_matcher import ConceptMatcher, fuzzy_match
+
+THRESHOLD = 0.75
+
+
+def concepts_of(text: str):
+    """Aproximación a extract_concepts sin modelos: tokens y bigramas/trigramas de palabras."""
+    tokens = [t for t in re.split(r"[^a-z0-9\-/\.]+", unidecode(text.lower())) if len(t) > 1]
+    phrases = [" ".join(tokens[i:i + n]) for n in (2, 3) for i in range(len(tokens) - n + 1)]
+    return list(dict.fromkeys(tokens + phrases))
+
+
+def quadratic_overlap(c1, c2):
+    return sum(1 for a in c1 if any(fuzzy_match(a, b, THRESHOLD) for b in c2))
+
+
+def load_pairs(path: str, limit: int | None):
+    pairs = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            raw = json.loads(line).get("raw", {})
+            solution, text = raw.get("problem solution", ""), raw.get("problem text", "")
+            if solution and text:
+                # Referencia: enunciado; "respuesta larga": la solución completa
+                pairs.append((concepts_of(text), concepts_of(solution)))
+            if limit and len(pairs) >= limit:
+                break
+    return pairs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Barrido cuadrático vs ConceptMatcher")
+    parser.add_argument("--data", default="src/database/coachquant_all.jsonl")
+    parser.add_argument("--limit", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    pairs = load_pairs(args.data, args.limit)
+    sizes = [len(c2) for _, c2 in pairs]
+    print(f"[Benchmark] {len(pairs)} pares | conceptos por respuesta: media={sum(sizes) / len(sizes):.0f} max={max(sizes)}")
+
+    def run(fn):
+        best, result = float("inf"), None
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            result = [fn(c1, c2) for c1, c2 in pairs]
+            best = min(best, time.perf_counter() - start)
+        return best, result
+
+    t_quad, r_quad = run(quadratic_overlap)
+    t_idx, r_idx = run(lambda c1, c2: ConceptMatcher(c2, THRESHOLD).overlap(c1))
+
+    mismatches = sum(1 for a, b in zip(r_quad, r_idx) if a != b)
+    print(f"  cuadrático:     {t_quad * 1000:.1f} ms")
+    print(f"  ConceptMatcher: {t_idx * 1000:.1f} ms  (x{t_quad / t_idx:.1f})")
+    print(f"  resultados distintos: {mismatches}")
+
+
+if __name__ == "__main__":
+    main()
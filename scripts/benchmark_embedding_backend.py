@@ -0,0 +1,112 @@
+"""
+Benchmark de paridad entre backends de embeddings (torch vs onnx / onnx-int8).
+
+Sobre los pares de CoachQuant (solución completa vs respuesta válida) compara:
+- deriva de la similitud coseno del modelo de puntuación y del de recuperación,
+- deriva de `final_score` de `evaluate_many` y cambios de banda de progresión (0.45 / 0.85),
+- throughput de `encode` en cada backend.
+
+Uso:
+    PYTHONPATH=src python scripts/benchmark_embedding_backend.py --backend onnx-int8 --limit 200
+"""
+import os
+import json
+import time
+import argparse
+
+import numpy as np
+from dotenv import load_dotenv
+
+from project.model_registry import get_sentence_transformer, retrieval_model_name, scoring_model_name
+
+load_dotenv()
+
+
+def load_pairs(path: str, limit: int | None):
+    """(pregunta, solución, respuesta válida) de cada problema del JSONL de CoachQuant."""
+    triples = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            raw = json.loads(line).get("raw", {})
+            question = raw.get("problem text", "")
+            solution = raw.get("problem solution", "")
+            answer = raw.get("valid answer", "")
+            if question and solution and answer:
+                triples.append((question, solution, str(answer)))
+            if limit and len(triples) >= limit:
+                break
+    return triples
+
+
+def cosine_scores(model_name: str, backend: str, left, right, batch_size: int):
+    model = get_sentence_transformer(model_name, backend=backend)
+    texts = list(dict.fromkeys(left + right))
+    start = time.perf_counter()
+    emb = model.encode(texts, batch_size=batch_size, normalize_embeddings=True, convert_to_numpy=True)
+    elapsed = time.perf_counter() - start
+    index = {t: i for i, t in enumerate(texts)}
+    a = emb[[index[t] for t in left]]
+    b = emb[[index[t] for t in right]]
+    return (a * b).sum(axis=1), len(texts) / elapsed
+
+
+def final_scores(backend: str, pairs):
+    from project.metrics.evaluator import EvaluatorModels, evaluate_many
+
+    os.environ["EMBEDDING_BACKEND"] = backend
+    EvaluatorModels.reload()
+    return np.array([m["final_score"] for m in evaluate_many(pairs)])
+
+
+def band(scores):
+    return np.digitize(scores, [0.45, 0.85])
+
+
+def drift_summary(base, cand):
+    diff = np.abs(np.asarray(base) - np.asarray(cand))
+    return f"media={diff.mean():.5f}  p95={np.percentile(diff, 95):.5f}  max={diff.max():.5f}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Paridad y rendimiento de backends de embeddings")
+    parser.add_argument("--backend", default="onnx-int8", choices=["onnx", "onnx-int8"], help="Backend candidato")
+    parser.add_argument("--baseline", default="torch", help="Backend de referencia")
+    parser.add_argument("--data", default="src/database/coachquant_all.jsonl", help="JSONL de CoachQuant")
+    parser.add_argument("--limit", type=int, default=None, help="Máximo de pares")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--skip-final", action="store_true", help="No calcula la deriva de final_score")
+    args = parser.parse_args()
+
+    triples = load_pairs(args.data, args.limit)
+    if not triples:
+        print(f"No hay pares en {args.data}")
+        return
+    questions = [q for q, _, _ in triples]
+    solutions = [s for _, s, _ in triples]
+    answers = [a for _, _, a in triples]
+    print(f"[Benchmark] {len(triples)} pares de CoachQuant | {args.baseline} vs {args.backend}\n")
+
+    checks = [
+        ("puntuación", scoring_model_name(), solutions, answers),
+        ("recuperación", retrieval_model_name(), questions, solutions),
+    ]
+    for label, model_name, left, right in checks:
+        base, base_tp = cosine_scores(model_name, args.baseline, left, right, args.batch_size)
+        cand, cand_tp = cosine_scores(model_name, args.backend, left, right, args.batch_size)
+        print(f"[{label}] {model_name}")
+        print(f"  deriva coseno:   {drift_summary(base, cand)}")
+        print(f"  throughput:      {args.baseline}={base_tp:.1f} textos/s  {args.backend}={cand_tp:.1f} textos/s"
+              f"  (x{cand_tp / base_tp:.2f})\n")
+
+    if not args.skip_final:
+        pairs = list(zip(solutions, answers))
+        base = final_scores(args.baseline, pairs)
+        cand = final_scores(args.backend, pairs)
+        changed = int((band(base) != band(cand)).sum())
+        print("[final_score] evaluate_many")
+        print(f"  deriva:          {drift_summary(base, cand)}")
+        print(f"  cambios de banda (0.45/0.85): {changed}/{len(pairs)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Benchmark de recuperación: vectorial vs BM25 vs híbrida (RRF) sobre CoachQuant.
+
+Para cada par QA muestreado se consulta con el enunciado (opcionalmente
+recortado a sus primeras palabras) y se cuenta un acierto si alguno de los k
+chunks devueltos pertenece a ese par. Mide recall@k y la latencia por consulta
+de cada modo. Requiere la base ya indexada (./scripts/load_db.sh coachquant).
+
+Uso:
+    PYTHONPATH=src python scripts/benchmark_hybrid_search.py --limit 200 --k 1 3 5 10
+"""
+import re
+import time
+import random
+import argparse
+import statistics
+
+from project.rag.rag import RAG, SEARCH_MODES
+from project.rag.ingestion import _make_splitter
+
+
+def load_queries(rag: RAG, limit: int, query_words: int | None, chunk_size: int, seed: int):
+    """(consulta, textos de los chunks del par) para `limit` pares QA del dataset."""
+    random.seed(seed)
+    splitter = _make_splitter(chunk_size, 128)
+    queries = []
+    for text in rag.read_dataset(max_texts=limit, sample_random=True):
+        match = re.search(r"Pregunta: (.*?)\nRespuesta:", text, re.S)
+        if not match:
+            continue
+        question = match.group(1).strip()
+        if query_words:
+            question = " ".join(question.split()[:query_words])
+        queries.append((question, set(splitter.split_text(text))))
+    return queries
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall@k y latencia de la búsqueda vectorial, BM25 e híbrida")
+    parser.add_argument("--dataset", default="coachquant")
+    parser.add_argument("--limit", type=int, default=200, help="Pares QA a consultar")
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 3, 5, 10])
+    parser.add_argument("--query-words", type=int, default=None, help="Recorta la consulta a N palabras")
+    parser.add_argument("--chunk-size", type=int, default=1024, help="El mismo que al indexar")
+    parser.add_argument("--modes", nargs="+", default=list(SEARCH_MODES), choices=SEARCH_MODES)
+    parser.add_argument("--filters", default=None, help='Filtros de metadatos, p.ej. "firm=citadel, difficulty=Medio"')
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rag = RAG(dataset_type=args.dataset)
+    queries = load_queries(rag, args.limit, args.query_words, args.chunk_size, args.seed)
+    print(f"[Benchmark] {len(queries)} consultas sobre '{args.dataset}' | k={args.k}")
+
+    max_k = max(args.k)
+    # Calentamiento: carga de modelos e índices fuera de la medición
+    for mode in args.modes:
+        rag.hybrid_search(queries[0][0], k=max_k, mode=mode, filters=args.filters)
+
+    for mode in args.modes:
+        hits = {k: 0 for k in args.k}
+        latencies = []
+        for question, relevant in queries:
+            start = time.perf_counter()
+            docs = rag.hybrid_search(question, k=max_k, mode=mode, filters=args.filters)
+            latencies.append((time.perf_counter() - start) * 1000)
+            ranked = [d.page_content for d in docs]
+            for k in args.k:
+                hits[k] += any(chunk in relevant for chunk in ranked[:k])
+        recall = "  ".join(f"R@{k}={hits[k] / len(queries):.3f}" for k in args.k)
+        p95 = statistics.quantiles(latencies, n=20)[-1] if len(latencies) > 1 else latencies[0]
+        print(f"[Benchmark] {mode:8s} {recall}  latencia p50={statistics.median(latencies):.1f}ms p95={p95:.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
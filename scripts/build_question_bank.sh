@@ -0,0 +1,6 @@
+#!/usr/bin/env bash
+# Construye/refresca el banco de preguntas. Uso: ./scripts/build_question_bank.sh coachquant [--rebuild] [--limit N]
+set -euo pipefail
+DATASET="${1:-coachquant}"
+shift || true
+PYTHONPATH=src python -m project.rag.question_bank --dataset "${DATASET}" "$@"
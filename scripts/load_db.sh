@@ -1 +1,6 @@
-python src/project/rag/rag.py
+#!/usr/bin/env bash
+# Crea/actualiza (incremental) la base Chroma. Uso: ./scripts/load_db.sh squad|coachquant|theory [--rebuild] [--sample-size N]
+set -euo pipefail
+DATASET="${1:-squad}"
+shift || true
+PYTHONPATH=src python -m project.rag.rag --dataset "${DATASET}" "$@"
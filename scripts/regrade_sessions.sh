@@ -0,0 +1,4 @@
+#!/usr/bin/env bash
+# Re-evalúa sesiones guardadas (Redis o SQLite local). Uso: ./scripts/regrade_sessions.sh --all [--only-missing] [--dry-run]
+set -euo pipefail
+PYTHONPATH=src python -m project.metrics.regrade "$@"
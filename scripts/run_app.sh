@@ -5,20 +5,24 @@ APP="project.app:app"
 APP_DIR="src"
 HOST="0.0.0.0"
 PORT="8000"
-DEFAULT_WORKERS=1
-REDIS_WORKERS=4
+DEFAULT_WORKERS=4
 
+# Las sesiones se comparten entre workers tanto en Redis como en el backend SQLite local;
+# solo el backend en memoria (SESSION_BACKEND=memory) obliga a un único worker
+if [[ "${SESSION_BACKEND:-auto}" == "memory" ]]; then
+  echo "Using in-memory sessions with one worker"
+  WORKERS=1
 # Match typical redis-server titles like "redis-server *:6379"
-if pgrep -f "redis-server" >/dev/null 2>&1; then
-  echo "Using redis with ${REDIS_WORKERS} workers"
-  WORKERS="${REDIS_WORKERS}"
+elif pgrep -f "redis-server" >/dev/null 2>&1; then
+  WORKERS="${WORKERS:-${DEFAULT_WORKERS}}"
+  echo "Using redis with ${WORKERS} workers"
 else
-  echo "Using one worker"
-  WORKERS="${DEFAULT_WORKERS}"
+  WORKERS="${WORKERS:-${DEFAULT_WORKERS}}"
+  echo "Using local SQLite sessions with ${WORKERS} workers"
 fi
 
 exec uvicorn "${APP}" \
   --app-dir "${APP_DIR}" \
   --host "${HOST}" \
   --port "${PORT}" \
-  --workers "${WORKERS}"
\ No newline at end of file
+  --workers "${WORKERS}"
@@ -1,12 +1,18 @@
 import os
 import json
+import time
 import uuid
+import asyncio
 import logging
+from contextlib import asynccontextmanager
 from typing import Optional, List, Dict
 
+# Inicio del arranque (para el desglose de tiempos por fase)
+_IMPORT_START = time.perf_counter()
+
 # FastAPI
 from fastapi import FastAPI, Request, Form, BackgroundTasks
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
@@ -15,14 +21,22 @@ from dotenv import load_dotenv
 
 # Redis
 import redis
+import redis.asyncio as aioredis
 
 # Project modules
 from project.rag.question_generator import QuestionGenerator
+from project.rag.generator_registry import GeneratorRegistry
 from project.rag.answer_generator import AnswerGenerator
 from project.metrics.feedback_service import FeedbackService
 from project.metrics.explanation_service import ExplanationService
-from project.rag.gemini_rag_service import GeminiTheoryService
-from project.metrics.evaluator import evaluate_full
+from project.rag.theory_service import TheoryService
+from project.rag.question_pool import QuestionPool
+from project.rag.question_bank import question_id
+from project.metrics.evaluation_executor import EvaluationExecutor, EvaluationQueueFull
+from project.llm import get_llm
+from project.model_registry import memory_report
+from project.session_store import create_session_store
+from project.startup import StartupReport
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -32,22 +46,64 @@ BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 load_dotenv()
 
 templates = Jinja2Templates(directory=os.path.join(BASE_DIR, "templates"))
-app = FastAPI()
+
+# Fases del arranque: las de import se miden aquí; las pesadas, en el warm-up en segundo plano
+startup = StartupReport(started=_IMPORT_START)
+startup.record("imports", time.perf_counter() - _IMPORT_START)
+startup.expect("evaluator", "generators")
+
+# Datasets cuyo generador se precarga en el warm-up (el resto, en su primer uso)
+WARMUP_DATASETS = [d.strip() for d in os.getenv("WARMUP_DATASETS", "squad").split(",") if d.strip()]
+
+async def warm_up_models():
+    """Carga en segundo plano los modelos de evaluación, los generadores y la conexión al LLM."""
+    await asyncio.gather(
+        startup.run("evaluator", evaluation_executor.start),
+        startup.run("generators", lambda: asyncio.gather(*(generators.get(d) for d in WARMUP_DATASETS))),
+        startup.run("llm", feedback_service.warm_up, required=False),
+        startup.run("theory_index", theory_service.warm_up, required=False),
+    )
+    startup.log_summary("Warm-up completo" if startup.ready else "Warm-up con errores")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Arranque/parada: la app acepta peticiones enseguida y el warm-up corre en segundo
+    plano (/readyz indica cuándo ha terminado); al parar, cierra los pools.
+    """
+    warm_up = asyncio.create_task(warm_up_models())
+    refiller = asyncio.create_task(question_pool.run_refiller()) if question_pool else None
+    startup.log_summary("Arranque (warm-up en segundo plano)")
+    yield
+    warm_up.cancel()
+    if refiller:
+        refiller.cancel()
+    await get_llm().aclose()
+    await asyncio.to_thread(evaluation_executor.shutdown)
+    if redis_client:
+        await redis_client.aclose()
+
+app = FastAPI(lifespan=lifespan)
 
 # Configuración de Redis
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
-try:
-    redis_client = redis.from_url(REDIS_URL, decode_responses=True)
-    redis_client.ping()
-    logger.info(f"Conectado a Redis en {REDIS_URL}")
-except redis.ConnectionError:
-    logger.warning("No se pudo conectar a Redis. Usando almacenamiento en memoria (NO apto para múltiples workers).")
-    class MockRedis:
-        def __init__(self): self.data = {}
-        def get(self, key): return self.data.get(key)
-        def set(self, key, value): self.data[key] = value
-        def delete(self, key): self.data.pop(key, None)
-    redis_client = MockRedis()
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", "50"))
+with startup.phase("redis"):
+    try:
+        # Comprobación síncrona en el arranque; en los handlers se usa el cliente asíncrono (con pool)
+        with redis.from_url(REDIS_URL) as probe:
+            probe.ping()
+        redis_client = aioredis.from_url(REDIS_URL, decode_responses=True, max_connections=REDIS_MAX_CONNECTIONS)
+        REDIS_AVAILABLE = True
+        logger.info(f"Conectado a Redis en {REDIS_URL}")
+    except redis.ConnectionError:
+        REDIS_AVAILABLE = False
+        logger.warning("No se pudo conectar a Redis. Sesiones en SQLite local (compartido entre workers de esta máquina).")
+        redis_client = None
+
+# Sesiones: Redis si está disponible, si no SQLite (ver SESSION_BACKEND)
+with startup.phase("session_store"):
+    session_store = create_session_store(redis_client)
 
 # CORS config
 app.add_middleware(
@@ -58,12 +114,21 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Inicialización de servicios
-question_generator = QuestionGenerator(dataset_type="squad")
-answer_generator = AnswerGenerator()
-feedback_service = FeedbackService()
-explanation_service = ExplanationService()
-theory_service = GeminiTheoryService()
+# Inicialización de servicios (ligera: los modelos se cargan en el warm-up o en el primer uso)
+with startup.phase("services"):
+    answer_generator = AnswerGenerator()
+    # Un generador (RAG + banco) por dataset, cargado en el primer uso; el dataset va en la sesión
+    generators = GeneratorRegistry.from_env(
+        lambda dataset_type: QuestionGenerator(dataset_type=dataset_type, answer_generator=answer_generator)
+    )
+    feedback_service = FeedbackService()
+    explanation_service = ExplanationService()
+    theory_service = TheoryService()
+    evaluation_executor = EvaluationExecutor.from_env()
+
+    # Pool de preguntas preparadas (solo con Redis real: se comparte entre workers).
+    # Solo rellena datasets ya cargados: cargarlos aquí expulsaría otros generadores (LRU)
+    question_pool = QuestionPool.from_env(redis_client, generators.peek) if REDIS_AVAILABLE else None
 
 # Mount static files
 app.mount("/static", StaticFiles(directory=os.path.join(BASE_DIR, "static")), name="static")
@@ -95,58 +160,65 @@ class HintRequest(BaseModel):
     session_id: str
     question_number: int
 
-# --- HELPERS REDIS ---
-def get_session(session_id: str):
-    """Recupera los datos de la sesión desde Redis."""
-    data = redis_client.get(f"session:{session_id}")
-    return json.loads(data) if data else None
+# --- STREAMING (SSE) ---
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
 
-def save_session(session_id: str, data: dict):
-    """Guarda los datos de la sesión en Redis."""
-    redis_client.set(f"session:{session_id}", json.dumps(data))
-
-def get_answers(session_id: str) -> List[dict]:
-    """Recupera la lista de respuestas de una sesión."""
-    data = redis_client.get(f"answers:{session_id}")
-    return json.loads(data) if data else []
-
-def save_answers(session_id: str, data: List[dict]):
-    """Guarda la lista de respuestas en Redis."""
-    redis_client.set(f"answers:{session_id}", json.dumps(data))
-
-def get_questions_map(session_id: str) -> dict:
-    """Recupera el mapa de preguntas de una sesión."""
-    data = redis_client.get(f"qmap:{session_id}")
-    return json.loads(data) if data else {}
-
-def save_questions_map(session_id: str, data: dict):
-    """Guarda el mapa de preguntas en Redis."""
-    redis_client.set(f"qmap:{session_id}", json.dumps(data))
+def _sse_response(chunks, field: str, on_complete=None) -> StreamingResponse:
+    """
+    Reenvía los fragmentos del LLM como eventos SSE: `delta` por fragmento y `done`
+    con el texto completo (que se pasa a on_complete para persistirlo).
+    """
+    async def events():
+        parts = []
+        try:
+            async for delta in chunks:
+                parts.append(delta)
+                yield _sse("delta", {"text": delta})
+        except Exception as e:
+            logger.error(f"Error en streaming de {field}: {e}")
+            yield _sse("error", {"error": "Error generando contenido"})
+            return
+        text = "".join(parts).strip()
+        if on_complete and text:
+            await on_complete(text)
+        yield _sse("done", {field: text})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 # --- BACKGROUND TASK ---
-def process_evaluation_task(session_id: str, question_number: int, user_answer: str, correct_answer: str):
+async def attach_reference_features(session_id: str, question_number: int, correct_answer: str):
     """
-    Tarea en segundo plano: Ejecuta la evaluación completa y actualiza la respuesta en Redis.
+    Precalcula los features de la respuesta correcta (embedding, conceptos, números,
+    expresión SymPy) y los guarda con la pregunta, para evaluar solo el lado del usuario.
+    """
+    features = await evaluation_executor.reference_features(correct_answer)
+    if features:
+        # Solo si la pregunta sigue siendo la misma (no se ha regenerado mientras tanto)
+        await session_store.set_reference_features(session_id, question_number, correct_answer, features)
+
+async def process_evaluation_task(
+    session_id: str, question_number: int, user_answer: str, correct_answer: str, reference: Optional[dict] = None
+):
+    """
+    Tarea en segundo plano: Ejecuta la evaluación completa (las etapas que quedaron
+    pendientes al decidir la progresión) y actualiza la respuesta en Redis.
     """
     logger.info(f"[Background] Iniciando evaluación avanzada para {session_id} - P{question_number}")
     try:
         # 1. Cálculo pesado con tu nuevo evaluador
-        metrics = evaluate_full(
+        metrics = await evaluation_executor.evaluate_full(
             correct_answer=correct_answer,
-            user_answer=user_answer
+            user_answer=user_answer,
+            reference=reference
         )
         
-        # 2. Actualizar Redis
-        answers = get_answers(session_id)
-        updated = False
-        for ans in answers:
-            if ans["question_number"] == question_number:
-                ans["metrics"] = metrics  # Guardamos como 'metrics' para el frontend
-                updated = True
-                break
-        
-        if updated:
-            save_answers(session_id, answers)
+        # 2. Actualizar solo el campo 'metrics' de la respuesta (lo que lee el frontend)
+        if await session_store.set_answer_field(session_id, question_number, "metrics", metrics):
             logger.info(f"[Background] Métricas guardadas para P{question_number}: {metrics.get('final_score')}")
         else:
             logger.warning(f"[Background] No se encontró respuesta para actualizar P{question_number}")
@@ -176,26 +248,23 @@ async def start_interview(session: InterviewSession):
     """Inicia una nueva sesión de entrevista."""
     session_id = str(uuid.uuid4())
 
-    # Configurar dataset
-    if session.dataset_type != question_generator.dataset_type:
-        try:
-            # Ahora usamos session.total_questions
-            question_generator.set_dataset(session.dataset_type) 
-        except Exception as e:
-            return JSONResponse(status_code=500, content={"error": str(e)})
+    # Carga (solo la primera vez) el generador del dataset; no afecta a otras sesiones
+    try:
+        await generators.get(session.dataset_type)
+    except Exception as e:
+        return JSONResponse(status_code=500, content={"error": str(e)})
 
-    # Inicializar estado en Redis
+    # Inicializar estado de la sesión
     session_data = {
         "total_questions": session.total_questions,
         "current_question": 0,
         "started_at": str(os.times()),
         "dataset_type": session.dataset_type,
         "current_difficulty": session.difficulty_level.title(),
-        "streak_correctas": 0
+        "streak_correctas": 0,
+        "served_questions": []
     }
-    save_session(session_id, session_data)
-    save_answers(session_id, [])
-    save_questions_map(session_id, {})
+    await session_store.create(session_id, session_data)
 
     return JSONResponse({
         "session_id": session_id,
@@ -206,9 +275,9 @@ async def start_interview(session: InterviewSession):
     })
 
 @app.get("/api/interview/question/{session_id}")
-async def get_next_question(session_id: str):
+async def get_next_question(session_id: str, background_tasks: BackgroundTasks):
     """Obtiene la siguiente pregunta para la sesión actual."""
-    session = get_session(session_id)
+    session = await session_store.get(session_id)
     if not session:
         return JSONResponse(status_code=404, content={"error": "Sesión no encontrada"})
 
@@ -218,23 +287,36 @@ async def get_next_question(session_id: str):
 
     try:
         target_level = session.get("current_difficulty", "Facil")
-        raw_question, raw_answer, detected_level = question_generator.generate_single_question_with_answer(
-            target_difficulty=target_level
-        )
-        if not raw_question:
-            raw_question, raw_answer = "Error generando pregunta.", ""
-            detected_level = target_level
+        served = session.get("served_questions", [])
+
+        # 1. Pool de preguntas ya preparadas (una sola operación en Redis)
+        pooled = None
+        if question_pool:
+            pooled = await question_pool.pop(session.get("dataset_type", "squad"), target_level, served)
 
-        clean_question = raw_question
-        clean_answer = answer_generator.clean_answer(raw_answer)
+        if pooled:
+            clean_question, clean_answer, detected_level = pooled["question"], pooled["answer"], pooled["difficulty"]
+        else:
+            # 2. Clasificación + normalización + limpieza en una sola llamada al LLM
+            generator = await generators.get(session.get("dataset_type", "squad"))
+            clean_question, clean_answer, detected_level = await generator.prepare_question(
+                target_difficulty=target_level
+            )
+        served_id = None
+        if not clean_question:
+            clean_question, clean_answer = "Error generando pregunta.", ""
+            detected_level = target_level
+        else:
+            served_id = question_id(clean_question, clean_answer)
 
-        q_map = get_questions_map(session_id)
-        q_map[str(current_q + 1)] = {
+        # Pregunta + served_questions en un solo round trip
+        await session_store.set_question(session_id, current_q + 1, {
             "question_text": clean_question,
             "correct_answer": clean_answer,
             "difficulty": detected_level
-        }
-        save_questions_map(session_id, q_map)
+        }, served_id=served_id)
+        if clean_answer:
+            background_tasks.add_task(attach_reference_features, session_id, current_q + 1, clean_answer)
 
         return JSONResponse({
             "completed": False,
@@ -252,20 +334,32 @@ async def get_next_question(session_id: str):
 @app.post("/api/interview/answer")
 async def save_answer(answer: UserAnswer, background_tasks: BackgroundTasks):
     """Guarda la respuesta del usuario y evalúa el desempeño."""
-    session = get_session(answer.session_id)
+    # Sesión y pregunta en un solo round trip
+    session, q_data = await session_store.get_with_question(answer.session_id, answer.question_number)
     if not session:
         return JSONResponse(status_code=404, content={"error": "Sesión no encontrada"})
 
-    q_map = get_questions_map(answer.session_id)
-    q_data = q_map.get(str(answer.question_number))
+    if answer.question_number != session["current_question"] + 1:
+        return JSONResponse(status_code=409, content={"error": "La respuesta ya se había registrado"})
+
     if not q_data:
         return JSONResponse(status_code=400, content={"error": "Datos de pregunta perdidos"})
 
-    # Evaluamos inline para tener métricas inmediatas
-    metrics_now = evaluate_full(
-        correct_answer=q_data["correct_answer"],
-        user_answer=answer.answer_text
-    )
+    # Evaluamos en el pool de procesos, solo las etapas necesarias para decidir la progresión;
+    # las pendientes (semántica, conceptos) se completan en segundo plano para mostrarlas
+    try:
+        metrics_now = await evaluation_executor.evaluate_progression(
+            correct_answer=q_data["correct_answer"],
+            user_answer=answer.answer_text,
+            reference=q_data.get("reference_features")
+        )
+    except EvaluationQueueFull:
+        logger.warning(f"Evaluador saturado ({evaluation_executor.pending} pendientes)")
+        return JSONResponse(
+            status_code=503,
+            content={"error": "El evaluador está saturado, inténtalo de nuevo en unos segundos"},
+            headers={"Retry-After": "2"},
+        )
 
     new_answer = {
         "question_number": answer.question_number,
@@ -279,11 +373,8 @@ async def save_answer(answer: UserAnswer, background_tasks: BackgroundTasks):
         "metrics": metrics_now
     }
 
-    answers_list = get_answers(answer.session_id)
-    answers_list.append(new_answer)
-    save_answers(answer.session_id, answers_list)
-
     # --- LÓGICA DE PROGRESIÓN DE DIFICULTAD ---
+    # Con etapas pendientes final_score es la cota inferior, que cae en la misma banda que el valor final
     final_score = metrics_now.get("final_score", 0)
     curr_level = session.get("current_difficulty", "Facil")
     streak = session.get("streak_correctas", 0)
@@ -317,12 +408,28 @@ async def save_answer(answer: UserAnswer, background_tasks: BackgroundTasks):
     else:
         logger.info("Última pregunta respondida. No se ajusta dificultad.")
 
-    session["current_difficulty"] = curr_level
-    session["streak_correctas"] = streak
-    session["current_question"] += 1
-    save_session(answer.session_id, session)
+    # Respuesta + progresión + avance de la pregunta en una sola operación atómica: un reenvío
+    # concurrente de la misma respuesta no la duplica ni avanza la sesión dos veces
+    recorded = await session_store.record_answer(
+        answer.session_id,
+        expected_question=session["current_question"],
+        answer=new_answer,
+        session_updates={"current_difficulty": curr_level, "streak_correctas": streak},
+    )
+    if not recorded:
+        return JSONResponse(status_code=409, content={"error": "La respuesta ya se había registrado"})
+
+    if metrics_now.get("pending_stages"):
+        background_tasks.add_task(
+            process_evaluation_task,
+            answer.session_id,
+            answer.question_number,
+            answer.answer_text,
+            q_data["correct_answer"],
+            q_data.get("reference_features"),
+        )
 
-    completed = session["current_question"] >= session["total_questions"]
+    completed = session["current_question"] + 1 >= session["total_questions"]
     
     return JSONResponse({
         "success": True,
@@ -336,13 +443,12 @@ async def get_hint(payload: HintRequest):
     """Genera una pista para la pregunta actual."""
     session_id = payload.session_id
     try:
-        q_map = get_questions_map(session_id)
-        q_data = q_map.get(str(payload.question_number))
+        q_data = await session_store.get_question(session_id, payload.question_number)
 
         if not q_data:
             return JSONResponse(status_code=400, content={"error": "Pregunta no encontrada"})
 
-        hint = answer_generator.generate_hint(
+        hint = await answer_generator.generate_hint(
             question=q_data["question_text"], 
             correct_answer=q_data["correct_answer"]
         )
@@ -357,7 +463,7 @@ async def generate_feedback(payload: dict):
     """Genera feedback detallado sobre la respuesta del usuario."""
     # Pasamos las métricas al servicio de feedback para contextualizar la respuesta
     try:
-        feedback = feedback_service.generate_feedback(
+        feedback = await feedback_service.generate_feedback(
             question=payload.get("question"),
             correct_answer=payload.get("correct_answer"),
             user_answer=payload.get("user_answer"),
@@ -373,52 +479,161 @@ async def generate_explanation(payload: dict):
     session_id = payload.get("session_id")
     question_number = payload.get("question_number")
     
-    answers = get_answers(session_id)
-    target_ans = next((a for a in answers if a["question_number"] == question_number), None)
-    
+    target_ans = await session_store.get_answer(session_id, question_number) if session_id else None
+
     if target_ans and target_ans.get("explanation"):
         return JSONResponse({"explanation": target_ans["explanation"]})
 
     try:
-        explanation = explanation_service.generate_explanation(
+        explanation = await explanation_service.generate_explanation(
             payload.get("question"),
             payload.get("correct_answer")
         )
-        
+
+        # Si otra petición la guardó antes, se conserva esa (la primera gana)
         if target_ans:
-            target_ans["explanation"] = explanation
-            save_answers(session_id, answers)
-            
+            await session_store.set_answer_field(
+                session_id, question_number, "explanation", explanation, only_if_missing=True
+            )
+
         return JSONResponse({"explanation": explanation})
     except Exception as e:
         return JSONResponse(status_code=500, content={"error": str(e)})
 
+@app.post("/api/feedback/stream")
+async def stream_feedback(payload: dict):
+    """Versión SSE de /api/feedback: reenvía el feedback según se genera."""
+    session_id = payload.get("session_id")
+    question_number = payload.get("question_number")
+    chunks = feedback_service.stream_feedback(
+        question=payload.get("question"),
+        correct_answer=payload.get("correct_answer"),
+        user_answer=payload.get("user_answer"),
+        evaluation=payload.get("metrics")
+    )
+
+    async def on_complete(text):
+        if session_id and question_number is not None:
+            await session_store.set_answer_field(session_id, question_number, "feedback", text)
+
+    return _sse_response(chunks, "feedback", on_complete)
+
+@app.post("/api/explanation/stream")
+async def stream_explanation(payload: dict):
+    """Versión SSE de /api/explanation: reenvía la explicación según se genera."""
+    session_id = payload.get("session_id")
+    question_number = payload.get("question_number")
+
+    target_ans = await session_store.get_answer(session_id, question_number) if session_id else None
+    if target_ans and target_ans.get("explanation"):
+        async def stored():
+            yield target_ans["explanation"]
+        return _sse_response(stored(), "explanation")
+
+    chunks = explanation_service.stream_explanation(payload.get("question"), payload.get("correct_answer"))
+
+    async def on_complete(text):
+        if target_ans:
+            await session_store.set_answer_field(session_id, question_number, "explanation", text, only_if_missing=True)
+
+    return _sse_response(chunks, "explanation", on_complete)
+
+@app.post("/api/theory/stream")
+async def stream_theory(payload: dict):
+    """Versión SSE de /api/theory."""
+    return _sse_response(theory_service.stream_theory_explanation(payload.get("question")), "theory")
+
 @app.post("/api/theory")
 async def get_theory(payload: dict):
     """Obtiene la teoría relacionada con la pregunta."""
-    explanation = theory_service.get_theory_explanation(payload.get("question"))
+    explanation = await theory_service.get_theory_explanation(payload.get("question"))
     return JSONResponse({"theory": explanation})
 
+@app.get("/healthz")
+async def healthz():
+    """Liveness: el proceso está en marcha y responde (no espera al warm-up)."""
+    return JSONResponse({"status": "ok"})
+
+@app.get("/readyz")
+async def readyz():
+    """Readiness: 200 cuando el warm-up de los modelos requeridos ha terminado, 503 mientras tanto."""
+    summary = startup.summary()
+    return JSONResponse(summary, status_code=200 if summary["ready"] else 503)
+
+@app.get("/api/pool/stats")
+async def get_pool_stats():
+    """Métricas del pool de preguntas preparadas (aciertos, fallos y tamaños)."""
+    if not question_pool:
+        return JSONResponse({"enabled": False})
+    return JSONResponse({"enabled": True, **(await question_pool.stats())})
+
+@app.get("/api/generators/stats")
+async def get_generator_stats():
+    """Generadores de preguntas cargados en este worker (LRU por dataset)."""
+    return JSONResponse(generators.stats())
+
+@app.post("/api/evaluation/bulk")
+async def evaluate_bulk(payload: dict):
+    """
+    Evalúa muchos pares de una vez.
+    Body: {"pairs": [{"correct_answer": "...", "user_answer": "..."}, ...]}
+    """
+    pairs = payload.get("pairs") or []
+    try:
+        metrics = await evaluation_executor.evaluate_many(
+            [(p.get("correct_answer", ""), p.get("user_answer", "")) for p in pairs]
+        )
+    except EvaluationQueueFull:
+        return JSONResponse(
+            status_code=503,
+            content={"error": "El evaluador está saturado, inténtalo de nuevo en unos segundos"},
+            headers={"Retry-After": "2"},
+        )
+    return JSONResponse({"results": metrics})
+
+@app.get("/api/evaluation/stats")
+async def get_evaluation_stats():
+    """Estado del pool de procesos de evaluación (por worker)."""
+    return JSONResponse(evaluation_executor.stats())
+
+@app.get("/api/models/memory")
+async def get_models_memory():
+    """Memoria de los modelos cargados en este worker y en un proceso de evaluación."""
+    report = {"api_worker": memory_report()}
+    if evaluation_executor.workers:
+        report["evaluation_worker"] = await evaluation_executor.memory_report()
+    return JSONResponse(report)
+
+@app.get("/api/llm/cache/stats")
+async def get_llm_cache_stats():
+    """Métricas de la caché de respuestas del LLM (por worker)."""
+    cache = get_llm().cache
+    if not cache:
+        return JSONResponse({"enabled": False})
+    return JSONResponse({"enabled": True, **(await cache.stats())})
+
 @app.get("/results/{session_id}", response_class=HTMLResponse)
 async def show_results_page(request: Request, session_id: str):
     """Muestra la página de resultados finales de la entrevista."""
-    session = get_session(session_id)
+    session, answers = await session_store.get_with_answers(session_id)
     if not session:
         return HTMLResponse("<h1>Sesión no encontrada</h1>", status_code=404)
-
-    answers = get_answers(session_id)
     
-    # Procesamiento final antes de enviar al frontend
-    for ans in answers:
-        # Si por alguna razón el background task no terminó o falló (Redis tiene metrics: None)
-        # calculamos las métricas en este momento para que no se rompa la UI
-        if not ans.get("metrics"):
-            logger.info(f"Calculando métricas on-the-fly para {session_id} P{ans['question_number']}")
-            try:
-                ans["metrics"] = evaluate_full(ans["correct_answer"], ans["answer"])
-            except Exception as e:
-                logger.error(f"Error fallback metrics: {e}")
-                ans["metrics"] = {} # Evitar crash en frontend
+    # Procesamiento final antes de enviar al frontend:
+    # si por alguna razón el background task no terminó o falló (la respuesta tiene metrics: None)
+    # calculamos las métricas de todas las pendientes en un único lote para que no se rompa la UI
+    missing = [ans for ans in answers if not ans.get("metrics") or ans["metrics"].get("pending_stages")]
+    if missing:
+        logger.info(f"Calculando métricas on-the-fly para {session_id}: {len(missing)} respuestas")
+        try:
+            metrics = await evaluation_executor.evaluate_many(
+                [(ans["correct_answer"], ans["answer"]) for ans in missing]
+            )
+        except Exception as e:
+            logger.error(f"Error fallback metrics: {e}")
+            metrics = [{}] * len(missing)  # Evitar crash en frontend
+        for ans, m in zip(missing, metrics):
+            ans["metrics"] = m
 
     data = {
         "session_id": session_id,
@@ -432,7 +647,5 @@ async def show_results_page(request: Request, session_id: str):
 @app.delete("/api/interview/session/{session_id}")
 async def end_interview(session_id: str):
     """Finaliza la sesión de entrevista y limpia los datos temporales."""
-    redis_client.delete(f"session:{session_id}")
-    redis_client.delete(f"answers:{session_id}")
-    redis_client.delete(f"qmap:{session_id}")
+    await session_store.delete(session_id)
     return JSONResponse({"success": True, "message": "Sesión finalizada"})
\ No newline at end of file
@@ -0,0 +1,5 @@
+# Capa común de acceso a LLMs (GEMINI / DEEPSEEK / GROQ)
+from .config import LLMSettings
+from .provider import LLMProvider, LLMGenerationError, get_llm
+
+__all__ = ["LLMSettings", "LLMProvider", "LLMGenerationError", "get_llm"]
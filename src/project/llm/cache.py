@@ -0,0 +1,272 @@
+"""
+Caché de respuestas del LLM direccionada por contenido.
+
+La clave es un hash de (proveedor, modelo, tipo de prompt, versión de la
+plantilla, parámetros de generación y entradas normalizadas), de modo que la
+misma pregunta del dataset no vuelve a pagar la llamada en otra sesión.
+Solo se cachean los tipos de prompt habilitados (LLM_CACHE_PROMPTS).
+
+Backends (ambos con interfaz asíncrona: la caché se consulta desde el event
+loop y no debe bloquearlo):
+- DiskCacheBackend: SQLite local con TTL y expulsión LRU por número de entradas;
+  las consultas se ejecutan en un hilo (asyncio.to_thread) y la expulsión se
+  hace cada `evict_every` escrituras, no en cada una.
+- RedisCacheBackend: compartido entre workers (redis.asyncio); TTL nativo y LRU con un ZSET.
+"""
+import re
+import json
+import time
+import asyncio
+import sqlite3
+import hashlib
+import logging
+import threading
+from collections import Counter
+from typing import Any, Dict, Optional
+
+from .config import LLMCacheSettings
+
+logger = logging.getLogger(__name__)
+
+
+def _normalize(value: Any) -> Any:
+    if isinstance(value, str):
+        return re.sub(r"\s+", " ", value).strip()
+    if isinstance(value, dict):
+        return {k: _normalize(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    return value
+
+
+def make_cache_key(provider: str, model: str, prompt_type: str, prompt_version: Any, inputs: Dict) -> str:
+    payload = json.dumps(
+        [provider, model, prompt_type, str(prompt_version), _normalize(inputs)],
+        ensure_ascii=False,
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class DiskCacheBackend:
+    def __init__(self, path: str, ttl: int, max_entries: int, evict_every: int = 256):
+        """
+        Args:
+            evict_every: escrituras entre dos pasadas de expulsión (caducadas + LRU).
+                La tabla puede superar `max_entries` como mucho en esa cantidad.
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.evict_every = max(1, evict_every)
+        self._writes = 0
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_llm_cache_accessed ON llm_cache(accessed_at);
+            CREATE INDEX IF NOT EXISTS idx_llm_cache_expires ON llm_cache(expires_at);
+            """
+        )
+
+    def _get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock, self.conn:
+            row = self.conn.execute(
+                "SELECT value, expires_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] < now:
+                self.conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                return None
+            self.conn.execute("UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key))
+            return row[0]
+
+    def _set(self, key: str, value: str):
+        now = time.time()
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, value, now + self.ttl, now),
+            )
+            self._writes += 1
+            if self._writes >= self.evict_every:
+                self._writes = 0
+                self._evict(now)
+
+    def _evict(self, now: float):
+        # Ambos borrados usan índice (expires_at, accessed_at); el COUNT solo se hace aquí
+        self.conn.execute("DELETE FROM llm_cache WHERE expires_at < ?", (now,))
+        excess = self.conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0] - self.max_entries
+        if excess > 0:
+            self.conn.execute(
+                "DELETE FROM llm_cache WHERE rowid IN "
+                "(SELECT rowid FROM llm_cache ORDER BY accessed_at ASC LIMIT ?)",
+                (excess,),
+            )
+
+    def _size(self) -> int:
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+
+    async def get(self, key: str) -> Optional[str]:
+        return await asyncio.to_thread(self._get, key)
+
+    async def set(self, key: str, value: str):
+        await asyncio.to_thread(self._set, key, value)
+
+    async def size(self) -> int:
+        return await asyncio.to_thread(self._size)
+
+
+class RedisCacheBackend:
+    PREFIX = "llmcache:"
+    LRU_KEY = "llmcache:lru"
+
+    def __init__(self, redis_factory, ttl: int, max_entries: int):
+        """
+        Args:
+            redis_factory: función sin argumentos que crea un cliente redis.asyncio
+                (decode_responses=True). Se crea uno por event loop: un cliente
+                asíncrono no puede usarse desde otro loop (scripts con asyncio.run).
+                Al cambiar de loop se cierra el cliente anterior.
+        """
+        self.redis_factory = redis_factory
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._redis = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def _client(self):
+        loop = asyncio.get_running_loop()
+        if self._redis is not None and self._loop is not loop:
+            await self.aclose()
+        if self._redis is None:
+            self._redis = self.redis_factory()
+            self._loop = loop
+        return self._redis
+
+    async def aclose(self):
+        """Cierra el pool de conexiones del cliente actual (al apagar o al cambiar de loop)."""
+        redis, self._redis, self._loop = self._redis, None, None
+        if redis is None:
+            return
+        try:
+            await redis.aclose()
+        except Exception as e:
+            # Si su loop ya se cerró no se puede cerrar limpiamente: los sockets se
+            # cierran al liberar el cliente
+            logger.debug(f"[LLMCache] Cliente Redis anterior no cerrado: {e}")
+
+    async def get(self, key: str) -> Optional[str]:
+        redis = await self._client()
+        value = await redis.get(self.PREFIX + key)
+        if value is not None:
+            await redis.zadd(self.LRU_KEY, {key: time.time()})
+        return value
+
+    async def set(self, key: str, value: str):
+        redis = await self._client()
+        pipe = redis.pipeline()
+        pipe.set(self.PREFIX + key, value, ex=self.ttl)
+        pipe.zadd(self.LRU_KEY, {key: time.time()})
+        pipe.zcard(self.LRU_KEY)
+        excess = (await pipe.execute())[-1] - self.max_entries
+        if excess > 0:
+            oldest = await redis.zrange(self.LRU_KEY, 0, excess - 1)
+            if oldest:
+                pipe = redis.pipeline()
+                pipe.delete(*[self.PREFIX + k for k in oldest])
+                pipe.zrem(self.LRU_KEY, *oldest)
+                await pipe.execute()
+
+    async def size(self) -> int:
+        return await (await self._client()).zcard(self.LRU_KEY)
+
+
+class LLMCache:
+    def __init__(self, backend, prompts):
+        """
+        Args:
+            backend: DiskCacheBackend o RedisCacheBackend.
+            prompts: tipos de prompt cacheables (opt-in por tipo).
+        """
+        self.backend = backend
+        self.prompts = frozenset(prompts)
+        self.hits: Counter = Counter()
+        self.misses: Counter = Counter()
+
+    @classmethod
+    def from_settings(cls, settings: Optional[LLMCacheSettings] = None) -> Optional["LLMCache"]:
+        """Crea la caché configurada, o None si está desactivada o no se puede abrir."""
+        settings = settings or LLMCacheSettings.from_env()
+        if settings.backend in {"none", "off", ""} or not settings.prompts:
+            return None
+        try:
+            if settings.backend == "redis":
+                import redis
+                import redis.asyncio as aioredis
+                # Comprobación síncrona al crearla; las consultas usan el cliente asíncrono
+                with redis.from_url(settings.redis_url) as probe:
+                    probe.ping()
+                backend = RedisCacheBackend(
+                    lambda: aioredis.from_url(settings.redis_url, decode_responses=True),
+                    settings.ttl, settings.max_entries,
+                )
+            else:
+                backend = DiskCacheBackend(settings.path, settings.ttl, settings.max_entries)
+        except Exception as e:
+            logger.warning(f"[LLMCache] Caché desactivada ({settings.backend}): {e}")
+            return None
+        logger.info(f"[LLMCache] Backend {settings.backend} para {sorted(settings.prompts)}")
+        return cls(backend, settings.prompts)
+
+    def enabled_for(self, prompt_type: Optional[str]) -> bool:
+        return prompt_type is not None and prompt_type in self.prompts
+
+    async def get(self, key: str, prompt_type: str) -> Optional[str]:
+        try:
+            value = await self.backend.get(key)
+        except Exception as e:
+            logger.warning(f"[LLMCache] Error leyendo la caché: {e}")
+            value = None
+        if value is None:
+            self.misses[prompt_type] += 1
+        else:
+            self.hits[prompt_type] += 1
+        return value
+
+    async def set(self, key: str, value: str):
+        try:
+            await self.backend.set(key, value)
+        except Exception as e:
+            logger.warning(f"[LLMCache] Error escribiendo en la caché: {e}")
+
+    async def aclose(self):
+        close = getattr(self.backend, "aclose", None)
+        if close is not None:
+            await close()
+
+    async def stats(self) -> Dict:
+        hits, misses = sum(self.hits.values()), sum(self.misses.values())
+        try:
+            size = await self.backend.size()
+        except Exception:
+            size = None
+        return {
+            "backend": type(self.backend).__name__,
+            "entries": size,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / (hits + misses), 3) if hits + misses else None,
+            "by_prompt": {
+                p: {"hits": self.hits[p], "misses": self.misses[p]} for p in sorted(self.prompts)
+            },
+        }
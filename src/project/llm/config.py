@@ -0,0 +1,105 @@
+"""
+Configuración única de los proveedores LLM.
+
+Todas las variables de entorno relacionadas con el LLM se leen aquí:
+    LLM_PROVIDER           GEMINI | DEEPSEEK | GROQ (por defecto GEMINI)
+    GEMINI_API_KEY / DEEPSEEK_API_KEY / GROQ_API_KEY
+    LLM_MODEL              modelo por defecto (opcional)
+    LLM_REASONING_MODEL    modelo para feedback/explicaciones (opcional)
+    LLM_TIMEOUT            timeout total por llamada en segundos (por defecto 60)
+    LLM_MAX_CONNECTIONS    tamaño del pool HTTP compartido (por defecto 200)
+
+Caché de respuestas:
+    LLM_CACHE_BACKEND      disk | redis | none (por defecto disk)
+    LLM_CACHE_PROMPTS      tipos de prompt cacheables, separados por comas
+    LLM_CACHE_TTL          segundos de validez de una entrada (por defecto 7 días)
+    LLM_CACHE_MAX_ENTRIES  tamaño máximo antes de expulsar por LRU (por defecto 20000)
+    LLM_CACHE_PATH         fichero SQLite del backend disk
+    REDIS_URL              servidor del backend redis
+"""
+import os
+from dataclasses import dataclass
+from typing import FrozenSet, Optional
+
+PROVIDERS = {
+    "GEMINI": {
+        "api_key_env": "GEMINI_API_KEY",
+        "base_url": "https://generativelanguage.googleapis.com/v1beta",
+        "model": "gemini-2.5-flash",
+        "reasoning_model": "gemini-2.5-flash",
+    },
+    "DEEPSEEK": {
+        "api_key_env": "DEEPSEEK_API_KEY",
+        "base_url": "https://api.deepseek.com",
+        "model": "deepseek-chat",
+        "reasoning_model": "deepseek-reasoner",
+    },
+    "GROQ": {
+        "api_key_env": "GROQ_API_KEY",
+        "base_url": "https://api.groq.com/openai/v1",
+        "model": "llama-3.3-70b-versatile",
+        "reasoning_model": "llama-3.3-70b-versatile",
+    },
+}
+
+
+@dataclass(frozen=True)
+class LLMSettings:
+    provider: str
+    api_key: Optional[str]
+    base_url: str
+    model: str
+    reasoning_model: str
+    timeout: float = 60.0
+    max_connections: int = 200
+    max_keepalive_connections: int = 50
+
+    @property
+    def api_key_env(self) -> str:
+        return PROVIDERS[self.provider]["api_key_env"]
+
+    @classmethod
+    def from_env(cls) -> "LLMSettings":
+        provider = os.getenv("LLM_PROVIDER", "GEMINI").upper()
+        if provider not in PROVIDERS:
+            provider = "GEMINI"  # Mismo default que antes
+        defaults = PROVIDERS[provider]
+        max_connections = int(os.getenv("LLM_MAX_CONNECTIONS", "200"))
+        return cls(
+            provider=provider,
+            api_key=os.getenv(defaults["api_key_env"]),
+            base_url=defaults["base_url"],
+            model=os.getenv("LLM_MODEL", defaults["model"]),
+            reasoning_model=os.getenv("LLM_REASONING_MODEL", defaults["reasoning_model"]),
+            timeout=float(os.getenv("LLM_TIMEOUT", "60")),
+            max_connections=max_connections,
+            max_keepalive_connections=min(50, max_connections),
+        )
+
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Prompts deterministas en la práctica (temperatura baja) que se repiten entre sesiones
+DEFAULT_CACHED_PROMPTS = "normalize_question,clean_answer,prepare_question,explanation"
+
+
+@dataclass(frozen=True)
+class LLMCacheSettings:
+    backend: str = "disk"
+    prompts: FrozenSet[str] = frozenset()
+    ttl: int = 7 * 24 * 3600
+    max_entries: int = 20000
+    path: str = os.path.join(BASE_DIR, "database", "llm_cache.sqlite")
+    redis_url: str = "redis://localhost:6379/0"
+
+    @classmethod
+    def from_env(cls) -> "LLMCacheSettings":
+        prompts = os.getenv("LLM_CACHE_PROMPTS", DEFAULT_CACHED_PROMPTS)
+        return cls(
+            backend=os.getenv("LLM_CACHE_BACKEND", "disk").lower(),
+            prompts=frozenset(p.strip() for p in prompts.split(",") if p.strip()),
+            ttl=int(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600))),
+            max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", "20000")),
+            path=os.getenv("LLM_CACHE_PATH", cls.path),
+            redis_url=os.getenv("REDIS_URL", cls.redis_url),
+        )
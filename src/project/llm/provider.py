@@ -0,0 +1,301 @@
+"""
+Capa de proveedor LLM compartida por todos los servicios.
+
+Un único cliente por proceso con un pool HTTP asíncrono (httpx) compartido:
+- DEEPSEEK / GROQ: API compatible con OpenAI (AsyncOpenAI sobre el pool).
+- GEMINI: API REST generateContent sobre el mismo pool.
+
+Todas las llamadas son `await`-ables y tienen un timeout total por llamada,
+de modo que un LLM lento no bloquea el event loop del worker. Las llamadas con
+`prompt_type` habilitado en la caché (ver cache.py) se sirven desde ella si ya
+se hicieron antes.
+"""
+import json
+import asyncio
+import logging
+from typing import AsyncIterator, Dict, Optional
+
+import httpx
+
+from .config import LLMSettings
+from .cache import LLMCache, make_cache_key
+
+try:
+    from openai import AsyncOpenAI
+except ImportError:
+    AsyncOpenAI = None
+
+logger = logging.getLogger(__name__)
+
+
+class LLMGenerationError(Exception):
+    pass
+
+
+class LLMProvider:
+    def __init__(self, settings: Optional[LLMSettings] = None, cache: Optional[LLMCache] = None):
+        """
+        Cliente LLM asíncrono.
+
+        Args:
+            settings: configuración; por defecto se lee del entorno.
+            cache: caché de respuestas; por defecto la configurada en el entorno.
+        """
+        self.settings = settings or LLMSettings.from_env()
+        if not self.settings.api_key:
+            raise LLMGenerationError(f"{self.settings.api_key_env} no configurada.")
+        self.cache = cache if cache is not None else LLMCache.from_settings()
+        self._http: Optional[httpx.AsyncClient] = None
+        self._openai = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        logger.info(f"LLMProvider configurado con {self.provider} ({self.settings.model})")
+
+    @property
+    def provider(self) -> str:
+        return self.settings.provider
+
+    @property
+    def is_gemini(self) -> bool:
+        return self.provider == "GEMINI"
+
+    def _client(self) -> httpx.AsyncClient:
+        """Pool HTTP compartido, ligado al event loop en curso."""
+        loop = asyncio.get_running_loop()
+        if self._http is None or self._loop is not loop or self._http.is_closed:
+            # Un AsyncClient no puede reutilizarse entre event loops (p.ej. scripts con asyncio.run)
+            self._http = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=self.settings.max_connections,
+                    max_keepalive_connections=self.settings.max_keepalive_connections,
+                ),
+                timeout=httpx.Timeout(self.settings.timeout, connect=10.0),
+            )
+            self._openai = None
+            self._loop = loop
+        return self._http
+
+    def _openai_client(self):
+        http = self._client()
+        if self._openai is None:
+            if AsyncOpenAI is None:
+                raise LLMGenerationError("El paquete 'openai' no está instalado.")
+            self._openai = AsyncOpenAI(
+                api_key=self.settings.api_key,
+                base_url=self.settings.base_url,
+                http_client=http,
+                max_retries=1,
+            )
+        return self._openai
+
+    async def complete(
+        self,
+        prompt: str,
+        *,
+        model: Optional[str] = None,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        timeout: Optional[float] = None,
+        json_mode: bool = False,
+        prompt_type: Optional[str] = None,
+        prompt_version: int = 1,
+        cache_inputs: Optional[Dict] = None,
+    ) -> str:
+        """
+        Genera una respuesta de texto para el prompt.
+
+        Args:
+            model: modelo a usar (por defecto settings.model).
+            temperature / max_tokens: parámetros de generación opcionales.
+            timeout: timeout total de la llamada en segundos (por defecto settings.timeout).
+            json_mode: pide al proveedor que devuelva un objeto JSON.
+            prompt_type / prompt_version: identifican la plantilla (para la caché).
+            cache_inputs: entradas de la plantilla; si se pasan y el tipo está
+                habilitado, la respuesta se busca/guarda en la caché.
+        Raises:
+            LLMGenerationError si la llamada falla o expira.
+        """
+        timeout = timeout or self.settings.timeout
+        model = model or self.settings.model
+
+        cache_key = None
+        if self.cache and cache_inputs is not None and self.cache.enabled_for(prompt_type):
+            params = {"temperature": temperature, "max_tokens": max_tokens, "json_mode": json_mode}
+            cache_key = make_cache_key(
+                self.provider, model, prompt_type, prompt_version, {"inputs": cache_inputs, "params": params}
+            )
+            cached = await self.cache.get(cache_key, prompt_type)
+            if cached is not None:
+                return cached
+
+        text = await self._complete(prompt, model, temperature, max_tokens, timeout, json_mode)
+        if cache_key and text:
+            await self.cache.set(cache_key, text)
+        return text
+
+    async def _complete(self, prompt, model, temperature, max_tokens, timeout, json_mode) -> str:
+        try:
+            if self.is_gemini:
+                call = self._complete_gemini(prompt, model, temperature, max_tokens, timeout, json_mode)
+            else:
+                call = self._complete_openai(prompt, model, temperature, max_tokens, timeout, json_mode)
+            return await asyncio.wait_for(call, timeout=timeout)
+        except asyncio.TimeoutError as e:
+            raise LLMGenerationError(f"Timeout ({timeout}s) llamando a {self.provider}") from e
+        except LLMGenerationError:
+            raise
+        except Exception as e:
+            raise LLMGenerationError(f"Error llamando a {self.provider}: {e}") from e
+
+    async def _complete_openai(self, prompt, model, temperature, max_tokens, timeout, json_mode=False) -> str:
+        kwargs = {}
+        if temperature is not None:
+            kwargs["temperature"] = temperature
+        if max_tokens is not None:
+            kwargs["max_tokens"] = max_tokens
+        if json_mode:
+            kwargs["response_format"] = {"type": "json_object"}
+        response = await self._openai_client().chat.completions.create(
+            model=model,
+            messages=[{"role": "user", "content": prompt}],
+            timeout=timeout,
+            **kwargs,
+        )
+        return (response.choices[0].message.content or "").strip()
+
+    def _gemini_body(self, prompt, temperature, max_tokens, json_mode=False) -> Dict:
+        generation_config = {}
+        if temperature is not None:
+            generation_config["temperature"] = temperature
+        if max_tokens is not None:
+            generation_config["maxOutputTokens"] = max_tokens
+        if json_mode:
+            generation_config["responseMimeType"] = "application/json"
+        body = {"contents": [{"role": "user", "parts": [{"text": prompt}]}]}
+        if generation_config:
+            body["generationConfig"] = generation_config
+        return body
+
+    async def _complete_gemini(self, prompt, model, temperature, max_tokens, timeout, json_mode=False) -> str:
+        response = await self._client().post(
+            f"{self.settings.base_url}/models/{model}:generateContent",
+            headers={"x-goog-api-key": self.settings.api_key},
+            json=self._gemini_body(prompt, temperature, max_tokens, json_mode),
+            timeout=timeout,
+        )
+        response.raise_for_status()
+        return _gemini_text(response.json()).strip()
+
+    async def stream(
+        self,
+        prompt: str,
+        *,
+        model: Optional[str] = None,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        timeout: Optional[float] = None,
+        prompt_type: Optional[str] = None,
+        prompt_version: int = 1,
+        cache_inputs: Optional[Dict] = None,
+    ) -> AsyncIterator[str]:
+        """
+        Igual que `complete`, pero va devolviendo los fragmentos de texto según los
+        genera el proveedor. Con acierto en caché se devuelve el texto completo de una vez;
+        al terminar, el texto completo se guarda en la caché.
+        """
+        timeout = timeout or self.settings.timeout
+        model = model or self.settings.model
+
+        cache_key = None
+        if self.cache and cache_inputs is not None and self.cache.enabled_for(prompt_type):
+            params = {"temperature": temperature, "max_tokens": max_tokens, "json_mode": False}
+            cache_key = make_cache_key(
+                self.provider, model, prompt_type, prompt_version, {"inputs": cache_inputs, "params": params}
+            )
+            cached = await self.cache.get(cache_key, prompt_type)
+            if cached is not None:
+                yield cached
+                return
+
+        if self.is_gemini:
+            chunks = self._stream_gemini(prompt, model, temperature, max_tokens, timeout)
+        else:
+            chunks = self._stream_openai(prompt, model, temperature, max_tokens, timeout)
+
+        # El timeout total se comprueba entre fragmentos; httpx corta si el proveedor se queda colgado
+        deadline = asyncio.get_running_loop().time() + timeout
+        parts = []
+        try:
+            async for delta in chunks:
+                if asyncio.get_running_loop().time() > deadline:
+                    raise LLMGenerationError(f"Timeout ({timeout}s) en streaming con {self.provider}")
+                if delta:
+                    parts.append(delta)
+                    yield delta
+        except LLMGenerationError:
+            raise
+        except Exception as e:
+            raise LLMGenerationError(f"Error en streaming con {self.provider}: {e}") from e
+        finally:
+            await chunks.aclose()
+
+        text = "".join(parts).strip()
+        if cache_key and text:
+            await self.cache.set(cache_key, text)
+
+    async def _stream_openai(self, prompt, model, temperature, max_tokens, timeout) -> AsyncIterator[str]:
+        kwargs = {}
+        if temperature is not None:
+            kwargs["temperature"] = temperature
+        if max_tokens is not None:
+            kwargs["max_tokens"] = max_tokens
+        response = await self._openai_client().chat.completions.create(
+            model=model,
+            messages=[{"role": "user", "content": prompt}],
+            timeout=timeout,
+            stream=True,
+            **kwargs,
+        )
+        async for chunk in response:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+    async def _stream_gemini(self, prompt, model, temperature, max_tokens, timeout) -> AsyncIterator[str]:
+        async with self._client().stream(
+            "POST",
+            f"{self.settings.base_url}/models/{model}:streamGenerateContent",
+            params={"alt": "sse"},
+            headers={"x-goog-api-key": self.settings.api_key},
+            json=self._gemini_body(prompt, temperature, max_tokens),
+            timeout=timeout,
+        ) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if line.startswith("data:"):
+                    yield _gemini_text(json.loads(line[5:]))
+
+    async def aclose(self):
+        if self._http is not None and not self._http.is_closed:
+            await self._http.aclose()
+        self._http = None
+        self._openai = None
+        if self.cache:
+            await self.cache.aclose()
+
+
+def _gemini_text(data: Dict) -> str:
+    candidates = data.get("candidates") or []
+    if not candidates:
+        return ""
+    parts = (candidates[0].get("content") or {}).get("parts") or []
+    return "".join(p.get("text", "") for p in parts if not p.get("thought"))
+
+
+_llm: Optional[LLMProvider] = None
+
+
+def get_llm() -> LLMProvider:
+    """Devuelve el proveedor compartido del proceso (se crea la primera vez)."""
+    global _llm
+    if _llm is None:
+        _llm = LLMProvider()
+    return _llm
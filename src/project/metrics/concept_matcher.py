@@ -0,0 +1,152 @@
+"""
+Emparejamiento difuso de conceptos con índice, sin el barrido cuadrático.
+
+Misma semántica que `fuzzy_match` (igualdad, contención para términos de 3+
+caracteres o `SequenceMatcher.ratio() >= threshold`), pero los candidatos se
+buscan en un índice sobre los conceptos de un lado:
+
+- igualdad: conjunto;
+- `b in a`: subcadenas de `a` con las longitudes presentes en el índice;
+- `a in b`: lista invertida del bigrama más raro de `a`;
+- ratio: solo longitudes compatibles (2·min(la, lb) >= t·(la + lb)); si el umbral
+  lo permite, filtro por número de bigramas comunes (lema de q-gramas) y, si
+  está instalado, el ratio Indel de rapidfuzz como cota superior exacta en C++.
+  El ratio de SequenceMatcher solo se calcula para los candidatos que pasan.
+"""
+import math
+from collections import Counter, defaultdict
+from difflib import SequenceMatcher
+from typing import Dict, Iterable, List
+
+try:
+    from rapidfuzz import fuzz, process
+except ImportError:
+    fuzz = process = None
+
+Q = 2
+
+
+def fuzzy_match(a: str, b: str, threshold: float = 0.85) -> bool:
+    if not a or not b:
+        return False
+    if a == b:
+        return True
+    # Coincidencia por contención para términos cortos
+    if len(a) >= 3 and len(b) >= 3 and (a in b or b in a):
+        return True
+    return SequenceMatcher(None, a, b).ratio() >= threshold
+
+
+def _qgrams(text: str) -> Counter:
+    return Counter(text[i:i + Q] for i in range(len(text) - Q + 1))
+
+
+class ConceptMatcher:
+    def __init__(self, concepts: Iterable[str], threshold: float = 0.75):
+        """
+        Args:
+            concepts: conceptos indexados (lado de la respuesta del usuario).
+            threshold: umbral de SequenceMatcher.ratio().
+        """
+        self.threshold = threshold
+        self.concepts: List[str] = [c for c in dict.fromkeys(concepts) if c]
+        self.exact = set(self.concepts)
+        self.by_length: Dict[int, List[int]] = defaultdict(list)
+        self.postings: Dict[str, List[int]] = defaultdict(list)
+        self.grams: List[Counter] = []
+        self.chars: List[Counter] = [Counter(c) for c in self.concepts]
+        # Un SequenceMatcher por concepto (seq2 fija): el índice interno de b se construye una vez
+        self._matchers: Dict[int, SequenceMatcher] = {}
+        for idx, concept in enumerate(self.concepts):
+            self.by_length[len(concept)].append(idx)
+            grams = _qgrams(concept)
+            self.grams.append(grams)
+            for gram in grams:
+                self.postings[gram].append(idx)
+        self.contain_lengths = sorted(l for l in self.by_length if l >= 3)
+
+    def _contains(self, a: str) -> bool:
+        # b dentro de a: basta con mirar las subcadenas de a de las longitudes indexadas
+        for length in self.contain_lengths:
+            if length > len(a):
+                break
+            for i in range(len(a) - length + 1):
+                if a[i:i + length] in self.exact:
+                    return True
+        # a dentro de b: b contiene todos los bigramas de a, en particular el más raro
+        grams = _qgrams(a)
+        if not grams:
+            return False
+        rarest = min(grams, key=lambda g: len(self.postings.get(g, ())))
+        return any(
+            len(self.concepts[idx]) >= len(a) and a in self.concepts[idx]
+            for idx in self.postings.get(rarest, ())
+        )
+
+    def _ratio_candidates(self, a: str) -> List[int]:
+        t = self.threshold
+        la = len(a)
+        if t <= 0:
+            return list(range(len(self.concepts)))
+        # Margen de una unidad para no perder candidatos en el borde por redondeo
+        lo = max(1, math.ceil(la * t / (2 - t)) - 1)
+        hi = math.floor(la * (2 - t) / t) + 1
+        window = [idx for length in range(lo, hi + 1) for idx in self.by_length.get(length, ())]
+        if not window:
+            return []
+
+        # Lema de q-gramas: ratio >= t implica distancia de edición k <= (1-t)(la+lb), y dos
+        # cadenas a distancia k comparten al menos max(la, lb) - Q + 1 - k·Q bigramas.
+        # Solo filtra cuando esa cota es positiva (umbrales altos o cadenas largas).
+        if la - Q + 1 - Q * (1 - t) * 2 * la >= 1:
+            grams = _qgrams(a)
+            shared: Dict[int, int] = defaultdict(int)
+            for gram, count in grams.items():
+                for idx in self.postings.get(gram, ()):
+                    shared[idx] += min(count, self.grams[idx][gram])
+            filtered = []
+            for idx in window:
+                lb = len(self.concepts[idx])
+                bound = max(la, lb) - Q + 1 - Q * math.floor((1 - t) * (la + lb) + 1e-9)
+                if shared.get(idx, 0) >= bound:
+                    filtered.append(idx)
+            window = filtered
+
+        if process is not None and window:
+            # Ratio Indel (LCS) >= ratio de SequenceMatcher: descarta sin falsos negativos
+            choices = {idx: self.concepts[idx] for idx in window}
+            window = [
+                idx for _, _, idx in process.extract(
+                    a, choices, scorer=fuzz.ratio, score_cutoff=t * 100 - 1e-9, limit=None
+                )
+            ]
+        return window
+
+    def _ratio_at_least(self, a: str, a_chars: Counter, idx: int) -> bool:
+        t = self.threshold
+        b = self.concepts[idx]
+        total = len(a) + len(b)
+        # Cota por multiconjunto de caracteres (= quick_ratio) antes del ratio exacto
+        common = sum(min(n, self.chars[idx][ch]) for ch, n in a_chars.items())
+        if 2.0 * common / total < t:
+            return False
+        matcher = self._matchers.get(idx)
+        if matcher is None:
+            matcher = self._matchers[idx] = SequenceMatcher(None, "", b)
+        matcher.set_seq1(a)
+        return matcher.ratio() >= t
+
+    def matches(self, a: str) -> bool:
+        """Equivalente a `any(fuzzy_match(a, b, threshold) for b in concepts)`."""
+        if not a or not self.concepts:
+            return False
+        if a in self.exact:
+            return True
+        if len(a) >= 3 and self._contains(a):
+            return True
+        a_chars = Counter(a)
+        return any(self._ratio_at_least(a, a_chars, idx) for idx in self._ratio_candidates(a))
+
+    def overlap(self, concepts: Iterable[str]) -> int:
+        """Número de `concepts` con alguna coincidencia difusa en el índice."""
+        return sum(1 for a in concepts if self.matches(a))
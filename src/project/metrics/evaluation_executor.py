@@ -0,0 +1,269 @@
+"""
+Ejecutor de evaluaciones en procesos separados.
+
+`evaluate_full` es CPU-bound (embeddings, spaCy, KeyBERT, SymPy) y, llamado
+dentro de un handler `async`, bloquea el event loop del worker para todas las
+sesiones. Este módulo lo ejecuta en un ProcessPoolExecutor cuyos procesos
+cargan `EvaluatorModels` una sola vez al arrancar, de modo que la evaluación
+escala con los núcleos y la API sigue respondiendo.
+
+Los resultados se memorizan por (respuesta correcta, respuesta del usuario), de
+modo que reenvíos y el cálculo de respaldo de la página de resultados no cuestan nada.
+
+Configuración (variables de entorno):
+    EVAL_WORKERS      procesos de evaluación (por defecto 2; 0 = hilo del propio worker)
+    EVAL_MAX_PENDING  evaluaciones en cola/en curso antes de rechazar (por defecto 8 por proceso)
+    EVAL_MEMO_SIZE    resultados memorizados por worker (por defecto 2048; 0 = sin memo)
+"""
+import os
+import hashlib
+import asyncio
+import logging
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class EvaluationQueueFull(Exception):
+    pass
+
+
+def _init_worker():
+    # Se ejecuta una vez en cada proceso: carga los modelos antes de la primera evaluación
+    from .evaluator import EvaluatorModels
+    EvaluatorModels()
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+def _evaluate(correct_answer: str, user_answer: str, reference: Optional[Dict] = None) -> Dict[str, Any]:
+    from .evaluator import evaluate_full
+    return evaluate_full(correct_answer=correct_answer, user_answer=user_answer, reference=reference)
+
+
+def _memory_report() -> Dict[str, Any]:
+    from ..model_registry import memory_report
+    return memory_report()
+
+
+def _evaluate_progression(correct_answer: str, user_answer: str, reference: Optional[Dict] = None) -> Dict[str, Any]:
+    from .evaluator import evaluate_progression
+    return evaluate_progression(correct_answer, user_answer, reference)
+
+
+def _reference_features(correct_answer: str) -> Dict[str, Any]:
+    from .evaluator import reference_features
+    return reference_features(correct_answer)
+
+
+def _evaluate_many(pairs: List[Tuple[str, str]]) -> List[Dict[str, Any]]:
+    from .evaluator import evaluate_many
+    return evaluate_many(pairs)
+
+
+class EvaluationExecutor:
+    def __init__(self, workers: int = 2, max_pending: Optional[int] = None, memo_size: int = 2048):
+        """
+        Args:
+            workers: número de procesos; con 0 se evalúa en un hilo del propio proceso.
+            max_pending: máximo de evaluaciones pendientes; por encima se lanza EvaluationQueueFull.
+            memo_size: resultados memorizados (LRU) por (referencia, respuesta).
+        """
+        self.workers = max(0, workers)
+        self.max_pending = max_pending or max(1, self.workers) * 8
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.memo_size = max(0, memo_size)
+        self.memo_hits = 0
+        self._memo: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    @classmethod
+    def from_env(cls) -> "EvaluationExecutor":
+        max_pending = os.getenv("EVAL_MAX_PENDING")
+        return cls(
+            workers=int(os.getenv("EVAL_WORKERS", "2")),
+            max_pending=int(max_pending) if max_pending else None,
+            memo_size=int(os.getenv("EVAL_MEMO_SIZE", "2048")),
+        )
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn: los procesos no heredan el estado (hilos, sockets) del worker de uvicorn
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+            )
+        return self._pool
+
+    async def start(self):
+        """
+        Arranca los procesos y precarga los modelos (warm-up en segundo plano desde el lifespan).
+        Con workers=0 los modelos se cargan en un hilo del propio proceso.
+
+        Raises:
+            La excepción del arranque si los procesos (o los modelos) no se pueden cargar.
+        """
+        if not self.workers:
+            await asyncio.to_thread(_init_worker)
+            logger.info("[EvaluationExecutor] Modelos de evaluación cargados en el worker")
+            return
+        loop = asyncio.get_running_loop()
+        pool = self._get_pool()
+        try:
+            pids = await asyncio.gather(*(loop.run_in_executor(pool, _ping) for _ in range(self.workers)))
+            logger.info(f"[EvaluationExecutor] {len(set(pids))} procesos de evaluación listos")
+        except Exception as e:
+            logger.error(f"[EvaluationExecutor] Error arrancando los procesos: {e}")
+            raise
+
+    @staticmethod
+    def _memo_key(correct_answer: str, user_answer: str) -> str:
+        return hashlib.sha1(f"{correct_answer}\0{user_answer}".encode("utf-8")).hexdigest()
+
+    def _memo_get(self, key: str) -> Optional[Dict[str, Any]]:
+        metrics = self._memo.get(key)
+        if metrics is None:
+            return None
+        self._memo.move_to_end(key)
+        self.memo_hits += 1
+        return dict(metrics)
+
+    def _memo_set(self, key: str, metrics: Dict[str, Any]):
+        # Los resultados con error no se memorizan: pueden deberse a un fallo transitorio
+        if not self.memo_size or "error" in metrics:
+            return
+        self._memo[key] = dict(metrics)
+        self._memo.move_to_end(key)
+        while len(self._memo) > self.memo_size:
+            self._memo.popitem(last=False)
+
+    async def evaluate_full(
+        self, correct_answer: str, user_answer: str, reference: Optional[Dict] = None
+    ) -> Dict[str, Any]:
+        """
+        Versión awaitable de `evaluator.evaluate_full`.
+
+        Args:
+            reference: features precalculados de correct_answer (ver `reference_features`).
+        Raises:
+            EvaluationQueueFull si ya hay `max_pending` evaluaciones pendientes.
+        """
+        key = self._memo_key(correct_answer, user_answer)
+        cached = self._memo_get(key)
+        if cached is not None:
+            return cached
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise EvaluationQueueFull(f"{self.pending} evaluaciones pendientes")
+
+        metrics = await self._submit(_evaluate, correct_answer, user_answer, reference)
+        self._memo_set(key, metrics)
+        return metrics
+
+    async def evaluate_progression(
+        self, correct_answer: str, user_answer: str, reference: Optional[Dict] = None
+    ) -> Dict[str, Any]:
+        """
+        Versión awaitable de `evaluator.evaluate_progression`: solo las etapas necesarias
+        para decidir la progresión (el resultado puede traer `pending_stages`).
+        """
+        key = self._memo_key(correct_answer, user_answer)
+        cached = self._memo_get(key)
+        if cached is not None:
+            return cached
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise EvaluationQueueFull(f"{self.pending} evaluaciones pendientes")
+
+        metrics = await self._submit(_evaluate_progression, correct_answer, user_answer, reference)
+        if not metrics.get("pending_stages"):
+            self._memo_set(key, metrics)
+        return metrics
+
+    async def reference_features(self, correct_answer: str) -> Optional[Dict[str, Any]]:
+        """Features de la respuesta correcta, o None si el evaluador está saturado o falla."""
+        if self.pending >= self.max_pending:
+            return None
+        try:
+            return await self._submit(_reference_features, correct_answer)
+        except Exception as e:
+            logger.error(f"[EvaluationExecutor] Error calculando features de referencia: {e}")
+            return None
+
+    async def evaluate_many(self, pairs: Sequence[Tuple[str, str]], min_chunk: int = 16) -> List[Dict[str, Any]]:
+        """
+        Versión awaitable de `evaluator.evaluate_many`: reparte los pares en trozos
+        (al menos `min_chunk` por trozo, para aprovechar el batching) entre los procesos.
+        """
+        pairs = list(pairs)
+        keys = [self._memo_key(c, u) for c, u in pairs]
+        results: List[Optional[Dict[str, Any]]] = [self._memo_get(k) for k in keys]
+        todo = [i for i, r in enumerate(results) if r is None]
+        if not todo:
+            return results
+        size = max(min_chunk, -(-len(todo) // max(1, self.workers)))
+        chunks = [todo[i:i + size] for i in range(0, len(todo), size)]
+        if self.pending + len(chunks) > self.max_pending:
+            self.rejected += 1
+            raise EvaluationQueueFull(f"{self.pending} evaluaciones pendientes")
+        computed = await asyncio.gather(
+            *(self._submit(_evaluate_many, [pairs[i] for i in chunk]) for chunk in chunks)
+        )
+        for chunk, metrics_list in zip(chunks, computed):
+            for i, metrics in zip(chunk, metrics_list):
+                results[i] = metrics
+                self._memo_set(keys[i], metrics)
+        return results
+
+    async def _submit(self, fn, *args):
+        self.pending += 1
+        try:
+            if not self.workers:
+                return await asyncio.to_thread(fn, *args)
+            loop = asyncio.get_running_loop()
+            pool = self._get_pool()
+            try:
+                return await loop.run_in_executor(pool, fn, *args)
+            except BrokenProcessPool:
+                # Un proceso murió (p.ej. OOM): se recrea el pool (una sola vez) y se reintenta
+                if self._pool is pool:
+                    logger.error("[EvaluationExecutor] Pool roto, recreando procesos")
+                    self.shutdown(wait=False)
+                return await loop.run_in_executor(self._get_pool(), fn, *args)
+        finally:
+            self.pending -= 1
+            self.completed += 1
+
+    async def memory_report(self) -> Optional[Dict[str, Any]]:
+        """Informe de memoria de modelos de uno de los procesos de evaluación."""
+        try:
+            return await self._submit(_memory_report)
+        except Exception as e:
+            logger.error(f"[EvaluationExecutor] Error obteniendo el informe de memoria: {e}")
+            return None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "memo_entries": len(self._memo),
+            "memo_hits": self.memo_hits,
+        }
+
+    def shutdown(self, wait: bool = True):
+        """Cancela lo que está en cola y espera a las evaluaciones en curso."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=wait, cancel_futures=True)
+            self._pool = None
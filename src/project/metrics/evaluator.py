@@ -3,21 +3,23 @@ advanced_evaluator.py
 Módulo de evaluación cuantitativa y lógica.
 """
 import re
-from typing import List, Dict, Any, Iterable
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import List, Dict, Any, Callable, Iterable, Optional, Sequence, Tuple
 import logging
-from difflib import SequenceMatcher
 from unidecode import unidecode
 
+from ..model_registry import get_keybert, get_sentence_transformer, get_spacy, scoring_model_name
+from .symbolic import equivalent, parse as parse_expression
+from .concept_matcher import ConceptMatcher
+
 # Configuración de logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Dependencias opcionales (para evitar errores si no están instaladas al inicio)
 try:
-    from sentence_transformers import SentenceTransformer, util
-    import spacy
-    from keybert import KeyBERT
-    from sympy import sympify, simplify
+    from sentence_transformers import util
 except ImportError as e:
     logger.error(f"Faltan dependencias para el evaluador avanzado: {e}")
     logger.error("Ejecuta: pip install sentence-transformers spacy keybert sympy unidecode")
@@ -44,21 +46,23 @@ class EvaluatorModels:
         if cls._instance is None:
             logger.info("Cargando modelos de Evaluación Avanzada (esto puede tardar)...")
             cls._instance = super(EvaluatorModels, cls).__new__(cls)
+            # Modelos compartidos del proceso (ver model_registry)
+            name = scoring_model_name()
             # Embedding Model
-            cls._instance.embedding_model = SentenceTransformer("sentence-transformers/all-mpnet-base-v2")
+            cls._instance.embedding_model = get_sentence_transformer(name)
             # NLP
-            try:
-                cls._instance.nlp = spacy.load("es_core_news_md")
-            except OSError:
-                logger.warning("Modelo 'es_core_news_md' no encontrado. Descargando...")
-                from spacy.cli import download
-                download("es_core_news_md")
-                cls._instance.nlp = spacy.load("es_core_news_md")
-            # KeyBERT
-            cls._instance.kw_model = KeyBERT(model=cls._instance.embedding_model)
+            cls._instance.nlp = get_spacy()
+            # KeyBERT (sobre el mismo modelo de embeddings)
+            cls._instance.kw_model = get_keybert(name)
             logger.info("Modelos cargados correctamente.")
         return cls._instance
 
+    @classmethod
+    def reload(cls):
+        """Descarta los modelos y features en caché (p.ej. tras cambiar EMBEDDING_BACKEND)."""
+        cls._instance = None
+        _reference_features_cached.cache_clear()
+
 # ============================================================
 # HELPERS
 # ============================================================
@@ -69,16 +73,6 @@ def _normalize_token(tok: str) -> str:
     tok = tok.strip()
     return tok
 
-def _fuzzy_match(a: str, b: str, threshold: float = 0.85) -> bool:
-    if not a or not b:
-        return False
-    if a == b:
-        return True
-    # Coincidencia por contención para términos cortos
-    if len(a) >= 3 and len(b) >= 3 and (a in b or b in a):
-        return True
-    return SequenceMatcher(None, a, b).ratio() >= threshold
-
 def _tokenize_basic(text: str) -> List[str]:
     text = unidecode(text.lower())
     parts = re.split(r"[^a-z0-9\-/\.]+", text)
@@ -106,10 +100,15 @@ def _extract_fractions(text: str) -> List[float]:
 # FUNCIONES DE EVALUACIÓN
 # ============================================================
 
-def semantic_similarity(text_a: str, text_b: str) -> float:
+def semantic_similarity(text_a: str, text_b: str, emb_a=None) -> float:
+    """emb_a: embedding ya calculado de text_a (p.ej. de los features de referencia)."""
     models = EvaluatorModels()
-    emb_a = models.embedding_model.encode(text_a, convert_to_tensor=True)
-    emb_b = models.embedding_model.encode(text_b, convert_to_tensor=True)
+    if emb_a is None:
+        emb_a = models.embedding_model.encode(text_a, convert_to_tensor=True)
+        emb_b = models.embedding_model.encode(text_b, convert_to_tensor=True)
+    else:
+        # El embedding precalculado es una lista (JSON): se compara en CPU
+        emb_b = models.embedding_model.encode(text_b, convert_to_tensor=False)
     score = util.cos_sim(emb_a, emb_b)
     scaled = (float(score) + 1) / 2  # [-1,1] -> [0,1]
     return max(0.0, min(1.0, scaled))
@@ -131,36 +130,43 @@ def extract_math_expr(text: str):
         return max(exprs, key=len)
     return None
 
-def numeric_validation(correct_answer: str, user_answer: str) -> float:
+def _numeric_candidates(text: str) -> List[float]:
+    cands = []
+    seen = set()
+    for val in _extract_fractions(text) + _extract_numbers(text):
+        key = round(val, 8)
+        if key not in seen:
+            seen.add(key)
+            cands.append(val)
+    return cands
+
+def _reference_expr(text: str) -> Optional[str]:
+    """Expresión matemática de la referencia si es parseable dentro del presupuesto, o None."""
+    expr = extract_math_expr(text)
+    if not expr or parse_expression(expr) is None:
+        return None
+    return expr
+
+def numeric_validation(correct_answer: str, user_answer: str, reference: Optional[Dict] = None) -> float:
     """
     Estrategia híbrida:
-    1) Intenta equivalencia exacta con sympy (si hay expresiones).
+    1) Intenta equivalencia con sympy (si hay expresiones), acotada en tiempo y tamaño.
     2) Si falla, compara el número/razón más representativo con tolerancia adaptable.
+
+    reference: features precalculados de la respuesta correcta (ver reference_features).
     """
-    correct_expr = extract_math_expr(correct_answer)
+    if reference is not None:
+        correct_expr = reference.get("math_expr")
+    else:
+        correct_expr = extract_math_expr(correct_answer)
     user_expr = extract_math_expr(user_answer)
 
-    if correct_expr and user_expr:
-        try:
-            c = simplify(sympify(correct_expr))
-            u = simplify(sympify(user_expr))
-            if simplify(c - u) == 0:
-                return 1.0
-        except Exception:
-            pass  # Seguimos al plan B
-
-    def candidates(text: str) -> List[float]:
-        cands = []
-        seen = set()
-        for val in _extract_fractions(text) + _extract_numbers(text):
-            key = round(val, 8)
-            if key not in seen:
-                seen.add(key)
-                cands.append(val)
-        return cands
+    if correct_expr and user_expr and equivalent(correct_expr, user_expr):
+        return 1.0
+    # Si no son equivalentes (o no se puede decidir a tiempo) seguimos al plan B
 
-    c_cands = candidates(correct_answer)
-    u_cands = candidates(user_answer)
+    c_cands = reference["numbers"] if reference is not None else _numeric_candidates(correct_answer)
+    u_cands = _numeric_candidates(user_answer)
 
     if not c_cands or not u_cands:
         return 0.0
@@ -189,7 +195,11 @@ def extract_concepts(text: str) -> List[str]:
     """
     models = EvaluatorModels()
     doc = models.nlp(text)
+    keywords = [kw[0] for kw in models.kw_model.extract_keywords(text, top_n=7)]
+    return _concepts_from(text, doc, keywords)
 
+def _concepts_from(text: str, doc, keywords: List[str]) -> List[str]:
+    """Combina chunks, sustantivos, keywords y tokens ya calculados para un texto."""
     noun_chunks = [_normalize_token(chunk.lemma_) for chunk in doc.noun_chunks]
     noun_chunks = [t for t in noun_chunks if t and len(t) > 1 and t not in STOPWORDS_ES]
 
@@ -200,7 +210,6 @@ def extract_concepts(text: str) -> List[str]:
     ]
     nouns = [t for t in nouns if t and len(t) > 1 and t not in STOPWORDS_ES]
 
-    keywords = [kw[0] for kw in models.kw_model.extract_keywords(text, top_n=7)]
     keywords = [_normalize_token(k) for k in keywords if k]
 
     basic_tokens = _tokenize_basic(text)
@@ -209,16 +218,14 @@ def extract_concepts(text: str) -> List[str]:
     return list(combined)
 
 def _fuzzy_overlap(c1: Iterable[str], c2: Iterable[str], threshold: float = 0.75) -> int:
-    overlap = 0
-    c2_list = list(c2)
-    for a in c1:
-        if any(_fuzzy_match(a, b, threshold) for b in c2_list):
-            overlap += 1
-    return overlap
-
-def concept_coverage(correct_answer: str, user_answer: str) -> float:
-    c1 = set(extract_concepts(correct_answer))
-    c2 = set(extract_concepts(user_answer))
+    # Índice sobre c2 en lugar de comparar todos los pares (ver concept_matcher)
+    return ConceptMatcher(c2, threshold).overlap(c1)
+
+def concept_coverage(correct_answer: str, user_answer: str, reference: Optional[Dict] = None) -> float:
+    c1 = set(reference["concepts"]) if reference is not None else set(extract_concepts(correct_answer))
+    return _coverage(c1, set(extract_concepts(user_answer)))
+
+def _coverage(c1: set, c2: set) -> float:
     if not c1:
         return 0.0
 
@@ -266,28 +273,175 @@ def final_hybrid_score(sem: float, num: float, concepts: float, reasoning: float
     )
     return max(0.0, min(1.0, score))
 
-def evaluate_full(correct_answer: str, user_answer: str) -> Dict[str, Any]:
+def _metrics(sem: float, num: float, concepts: float, reasoning: float) -> Dict[str, Any]:
+    return {
+        "semantic_score": round(sem, 3),
+        "numeric_score": round(num, 3),
+        "concept_score": round(concepts, 3),
+        "reasoning_score": round(reasoning, 3),
+        "final_score": round(final_hybrid_score(sem, num, concepts, reasoning), 3)
+    }
+
+def _error_metrics(e: Exception) -> Dict[str, Any]:
+    return {
+        "semantic_score": 0, "numeric_score": 0,
+        "concept_score": 0, "reasoning_score": 0,
+        "final_score": 0, "error": str(e)
+    }
+
+def reference_features(correct_answer: str) -> Dict[str, Any]:
+    """
+    Features de la respuesta correcta que no dependen de la respuesta del usuario:
+    embedding, conceptos, candidatos numéricos y expresión SymPy simplificada.
+    Se calculan una vez al servir la pregunta y se guardan con ella (JSON).
+    """
+    return dict(_reference_features_cached(correct_answer))
+
+@lru_cache(maxsize=512)
+def _reference_features_cached(correct_answer: str) -> Tuple:
+    models = EvaluatorModels()
+    embedding = models.embedding_model.encode(correct_answer, convert_to_tensor=False)
+    return (
+        ("embedding", [round(float(x), 6) for x in embedding]),
+        ("concepts", sorted(extract_concepts(correct_answer))),
+        ("numbers", _numeric_candidates(correct_answer)),
+        ("math_expr", _reference_expr(correct_answer)),
+    )
+
+# ============================================================
+# PIPELINE POR ETAPAS
+# ============================================================
+
+# Umbrales de progresión de dificultad que usa save_answer (bajada / subida)
+PROGRESSION_THRESHOLDS = (0.45, 0.85)
+
+@dataclass(frozen=True)
+class Stage:
+    metric: str                                       # clave en el resultado
+    weight: float                                     # peso en final_hybrid_score
+    cost: int                                         # orden de ejecución (más barato primero)
+    run: Callable[[str, str, Optional[Dict]], float]  # (correcta, usuario, features de referencia)
+
+STAGES = (
+    Stage("reasoning_score", 0.15, 0, lambda c, u, ref: reasoning_structure_score(u)),
+    Stage("numeric_score", 0.60, 1, lambda c, u, ref: numeric_validation(c, u, ref)),
+    Stage("semantic_score", 0.15, 10,
+          lambda c, u, ref: semantic_similarity(c, u, emb_a=ref["embedding"] if ref else None)),
+    Stage("concept_score", 0.10, 20, lambda c, u, ref: concept_coverage(c, u, ref)),
+)
+
+def _band(score: float, thresholds: Sequence[float]) -> int:
+    return sum(1 for t in thresholds if score >= t)
+
+def score_bounds(scores: Dict[str, float]) -> Tuple[float, float]:
+    """Cotas de final_score con las métricas ya calculadas (las pendientes valen entre 0 y 1)."""
+    lower = sum(st.weight * scores[st.metric] for st in STAGES if st.metric in scores)
+    upper = lower + sum(st.weight for st in STAGES if st.metric not in scores)
+    return round(max(0.0, min(1.0, lower)), 3), round(max(0.0, min(1.0, upper)), 3)
+
+def evaluate_staged(
+    correct_answer: str,
+    user_answer: str,
+    reference: Optional[Dict] = None,
+    thresholds: Optional[Sequence[float]] = PROGRESSION_THRESHOLDS,
+) -> Dict[str, Any]:
+    """
+    Ejecuta las etapas de la más barata a la más cara y se detiene en cuanto las
+    pendientes ya no pueden cambiar la banda de `thresholds` (decisión de progresión).
+
+    Las métricas no calculadas quedan a None y se listan en `pending_stages`;
+    `final_score` es entonces la cota inferior (misma banda que el valor final) y
+    `final_score_max` la superior. Con thresholds=None se calculan todas.
+    """
+    scores: Dict[str, float] = {}
+    for stage in sorted(STAGES, key=lambda st: st.cost):
+        if thresholds:
+            lower, upper = score_bounds(scores)
+            if _band(lower, thresholds) == _band(upper, thresholds):
+                break
+        scores[stage.metric] = stage.run(correct_answer, user_answer, reference)
+
+    if len(scores) == len(STAGES):
+        return _metrics(
+            scores["semantic_score"], scores["numeric_score"],
+            scores["concept_score"], scores["reasoning_score"]
+        )
+    lower, upper = score_bounds(scores)
+    result: Dict[str, Any] = {st.metric: None for st in STAGES}
+    result.update({metric: round(value, 3) for metric, value in scores.items()})
+    result["final_score"] = lower
+    result["final_score_max"] = upper
+    result["pending_stages"] = [st.metric for st in STAGES if st.metric not in scores]
+    return result
+
+def evaluate_full(correct_answer: str, user_answer: str, reference: Optional[Dict] = None) -> Dict[str, Any]:
     """
     Función principal a llamar desde el backend.
+
+    reference: features precalculados de correct_answer (reference_features); si no
+    se pasan, se usan los de la caché del proceso o se calculan ahora.
+    """
+    try:
+        if reference is None:
+            reference = reference_features(correct_answer)
+        return evaluate_staged(correct_answer, user_answer, reference, thresholds=None)
+    except Exception as e:
+        logger.error(f"Error en evaluación: {e}")
+        return _error_metrics(e)
+
+def evaluate_progression(
+    correct_answer: str, user_answer: str, reference: Optional[Dict] = None
+) -> Dict[str, Any]:
+    """
+    Evaluación mínima para decidir la progresión: puede dejar etapas pendientes
+    (ver evaluate_staged), que se completan después con evaluate_full.
     """
     try:
-        sem = semantic_similarity(correct_answer, user_answer)
-        num = numeric_validation(correct_answer, user_answer)
-        concepts = concept_coverage(correct_answer, user_answer)
-        reasoning = reasoning_structure_score(user_answer)
-        final = final_hybrid_score(sem, num, concepts, reasoning)
-
-        return {
-            "semantic_score": round(sem, 3),
-            "numeric_score": round(num, 3),
-            "concept_score": round(concepts, 3),
-            "reasoning_score": round(reasoning, 3),
-            "final_score": round(final, 3)
-        }
+        return evaluate_staged(correct_answer, user_answer, reference)
     except Exception as e:
         logger.error(f"Error en evaluación: {e}")
-        return {
-            "semantic_score": 0, "numeric_score": 0, 
-            "concept_score": 0, "reasoning_score": 0, 
-            "final_score": 0, "error": str(e)
-        }
\ No newline at end of file
+        return _error_metrics(e)
+
+def evaluate_many(pairs: Sequence[Tuple[str, str]], batch_size: int = 64) -> List[Dict[str, Any]]:
+    """
+    Evalúa muchos pares (respuesta correcta, respuesta del usuario) de una vez.
+
+    Mismas métricas que `evaluate_full`, pero con los textos (deduplicados) en un
+    único `encode` por lotes, un `nlp.pipe`, una llamada a KeyBERT y la similitud
+    coseno de todos los pares como una operación matricial.
+    """
+    pairs = [(c or "", u or "") for c, u in pairs]
+    if not pairs:
+        return []
+    try:
+        models = EvaluatorModels()
+        # Las respuestas de referencia se repiten mucho (regrading): cada texto se procesa una vez
+        texts = list(dict.fromkeys(t for pair in pairs for t in pair))
+        index = {t: i for i, t in enumerate(texts)}
+        ref_idx = [index[c] for c, _ in pairs]
+        user_idx = [index[u] for _, u in pairs]
+
+        embeddings = models.embedding_model.encode(texts, batch_size=batch_size, convert_to_tensor=True)
+        cos = util.pairwise_cos_sim(embeddings[ref_idx], embeddings[user_idx]).tolist()
+
+        docs = list(models.nlp.pipe(texts, batch_size=batch_size))
+        keywords = models.kw_model.extract_keywords(texts, top_n=7)
+        if len(texts) == 1:
+            # KeyBERT devuelve una lista plana si solo hay un documento
+            keywords = [keywords]
+        concepts = [
+            set(_concepts_from(text, doc, [kw[0] for kw in kws]))
+            for text, doc, kws in zip(texts, docs, keywords)
+        ]
+
+        results = []
+        for (correct, user), score, ci, ui in zip(pairs, cos, ref_idx, user_idx):
+            sem = max(0.0, min(1.0, (score + 1) / 2))
+            num = numeric_validation(correct, user)
+            cov = _coverage(concepts[ci], concepts[ui])
+            results.append(_metrics(sem, num, cov, reasoning_structure_score(user)))
+        return results
+    except Exception as e:
+        # Un texto problemático no debe tumbar todo el lote: se evalúa par a par
+        logger.error(f"Error en evaluación por lotes ({len(pairs)} pares), evaluando uno a uno: {e}")
+        return [evaluate_full(c, u) for c, u in pairs]
\ No newline at end of file
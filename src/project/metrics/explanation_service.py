@@ -1,50 +1,18 @@
-import os
 import logging
 
-try:
-    import google.generativeai as genai
-except ImportError:
-    pass
-try:
-    from openai import OpenAI
-except ImportError:
-    pass
+from project.llm import get_llm
 
 logger = logging.getLogger(__name__)
 
 class ExplanationService:
     def __init__(self):
-        self.provider = os.getenv("LLM_PROVIDER", "GEMINI").upper()
-        self.api_key_gemini = os.getenv("GEMINI_API_KEY")
-        self.api_key_deepseek = os.getenv("DEEPSEEK_API_KEY")
-        self.api_key_groq = os.getenv("GROQ_API_KEY")
-        
-        self.client = None
-        self.model = None
-
-        if self.provider == "DEEPSEEK":
-            if not self.api_key_deepseek:
-                raise RuntimeError("DEEPSEEK_API_KEY no configurada.")
-            self.client = OpenAI(api_key=self.api_key_deepseek, base_url="https://api.deepseek.com")
-            self.model_name = "deepseek-reasoner" 
-            logger.info("ExplanationService configurado con DEEPSEEK (Reasoner)")
-        
-        elif self.provider == "GROQ":
-            if not self.api_key_groq:
-                raise RuntimeError("GROQ_API_KEY no configurada.")
-            self.client = OpenAI(api_key=self.api_key_groq, base_url="https://api.groq.com/openai/v1")
-            self.model_name = "llama-3.3-70b-versatile" # Llama 3 es muy bueno razonando
-            logger.info("ExplanationService configurado con GROQ")
-
-        else:
-            if not self.api_key_gemini:
-                raise RuntimeError("GEMINI_API_KEY no configurada.")
-            genai.configure(api_key=self.api_key_gemini)
-            self.model = genai.GenerativeModel("gemini-2.5-flash")
-            logger.info("ExplanationService configurado con GEMINI")
-
-    def generate_explanation(self, question, correct_answer):
-        prompt = f"""
+        self.llm = get_llm()
+        self.provider = self.llm.provider
+        self.model_name = self.llm.settings.reasoning_model
+        logger.info(f"ExplanationService configurado con {self.provider} ({self.model_name})")
+
+    def _build_prompt(self, question, correct_answer):
+        return f"""
 Eres un profesor experto en matemáticas y estadística.
 
 Tu tarea es generar **una explicación paso a paso**, breve, clara y ordenada,
@@ -65,23 +33,24 @@ RESPUESTA OFICIAL:
 
 Genera AHORA una explicación paso a paso, concisa y entendible.
 """
+
+    def _llm_kwargs(self, question, correct_answer):
+        return dict(
+            model=self.model_name,
+            temperature=0.4,
+            max_tokens=8192,
+            prompt_type="explanation", prompt_version=1,
+            cache_inputs={"question": question, "correct_answer": correct_answer}
+        )
+
+    async def generate_explanation(self, question, correct_answer):
         try:
             logger.info(f"Generando explicación con {self.provider}...")
-            
-            if self.provider in ["DEEPSEEK", "GROQ"]:
-                response = self.client.chat.completions.create(
-                    model=self.model_name,
-                    messages=[{"role": "user", "content": prompt}],
-                    max_tokens=4096,
-                    temperature=0.4
-                )
-                text = response.choices[0].message.content
-            else:
-                response = self.model.generate_content(
-                    prompt,
-                    generation_config={"temperature": 0.4, "max_output_tokens": 8192}
-                )
-                text = response.text
+
+            text = await self.llm.complete(
+                self._build_prompt(question, correct_answer),
+                **self._llm_kwargs(question, correct_answer)
+            )
 
             if not text:
                 raise ValueError("Respuesta vacía del LLM")
@@ -89,4 +58,13 @@ Genera AHORA una explicación paso a paso, concisa y entendible.
 
         except Exception as e:
             logger.exception(f"Error generando explicación con {self.provider}")
-            raise e
\ No newline at end of file
+            raise e
+
+    async def stream_explanation(self, question, correct_answer):
+        """Versión en streaming: va devolviendo fragmentos de la explicación."""
+        logger.info(f"Generando explicación (streaming) con {self.provider}...")
+        async for delta in self.llm.stream(
+            self._build_prompt(question, correct_answer),
+            **self._llm_kwargs(question, correct_answer)
+        ):
+            yield delta
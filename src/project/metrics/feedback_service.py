@@ -1,66 +1,26 @@
-import os
 import logging
 
-try:
-    import google.generativeai as genai
-except ImportError:
-    pass
-try:
-    from openai import OpenAI
-except ImportError:
-    pass
+from project.llm import get_llm
 
 logger = logging.getLogger(__name__)
 
 class FeedbackService:
     def __init__(self):
-        self.provider = os.getenv("LLM_PROVIDER", "GEMINI").upper()
-        self.api_key_gemini = os.getenv("GEMINI_API_KEY")
-        self.api_key_deepseek = os.getenv("DEEPSEEK_API_KEY")
-        self.api_key_groq = os.getenv("GROQ_API_KEY")
-        
-        self.client = None
-        self.model = None
-
-        if self.provider == "DEEPSEEK":
-            if not self.api_key_deepseek:
-                raise ValueError("DEEPSEEK_API_KEY no configurada.")
-            self.client = OpenAI(api_key=self.api_key_deepseek, base_url="https://api.deepseek.com")
-            self.model_name = "deepseek-reasoner"
-            logger.info("FeedbackService configurado con DEEPSEEK (Reasoner)")
-            self._warm_up_client()
-        
-        elif self.provider == "GROQ":
-            if not self.api_key_groq:
-                raise ValueError("GROQ_API_KEY no configurada.")
-            self.client = OpenAI(api_key=self.api_key_groq, base_url="https://api.groq.com/openai/v1")
-            self.model_name = "llama-3.3-70b-versatile"
-            logger.info("FeedbackService configurado con GROQ")
-            self._warm_up_client()
-
-        else:
-            if not self.api_key_gemini:
-                raise ValueError("GEMINI_API_KEY no configurada.")
-            genai.configure(api_key=self.api_key_gemini)
-            self.model = genai.GenerativeModel("gemini-2.5-flash")
-            logger.info("FeedbackService configurado con GEMINI")
-            try:
-                self.model.generate_content("Hi")
-            except Exception as e:
-                logger.warning(f"Gemini warm-up failed: {e}")
-
-    def _warm_up_client(self):
+        self.llm = get_llm()
+        self.provider = self.llm.provider
+        # DeepSeek usa su modelo de razonamiento para el feedback
+        self.model_name = self.llm.settings.reasoning_model
+        logger.info(f"FeedbackService configurado con {self.provider} ({self.model_name})")
+
+    async def warm_up(self):
+        """Primera llamada mínima para abrir la conexión del pool con el proveedor."""
         try:
-            self.client.chat.completions.create(
-                model=self.model_name,
-                messages=[{"role": "user", "content": "Hi"}],
-                max_tokens=1
-            )
+            await self.llm.complete("Hi", model=self.model_name, max_tokens=1, timeout=15)
         except Exception as e:
             logger.warning(f"{self.provider} warm-up failed: {e}")
 
-    def generate_feedback(self, question, correct_answer, user_answer, evaluation):
-        prompt = f"""
+    def _build_prompt(self, question, correct_answer, user_answer, evaluation):
+        return f"""
 Eres un evaluador experto de entrevistas cuantitativas.
 Tu tarea es analizar la respuesta del usuario de forma breve y directa.
 NO resuelvas el problema, NO des la solución paso a paso.
@@ -89,26 +49,29 @@ METRICAS:
 
 Genera el feedback AHORA en español.
 """
+
+    def _llm_kwargs(self, question, correct_answer, user_answer, evaluation):
+        return dict(
+            model=self.model_name,
+            temperature=0.4,
+            max_tokens=8192,
+            prompt_type="feedback", prompt_version=1,
+            cache_inputs={
+                "question": question,
+                "correct_answer": correct_answer,
+                "user_answer": user_answer,
+                "evaluation": evaluation,
+            }
+        )
+
+    async def generate_feedback(self, question, correct_answer, user_answer, evaluation):
         try:
             logger.info(f"Generando feedback con {self.provider}...")
-            
-            if self.provider in ["DEEPSEEK", "GROQ"]:
-                response = self.client.chat.completions.create(
-                    model=self.model_name,
-                    messages=[{"role": "user", "content": prompt}],
-                    temperature=0.4,
-                    max_tokens=4096
-                )
-                text = response.choices[0].message.content
-            else:
-                response = self.model.generate_content(
-                    prompt,
-                    generation_config={"temperature": 0.4, "max_output_tokens": 8192}
-                )
-                if response.candidates and response.candidates[0].content.parts:
-                    text = response.candidates[0].content.parts[0].text
-                else:
-                    text = ""
+
+            text = await self.llm.complete(
+                self._build_prompt(question, correct_answer, user_answer, evaluation),
+                **self._llm_kwargs(question, correct_answer, user_answer, evaluation)
+            )
 
             if not text:
                 return "No se pudo generar feedback."
@@ -116,4 +79,13 @@ Genera el feedback AHORA en español.
 
         except Exception as e:
             logger.exception(f"Error generando feedback con {self.provider}: {e}")
-            return "Ocurrió un error generando el feedback."
\ No newline at end of file
+            return "Ocurrió un error generando el feedback."
+
+    async def stream_feedback(self, question, correct_answer, user_answer, evaluation):
+        """Versión en streaming: va devolviendo fragmentos del feedback."""
+        logger.info(f"Generando feedback (streaming) con {self.provider}...")
+        async for delta in self.llm.stream(
+            self._build_prompt(question, correct_answer, user_answer, evaluation),
+            **self._llm_kwargs(question, correct_answer, user_answer, evaluation)
+        ):
+            yield delta
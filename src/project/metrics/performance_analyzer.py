@@ -1,16 +1,11 @@
-import os
-import google.generativeai as genai
+from project.llm import get_llm
 
 
 class PerformanceAnalyzer:
     def __init__(self):
-        api_key = os. getenv("GEMINI_API_KEY")
-        if not api_key:
-            raise ValueError("GEMINI_API_KEY no configurada")
-        genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel("gemini-2. 5-flash")
+        self.llm = get_llm()
 
-    def generate_performance_summary(
+    async def generate_performance_summary(
         self, 
         answers: list, 
         global_score: dict,
@@ -51,8 +46,7 @@ class PerformanceAnalyzer:
         """
         
         try:
-            response = self.model.generate_content(prompt)
-            return response. text. strip()
+            return await self.llm.complete(prompt)
         except Exception as e:
             print(f"Error generando resumen: {e}")
             return f"Score: {global_score['score']}/100.  {global_score['descripcion']}"
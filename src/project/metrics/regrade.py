@@ -0,0 +1,129 @@
+"""
+Re-evaluación offline de sesiones guardadas (Redis o SQLite, ver project.session_store).
+
+Recalcula las métricas de las respuestas con `evaluate_many` (lotes grandes en
+un solo proceso) y guarda solo el campo `metrics` de cada una. Útil tras cambiar
+el evaluador.
+
+Uso:
+    PYTHONPATH=src python -m project.metrics.regrade --all
+    PYTHONPATH=src python -m project.metrics.regrade --session <id> [--session <id> ...] --dry-run
+"""
+import os
+import time
+import asyncio
+import argparse
+import logging
+from typing import Iterable, List
+
+from .evaluator import evaluate_many
+
+logger = logging.getLogger(__name__)
+
+
+async def _session_ids(store, sessions: Iterable[str], all_sessions: bool) -> List[str]:
+    if all_sessions:
+        return await store.session_ids()
+    return list(sessions)
+
+
+async def regrade_sessions(
+    store,
+    session_ids: List[str],
+    only_missing: bool = False,
+    batch_size: int = 256,
+    dry_run: bool = False,
+    verbose: bool = True,
+) -> int:
+    """
+    Re-evalúa las respuestas de las sesiones indicadas.
+
+    Args:
+        store: almacén de sesiones (ver project.session_store).
+        only_missing: solo las respuestas sin métricas (o con etapas pendientes).
+        batch_size: pares por llamada a `evaluate_many`.
+        dry_run: calcula pero no guarda.
+    Returns:
+        Número de respuestas evaluadas.
+    """
+    # (session_id, lista de respuestas, índice de la respuesta)
+    answers_by_session = {}
+    targets = []
+    for sid in session_ids:
+        answers = await store.get_answers(sid)
+        if not answers:
+            continue
+        answers_by_session[sid] = answers
+        for i, ans in enumerate(answers):
+            if only_missing and ans.get("metrics") and not ans["metrics"].get("pending_stages"):
+                continue
+            if ans.get("correct_answer") is None or ans.get("answer") is None:
+                continue
+            targets.append((sid, i))
+
+    if verbose:
+        print(f"[Regrade] {len(targets)} respuestas en {len(answers_by_session)} sesiones")
+
+    start = time.perf_counter()
+    for offset in range(0, len(targets), batch_size):
+        batch = targets[offset:offset + batch_size]
+        pairs = [
+            (answers_by_session[sid][i]["correct_answer"], answers_by_session[sid][i]["answer"])
+            for sid, i in batch
+        ]
+        for (sid, i), metrics in zip(batch, evaluate_many(pairs)):
+            answers_by_session[sid][i]["metrics"] = metrics
+        if verbose:
+            print(f"[Regrade] {min(offset + batch_size, len(targets))}/{len(targets)}")
+    elapsed = time.perf_counter() - start
+
+    if not dry_run:
+        for sid, i in targets:
+            ans = answers_by_session[sid][i]
+            await store.set_answer_field(sid, ans["question_number"], "metrics", ans["metrics"])
+
+    if verbose and targets:
+        print(f"[Regrade] {len(targets)} respuestas en {elapsed:.1f}s ({len(targets) / elapsed:.1f} pares/s)"
+              + (" [dry-run]" if dry_run else ""))
+    return len(targets)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-evalúa las respuestas de sesiones guardadas.")
+    parser.add_argument("--session", action="append", default=[], help="ID de sesión (repetible)")
+    parser.add_argument("--all", action="store_true", help="Todas las sesiones del almacén")
+    parser.add_argument("--only-missing", action="store_true", help="Solo respuestas sin métricas")
+    parser.add_argument("--batch-size", type=int, default=256, help="Pares por lote")
+    parser.add_argument("--dry-run", action="store_true", help="No guarda los resultados")
+    args = parser.parse_args()
+
+    if not args.session and not args.all:
+        parser.error("Indica --session <id> o --all")
+
+    from dotenv import load_dotenv
+    import redis
+    import redis.asyncio as aioredis
+    from ..session_store import create_session_store
+
+    async def main():
+        # Mismo backend que la app: Redis si responde, si no SQLite (SESSION_BACKEND)
+        client = aioredis.from_url(os.getenv("REDIS_URL", "redis://localhost:6379/0"), decode_responses=True)
+        try:
+            await client.ping()
+        except redis.ConnectionError:
+            client = None
+        store = create_session_store(client)
+        try:
+            await regrade_sessions(
+                store,
+                await _session_ids(store, args.session, args.all),
+                only_missing=args.only_missing,
+                batch_size=args.batch_size,
+                dry_run=args.dry_run,
+            )
+        finally:
+            if client:
+                await client.aclose()
+
+    load_dotenv()
+    asyncio.run(main())
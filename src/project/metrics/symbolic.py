@@ -0,0 +1,173 @@
+"""
+Equivalencia simbólica acotada en tiempo y tamaño.
+
+`numeric_validation` compara expresiones extraídas de texto libre; un
+`simplify` sin límites sobre una respuesta patológica (p.ej. `9^9^9`) puede
+bloquear un proceso durante minutos. Aquí:
+
+1. Las expresiones se parsean sin evaluar (`evaluate=False`) y se rechazan si
+   superan el presupuesto de tamaño (caracteres, nodos, exponentes).
+2. Los parseos se cachean por cadena.
+3. La equivalencia se prueba numéricamente (valor exacto si no hay símbolos,
+   puntos aleatorios si los hay). La comparación se hace sobre los valores de
+   SymPy (30 dígitos): en float/complex, `10^400` desborda a inf y parecería
+   igual a cualquier cosa. Los valores no finitos no deciden nada.
+4. `simplify` solo se usa como último recurso. Todo el cálculo está bajo un
+   temporizador duro (setitimer), que solo existe en el hilo principal (los
+   procesos de evaluación); fuera de él no se llega a usar simplify.
+"""
+import random
+import signal
+import logging
+import threading
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Optional
+
+from sympy import Max, Pow, preorder_traversal, simplify
+from sympy.parsing.sympy_parser import convert_xor, parse_expr, standard_transformations
+
+logger = logging.getLogger(__name__)
+
+MAX_EXPR_CHARS = 200
+MAX_EXPR_NODES = 200
+MAX_EXPONENT = 1000
+SAMPLE_POINTS = 5
+REL_TOLERANCE = 1e-9
+SIMPLIFY_BUDGET = 0.5  # segundos (presupuesto total por comparación)
+
+_TRANSFORMATIONS = standard_transformations + (convert_xor,)
+
+
+class SymbolicTimeout(Exception):
+    pass
+
+
+@contextmanager
+def _time_limit(seconds: float):
+    """Lanza SymbolicTimeout si el bloque tarda más de `seconds` (solo en el hilo principal)."""
+    def handler(signum, frame):
+        raise SymbolicTimeout()
+
+    previous = signal.signal(signal.SIGALRM, handler)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def _can_use_timer() -> bool:
+    return hasattr(signal, "setitimer") and threading.current_thread() is threading.main_thread()
+
+
+def _within_budget(expr) -> bool:
+    nodes = 0
+    for node in preorder_traversal(expr):
+        nodes += 1
+        if nodes > MAX_EXPR_NODES:
+            return False
+    # Postorden implícito: si un exponente contiene otra potencia, la interior ya
+    # está acotada, así que evaluar el exponente es barato
+    for node in reversed(list(preorder_traversal(expr))):
+        if isinstance(node, Pow) and not node.exp.free_symbols:
+            try:
+                if abs(float(node.exp.evalf(15))) > MAX_EXPONENT:
+                    return False
+            except (TypeError, ValueError):
+                return False
+    return True
+
+
+@lru_cache(maxsize=4096)
+def parse(text: str):
+    """Parsea `text` sin evaluar; None si no es válido o excede el presupuesto."""
+    if not text or len(text) > MAX_EXPR_CHARS:
+        return None
+    try:
+        expr = parse_expr(text, transformations=_TRANSFORMATIONS, evaluate=False)
+    except Exception:
+        return None
+    return expr if _within_budget(expr) else None
+
+
+def _value(expr, subs=None):
+    """Valor numérico de `expr` (30 dígitos), o None si no es un número finito."""
+    value = expr.evalf(30, subs=subs)
+    if not value.is_number or value.is_finite is not True:
+        return None
+    return value
+
+
+def _close(a, b) -> bool:
+    return bool(abs(a - b) <= REL_TOLERANCE * Max(abs(a), abs(b), 1))
+
+
+def _numeric_equivalent(a, b) -> Optional[bool]:
+    symbols = a.free_symbols | b.free_symbols
+    if not symbols:
+        va, vb = _value(a), _value(b)
+        if va is None or vb is None:
+            return None
+        return _close(va, vb)
+
+    rng = random.Random(0)
+    checked = 0
+    for _ in range(SAMPLE_POINTS * 2):
+        point = {s: rng.uniform(0.5, 2.5) for s in symbols}
+        try:
+            va, vb = _value(a, point), _value(b, point)
+        except (TypeError, ValueError, ZeroDivisionError):
+            continue
+        if va is None or vb is None:
+            # Polo o desbordamiento en este punto: se prueba con otro
+            continue
+        if not _close(va, vb):
+            return False
+        checked += 1
+        if checked >= SAMPLE_POINTS:
+            return True
+    return None
+
+
+def _equivalent(a_text: str, b_text: str, allow_simplify: bool) -> Optional[bool]:
+    a, b = parse(a_text), parse(b_text)
+    if a is None or b is None:
+        return None
+    try:
+        result = _numeric_equivalent(a, b)
+    except SymbolicTimeout:
+        raise
+    except Exception:
+        result = None
+    # Sin símbolos la evaluación numérica es exacta: si no hay valor finito (1/0, oo),
+    # simplify tampoco puede decidir
+    if result is not None or not allow_simplify or not (a.free_symbols | b.free_symbols):
+        return result
+    try:
+        return simplify(a - b) == 0
+    except SymbolicTimeout:
+        raise
+    except Exception:
+        return None
+
+
+def equivalent(a_text: str, b_text: str, budget: float = SIMPLIFY_BUDGET) -> Optional[bool]:
+    """
+    ¿Son equivalentes las expresiones `a_text` y `b_text`?
+
+    Todo el cálculo (parseo, evaluación numérica y simplify) está acotado por
+    `budget` segundos; sin temporizador disponible no se llega a usar simplify.
+
+    Returns:
+        True / False, o None si no se puede decidir dentro del presupuesto.
+    """
+    if not _can_use_timer():
+        return _equivalent(a_text, b_text, allow_simplify=False)
+    try:
+        with _time_limit(budget):
+            return _equivalent(a_text, b_text, allow_simplify=True)
+    except SymbolicTimeout:
+        logger.warning(f"[Symbolic] Presupuesto de {budget}s agotado: {a_text!r} vs {b_text!r}")
+        return None
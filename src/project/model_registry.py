@@ -0,0 +1,306 @@
+"""
+Registro de modelos compartido por todo el proceso.
+
+Cada modelo (SentenceTransformer, spaCy, KeyBERT) se carga una sola vez por
+proceso y se reparte como un handle compartido; RAG y evaluador usan las mismas
+instancias en lugar de cargar cada uno sus propios pesos.
+
+- Los `encode` de un mismo modelo se serializan con un lock (seguro entre hilos).
+- `SharedEmbeddings` adapta un modelo del registro a la interfaz Embeddings de LangChain.
+- Con SHARED_EMBEDDING_MODEL un único modelo sirve tanto para recuperación como
+  para puntuación (ojo: las bases Chroma creadas con otro modelo deben regenerarse).
+- `memory_report()` informa de la memoria residente de cada modelo.
+- EMBEDDING_BACKEND elige el runtime de los SentenceTransformer: PyTorch, ONNX
+  Runtime o ONNX cuantizado a int8 (dinámico) para nodos solo-CPU. El modelo
+  cuantizado se exporta una vez a ONNX_MODELS_DIR y se reutiliza.
+
+Configuración (variables de entorno):
+    RETRIEVAL_EMBEDDING_MODEL  modelo de embeddings del RAG (multi-qa-mpnet-base-dot-v1)
+    SCORING_EMBEDDING_MODEL    modelo de embeddings del evaluador (all-mpnet-base-v2)
+    SHARED_EMBEDDING_MODEL     si se define, sustituye a los dos anteriores
+    EMBEDDING_BACKEND          torch | onnx | onnx-int8 (por defecto torch)
+    ONNX_QUANTIZATION          avx512_vnni | avx512 | avx2 | arm64 (por defecto, según la CPU)
+"""
+import os
+import shutil
+import platform
+import logging
+import threading
+from typing import Any, Dict, List, Optional
+
+try:
+    from langchain_core.embeddings import Embeddings
+except ImportError:
+    Embeddings = object
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RETRIEVAL_MODEL = "sentence-transformers/multi-qa-mpnet-base-dot-v1"
+DEFAULT_SCORING_MODEL = "sentence-transformers/all-mpnet-base-v2"
+DEFAULT_SPACY_MODEL = "es_core_news_md"
+EMBEDDING_BACKENDS = ("torch", "onnx", "onnx-int8")
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ONNX_MODELS_DIR = os.path.join(BASE_DIR, "database", "onnx_models")
+
+# Reentrante: cargar KeyBERT carga a su vez el SentenceTransformer compartido
+_lock = threading.RLock()
+_models: Dict[str, Any] = {}
+_load_stats: Dict[str, Dict[str, Any]] = {}
+
+
+def retrieval_model_name() -> str:
+    return os.getenv("SHARED_EMBEDDING_MODEL") or os.getenv("RETRIEVAL_EMBEDDING_MODEL", DEFAULT_RETRIEVAL_MODEL)
+
+
+def scoring_model_name() -> str:
+    return os.getenv("SHARED_EMBEDDING_MODEL") or os.getenv("SCORING_EMBEDDING_MODEL", DEFAULT_SCORING_MODEL)
+
+
+def embedding_backend() -> str:
+    backend = os.getenv("EMBEDDING_BACKEND", "torch").lower()
+    if backend not in EMBEDDING_BACKENDS:
+        logger.warning(f"[ModelRegistry] EMBEDDING_BACKEND '{backend}' no soportado, usando torch")
+        return "torch"
+    return backend
+
+
+def _quantization_config() -> str:
+    config = os.getenv("ONNX_QUANTIZATION")
+    if config:
+        return config
+    if platform.machine().lower() in {"arm64", "aarch64"}:
+        return "arm64"
+    try:
+        with open("/proc/cpuinfo") as f:
+            flags = f.read()
+    except OSError:
+        return "avx2"
+    if "avx512_vnni" in flags:
+        return "avx512_vnni"
+    if "avx512" in flags:
+        return "avx512"
+    return "avx2"
+
+
+def default_device() -> str:
+    import torch
+    if torch.cuda.is_available():
+        return "cuda"
+    if torch.backends.mps.is_available():
+        return "mps"
+    return "cpu"
+
+
+def _rss_bytes() -> Optional[int]:
+    """Memoria residente actual del proceso (Linux: /proc; resto: pico vía resource)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        try:
+            import resource
+            import sys
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            return peak if sys.platform == "darwin" else peak * 1024
+        except Exception:
+            return None
+
+
+def _get_or_load(key: str, loader):
+    model = _models.get(key)
+    if model is not None:
+        return model
+    with _lock:
+        # Doble comprobación: otro hilo pudo cargarlo mientras esperábamos el lock
+        model = _models.get(key)
+        if model is None:
+            before = _rss_bytes()
+            logger.info(f"[ModelRegistry] Cargando {key}...")
+            model = loader()
+            after = _rss_bytes()
+            _models[key] = model
+            _load_stats[key] = {"rss_delta_mb": _mb(after - before) if before and after else None}
+            logger.info(f"[ModelRegistry] {key} cargado (+{_load_stats[key]['rss_delta_mb']} MB)")
+    return model
+
+
+def _mb(n: Optional[int]) -> Optional[float]:
+    return round(n / 2**20, 1) if n is not None else None
+
+
+class SharedSentenceTransformer:
+    """Handle compartido de un SentenceTransformer: `encode` serializado con un lock."""
+
+    def __init__(self, name: str, model, backend: str = "torch", onnx_file: Optional[str] = None):
+        self.name = name
+        self.model = model
+        self.backend = backend
+        self.onnx_file = onnx_file
+        self._lock = threading.Lock()
+
+    def encode(self, *args, **kwargs):
+        with self._lock:
+            return self.model.encode(*args, **kwargs)
+
+    def __getattr__(self, attr):
+        return getattr(self.model, attr)
+
+
+def _export_quantized_onnx(name: str, config: str) -> str:
+    """
+    Exporta `name` a ONNX y lo cuantiza a int8 (una vez). Devuelve el directorio
+    local del modelo, que contiene onnx/model_qint8_<config>.onnx.
+    """
+    from sentence_transformers import SentenceTransformer, export_dynamic_quantized_onnx_model
+
+    target = os.path.join(ONNX_MODELS_DIR, name.replace("/", "__"))
+    file_name = f"onnx/model_qint8_{config}.onnx"
+    if os.path.exists(os.path.join(target, file_name)):
+        return target
+
+    # Se exporta en un directorio temporal y se mueve al final: otro proceso nunca ve un modelo a medias
+    tmp = f"{target}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp, ignore_errors=True)
+    try:
+        logger.info(f"[ModelRegistry] Exportando {name} a ONNX int8 ({config})...")
+        model = SentenceTransformer(name, backend="onnx", device="cpu", trust_remote_code=True)
+        model.save_pretrained(tmp)
+        export_dynamic_quantized_onnx_model(model, quantization_config=config, model_name_or_path=tmp)
+        if os.path.exists(os.path.join(target, file_name)):
+            shutil.rmtree(tmp, ignore_errors=True)
+        else:
+            shutil.rmtree(target, ignore_errors=True)
+            os.replace(tmp, target)
+    except Exception:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+    return target
+
+
+def get_sentence_transformer(
+    name: str, device: Optional[str] = None, backend: Optional[str] = None
+) -> SharedSentenceTransformer:
+    """
+    Devuelve el SentenceTransformer `name` del proceso (se carga la primera vez).
+
+    backend: torch | onnx | onnx-int8 (por defecto EMBEDDING_BACKEND). Los backends
+    ONNX se ejecutan siempre en CPU.
+    """
+    backend = backend or embedding_backend()
+    device = "cpu" if backend != "torch" else (device or default_device())
+
+    def load():
+        from sentence_transformers import SentenceTransformer
+        if backend == "torch":
+            model = SentenceTransformer(name, device=device, trust_remote_code=True)
+            return SharedSentenceTransformer(name, model)
+        if backend == "onnx":
+            model = SentenceTransformer(name, backend="onnx", device="cpu", trust_remote_code=True)
+            return SharedSentenceTransformer(name, model, backend)
+        config = _quantization_config()
+        path = _export_quantized_onnx(name, config)
+        file_name = f"onnx/model_qint8_{config}.onnx"
+        model = SentenceTransformer(
+            path, backend="onnx", device="cpu", trust_remote_code=True, model_kwargs={"file_name": file_name}
+        )
+        return SharedSentenceTransformer(name, model, backend, onnx_file=os.path.join(path, file_name))
+
+    return _get_or_load(f"sentence-transformers:{name}@{device}:{backend}", load)
+
+
+def get_spacy(name: str = DEFAULT_SPACY_MODEL):
+    """Devuelve el pipeline de spaCy `name` del proceso (lo descarga si no está instalado)."""
+
+    def load():
+        import spacy
+        try:
+            return spacy.load(name)
+        except OSError:
+            logger.warning(f"Modelo '{name}' no encontrado. Descargando...")
+            from spacy.cli import download
+            download(name)
+            return spacy.load(name)
+
+    return _get_or_load(f"spacy:{name}", load)
+
+
+def get_keybert(name: str):
+    """KeyBERT sobre el SentenceTransformer compartido `name` (sin cargar pesos adicionales)."""
+
+    def load():
+        from keybert import KeyBERT
+        from keybert.backend import BaseEmbedder
+
+        shared = get_sentence_transformer(name)
+
+        class _SharedBackend(BaseEmbedder):
+            def __init__(self):
+                super().__init__()
+                self.embedding_model = shared
+
+            def embed(self, documents, verbose=False):
+                return shared.encode(documents, show_progress_bar=verbose)
+
+        return KeyBERT(model=_SharedBackend())
+
+    return _get_or_load(f"keybert:{name}", load)
+
+
+class SharedEmbeddings(Embeddings):
+    """Adaptador Embeddings de LangChain sobre un SentenceTransformer del registro."""
+
+    def __init__(
+        self, model_name: str, device: Optional[str] = None, batch_size: int = 32, backend: Optional[str] = None
+    ):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.model = get_sentence_transformer(model_name, device, backend)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors = self.model.encode(list(texts), batch_size=self.batch_size, normalize_embeddings=True)
+        return vectors.tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+def _torch_bytes(model) -> Optional[int]:
+    try:
+        params = sum(p.numel() * p.element_size() for p in model.parameters())
+        buffers = sum(b.numel() * b.element_size() for b in model.buffers())
+        return params + buffers
+    except Exception:
+        return None
+
+
+def _spacy_bytes(nlp) -> Optional[int]:
+    try:
+        return int(nlp.vocab.vectors.data.nbytes)
+    except Exception:
+        return None
+
+
+def memory_report() -> Dict[str, Any]:
+    """Memoria de cada modelo cargado: tamaño de pesos y crecimiento de RSS al cargarlo."""
+    models = {}
+    for key, model in list(_models.items()):
+        if isinstance(model, SharedSentenceTransformer):
+            if model.onnx_file:
+                weights = os.path.getsize(model.onnx_file)
+            else:
+                weights = _torch_bytes(model.model) if model.backend == "torch" else None
+        elif key.startswith("spacy:"):
+            weights = _spacy_bytes(model)
+        else:
+            # KeyBERT reutiliza los pesos del SentenceTransformer compartido
+            weights = 0
+        models[key] = {"weights_mb": _mb(weights), **_load_stats.get(key, {})}
+    return {
+        "pid": os.getpid(),
+        "rss_mb": _mb(_rss_bytes()),
+        "retrieval_model": retrieval_model_name(),
+        "scoring_model": scoring_model_name(),
+        "embedding_backend": embedding_backend(),
+        "models": models,
+    }
@@ -1,4 +1,11 @@
-# Exponer la clase RAG definida en rag.py cuando se importe el package src.project.rag
-from .rag import RAG
-
+# Exponer la clase RAG definida en rag.py cuando se importe el package src.project.rag.
+# Import perezoso: rag.py arrastra langchain/Chroma y los lectores de datasets, y no
+# debe cargarse al importar otros módulos del paquete (pool, banco de preguntas...).
 __all__ = ["RAG"]
+
+
+def __getattr__(name):
+    if name == "RAG":
+        from .rag import RAG
+        return RAG
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
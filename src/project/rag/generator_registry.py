@@ -0,0 +1,82 @@
+"""
+Registro de generadores de preguntas, uno por dataset.
+
+Cada `QuestionGenerator` (RAG + Chroma + banco de preguntas) se crea la primera
+vez que se pide su dataset y se reutiliza después; ninguna sesión cambia el
+dataset de otra, porque el dataset viaja con la sesión y no con un generador
+global. Se mantienen como máximo `max_resident` datasets cargados: al superar
+el límite se descarta el usado hace más tiempo (LRU). Las peticiones en curso
+conservan su referencia al generador descartado hasta terminar.
+
+Configuración (variables de entorno):
+    MAX_RESIDENT_DATASETS   generadores cargados a la vez por worker (por defecto 2)
+"""
+import os
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Any, Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+
+class GeneratorRegistry:
+    def __init__(self, factory: Callable[[str], Any], max_resident: int = 2):
+        """
+        Args:
+            factory: función dataset -> QuestionGenerator (bloqueante: carga Chroma y modelos).
+            max_resident: máximo de generadores cargados a la vez.
+        """
+        self.factory = factory
+        self.max_resident = max(1, max_resident)
+        self.hits = 0
+        self.loads = 0
+        self.evictions = 0
+        self._generators: "OrderedDict[str, Any]" = OrderedDict()
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    @classmethod
+    def from_env(cls, factory: Callable[[str], Any]) -> "GeneratorRegistry":
+        return cls(factory, max_resident=int(os.getenv("MAX_RESIDENT_DATASETS", "2")))
+
+    async def get(self, dataset_type: str):
+        """Generador del dataset (se carga en un hilo la primera vez)."""
+        generator = self._generators.get(dataset_type)
+        if generator is not None:
+            self._generators.move_to_end(dataset_type)
+            self.hits += 1
+            return generator
+
+        # Un lock por dataset: dos sesiones que piden el mismo dataset lo cargan una sola vez
+        lock = self._locks.setdefault(dataset_type, asyncio.Lock())
+        async with lock:
+            generator = self._generators.get(dataset_type)
+            if generator is None:
+                logger.info(f"[GeneratorRegistry] Cargando generador para '{dataset_type}'...")
+                generator = await asyncio.to_thread(self.factory, dataset_type)
+                self.loads += 1
+                self._generators[dataset_type] = generator
+                self._evict()
+            else:
+                self.hits += 1
+            self._generators.move_to_end(dataset_type)
+            return generator
+
+    def peek(self, dataset_type: str):
+        """Generador del dataset si ya está cargado, sin cargarlo ni alterar el orden LRU."""
+        return self._generators.get(dataset_type)
+
+    def _evict(self):
+        while len(self._generators) > self.max_resident:
+            dataset_type, _ = self._generators.popitem(last=False)
+            self.evictions += 1
+            logger.info(f"[GeneratorRegistry] Generador de '{dataset_type}' descargado (LRU)")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "resident": list(self._generators),
+            "max_resident": self.max_resident,
+            "hits": self.hits,
+            "loads": self.loads,
+            "evictions": self.evictions,
+        }
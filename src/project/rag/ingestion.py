@@ -0,0 +1,352 @@
+"""
+Pipeline de ingestión en streaming para indexar datasets en Chroma.
+
+    lector (generador) -> chunking en procesos -> lotes de embeddings -> escritura por lotes
+
+Cada etapa se comunica con la siguiente por una cola acotada: si el embedding o
+la escritura van más lentos, el lector y el chunking se frenan (backpressure) en
+lugar de acumular el corpus en memoria. El chunking se reparte entre procesos
+(usa varios núcleos), el embedding corre en el hilo que llama a `run` y la
+escritura en un hilo aparte, de modo que se solapan. La memoria queda acotada
+por el tamaño de las colas, no por el del corpus; solo crece el conjunto de IDs
+vistos (40 bytes por chunk), necesario para deduplicar y borrar obsoletos.
+
+Configuración (variables de entorno):
+    INGEST_WORKERS      procesos de chunking (por defecto núcleos - 1; 0 = en el propio proceso)
+    INGEST_QUEUE_SIZE   lotes en vuelo entre etapas (por defecto 4)
+"""
+import os
+import json
+import time
+import queue
+import hashlib
+import logging
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+# Textos por tarea de chunking (amortiza el coste de enviar datos a los procesos)
+TEXTS_PER_TASK = 32
+
+_DONE = object()
+_splitter = None
+
+
+# Un chunk con sus metadatos (dict escalar, ver utils.chunk_metadata); None = sin metadatos
+Item = Tuple[str, Optional[Dict[str, Any]]]
+
+
+def chunk_id(text: str, metadata: Optional[Dict[str, Any]] = None) -> str:
+    """
+    ID estable de un chunk: hash de su contenido y sus metadatos (el mismo chunk
+    siempre tiene el mismo ID; si cambian los metadatos, el chunk se reindexa).
+    """
+    payload = text
+    if metadata:
+        payload += "\0" + json.dumps(metadata, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def corpus_version(ids: Iterable[str]) -> str:
+    """Huella del conjunto de chunks (no depende del orden de lectura)."""
+    digest = hashlib.sha1()
+    for cid in sorted(ids):
+        digest.update(cid.encode("ascii"))
+    return digest.hexdigest()
+
+
+def _make_splitter(chunk_size: int, chunk_overlap: int):
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+    return RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        length_function=len,
+        add_start_index=True,
+    )
+
+
+def _init_chunker(chunk_size: int, chunk_overlap: int):
+    # Se ejecuta una vez en cada proceso de chunking
+    global _splitter
+    _splitter = _make_splitter(chunk_size, chunk_overlap)
+
+
+def _split_items(items: List[Item]) -> List[Item]:
+    return [(chunk, meta) for text, meta in items for chunk in _splitter.split_text(text)]
+
+
+class StageStats:
+    """Elementos procesados y tiempo ocupado de una etapa del pipeline."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.items = 0
+        self.batches = 0
+        self.busy = 0.0
+
+    def add(self, items: int, seconds: float):
+        self.items += items
+        self.batches += 1
+        self.busy += seconds
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "items": self.items,
+            "batches": self.batches,
+            "busy_seconds": round(self.busy, 2),
+            "items_per_second": round(self.items / self.busy, 1) if self.busy else None,
+        }
+
+
+class IngestionPipeline:
+    def __init__(
+        self,
+        embed: Callable[[List[str]], List[List[float]]],
+        write: Callable[[List[str], List[str], List[Optional[Dict]], List[List[float]]], None],
+        chunk_size: int = 1024,
+        chunk_overlap: int = 128,
+        workers: Optional[int] = None,
+        batch_size: int = 256,
+        queue_size: int = 4,
+        verbose: bool = True,
+        log_every: float = 10.0,
+    ):
+        """
+        Args:
+            embed: textos -> vectores (p.ej. `Embeddings.embed_documents`).
+            write: (ids, textos, metadatos, vectores) -> None; escribe un lote en el almacén vectorial.
+            workers: procesos de chunking; con 0 se trocea en un hilo del propio proceso.
+            batch_size: chunks por lote de embedding y de escritura (unidad de confirmación).
+            queue_size: lotes en vuelo entre cada par de etapas.
+            log_every: segundos entre informes de progreso.
+        """
+        self.embed = embed
+        self.write = write
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.workers = max(0, (os.cpu_count() or 2) - 1 if workers is None else workers)
+        self.batch_size = max(1, batch_size)
+        self.queue_size = max(1, queue_size)
+        self.verbose = verbose
+        self.log_every = log_every
+        self.stats = {name: StageStats(name) for name in ("read", "chunk", "embed", "write")}
+
+    @classmethod
+    def from_env(cls, embed, write, **kwargs) -> "IngestionPipeline":
+        workers = os.getenv("INGEST_WORKERS")
+        return cls(
+            embed,
+            write,
+            workers=int(workers) if workers else None,
+            queue_size=int(os.getenv("INGEST_QUEUE_SIZE", "4")),
+            **kwargs,
+        )
+
+    def _put(self, q: "queue.Queue", item, stop: threading.Event) -> bool:
+        """Encola esperando hueco (backpressure); False si el pipeline se ha detenido."""
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.2)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _chunk_batches(self, texts: Iterator[Item], stop: threading.Event) -> Iterator[List[Item]]:
+        """Trocea los textos en orden con como mucho `workers * 2` tareas en vuelo."""
+        read, chunk = self.stats["read"], self.stats["chunk"]
+
+        def next_task() -> List[Item]:
+            start = time.perf_counter()
+            task = list(islice(texts, TEXTS_PER_TASK))
+            if task:
+                read.add(len(task), time.perf_counter() - start)
+            return task
+
+        if not self.workers:
+            splitter = _make_splitter(self.chunk_size, self.chunk_overlap)
+            while not stop.is_set():
+                task = next_task()
+                if not task:
+                    return
+                start = time.perf_counter()
+                chunks = [(c, meta) for text, meta in task for c in splitter.split_text(text)]
+                chunk.add(len(chunks), time.perf_counter() - start)
+                yield chunks
+            return
+
+        # spawn: los procesos no heredan hilos ni conexiones del proceso principal
+        with ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_chunker,
+            initargs=(self.chunk_size, self.chunk_overlap),
+        ) as pool:
+            in_flight = deque()
+            exhausted = False
+            while not stop.is_set():
+                while not exhausted and len(in_flight) < self.workers * 2:
+                    task = next_task()
+                    if not task:
+                        exhausted = True
+                        break
+                    in_flight.append((time.perf_counter(), pool.submit(_split_items, task)))
+                if not in_flight:
+                    return
+                submitted, future = in_flight.popleft()
+                chunks = future.result()
+                # Tiempo de pared de la tarea (incluye la espera en la cola del pool)
+                chunk.add(len(chunks), time.perf_counter() - submitted)
+                yield chunks
+            pool.shutdown(cancel_futures=True)
+
+    def _log_progress(self, final: bool = False):
+        if not self.verbose:
+            return
+        parts = []
+        for s in self.stats.values():
+            rate = f" ({s.items / s.busy:.0f}/s)" if s.busy else ""
+            parts.append(f"{s.name}={s.items}{rate}")
+        print(f"[Ingestion] {'Fin' if final else 'Progreso'}: " + ", ".join(parts))
+
+    def run(
+        self,
+        texts: Iterable[Union[str, Item]],
+        existing_ids: Optional[Set[str]] = None,
+        max_chunks: Optional[int] = None,
+        on_commit: Optional[Callable[[int], None]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Indexa los textos en streaming.
+
+        Args:
+            texts: iterable de textos o de (texto, metadatos) (idealmente un generador);
+                los metadatos se copian a todos los chunks del texto.
+            existing_ids: IDs ya presentes en el almacén; sus chunks no se vuelven a embeber.
+            max_chunks: máximo de chunks distintos a considerar (útil para testing).
+            on_commit: se llama con el tamaño de cada lote tras escribirlo.
+        Returns:
+            Dict con `seen_ids` (todos los IDs del corpus), `added`, `unchanged` y
+            las estadísticas por etapa.
+        """
+        existing_ids = existing_ids or set()
+        # stop: deja de leer (max_chunks o error); failed: alguna etapa ha fallado
+        stop = threading.Event()
+        failed = threading.Event()
+        chunk_q: "queue.Queue" = queue.Queue(maxsize=self.queue_size)
+        write_q: "queue.Queue" = queue.Queue(maxsize=self.queue_size)
+        errors: List[BaseException] = []
+
+        def fail(e: BaseException):
+            errors.append(e)
+            failed.set()
+            stop.set()
+
+        def produce():
+            items = (t if isinstance(t, tuple) else (t, None) for t in texts)
+            batches = self._chunk_batches(items, stop)
+            try:
+                for chunks in batches:
+                    if not self._put(chunk_q, chunks, stop):
+                        return
+                self._put(chunk_q, _DONE, stop)
+            except BaseException as e:
+                fail(e)
+            finally:
+                batches.close()
+
+        def consume_writes():
+            try:
+                # Sondeo con timeout: si otra etapa falla, nadie encolará _DONE
+                while not failed.is_set():
+                    try:
+                        item = write_q.get(timeout=0.2)
+                    except queue.Empty:
+                        continue
+                    if item is _DONE:
+                        return
+                    ids, batch_texts, metadatas, vectors = item
+                    start = time.perf_counter()
+                    self.write(ids, batch_texts, metadatas, vectors)
+                    self.stats["write"].add(len(ids), time.perf_counter() - start)
+                    if on_commit:
+                        on_commit(len(ids))
+            except BaseException as e:
+                fail(e)
+
+        producer = threading.Thread(target=produce, name="ingestion-chunk", daemon=True)
+        writer = threading.Thread(target=consume_writes, name="ingestion-write", daemon=True)
+        producer.start()
+        writer.start()
+
+        seen: Set[str] = set()
+        pending_ids: List[str] = []
+        pending_texts: List[str] = []
+        pending_metas: List[Optional[Dict[str, Any]]] = []
+        unchanged = 0
+        last_log = time.perf_counter()
+
+        def flush():
+            if not pending_ids:
+                return
+            start = time.perf_counter()
+            vectors = self.embed(pending_texts)
+            self.stats["embed"].add(len(pending_ids), time.perf_counter() - start)
+            self._put(write_q, (list(pending_ids), list(pending_texts), list(pending_metas), vectors), failed)
+            pending_ids.clear()
+            pending_texts.clear()
+            pending_metas.clear()
+
+        try:
+            while not stop.is_set():
+                try:
+                    chunks = chunk_q.get(timeout=0.2)
+                except queue.Empty:
+                    continue
+                if chunks is _DONE:
+                    break
+                for chunk, meta in chunks:
+                    cid = chunk_id(chunk, meta)
+                    if cid in seen:
+                        continue
+                    if max_chunks is not None and len(seen) >= max_chunks:
+                        stop.set()
+                        break
+                    seen.add(cid)
+                    if cid in existing_ids:
+                        unchanged += 1
+                        continue
+                    pending_ids.append(cid)
+                    pending_texts.append(chunk)
+                    pending_metas.append(meta)
+                    if len(pending_ids) >= self.batch_size:
+                        flush()
+                if time.perf_counter() - last_log >= self.log_every:
+                    self._log_progress()
+                    last_log = time.perf_counter()
+            if not failed.is_set():
+                flush()
+        except BaseException as e:
+            fail(e)
+        finally:
+            # El escritor termina lo encolado (o sale solo si algo ha fallado);
+            # el productor se detiene si sigue leyendo
+            stop.set()
+            self._put(write_q, _DONE, failed)
+            writer.join()
+            producer.join()
+
+        if errors:
+            raise errors[0]
+        self._log_progress(final=True)
+        return {
+            "seen_ids": seen,
+            "added": self.stats["write"].items,
+            "unchanged": unchanged,
+            "stages": {name: s.as_dict() for name, s in self.stats.items()},
+        }
@@ -0,0 +1,139 @@
+"""
+Índice léxico (BM25) de los chunks de un dataset, junto a su base Chroma.
+
+Las preguntas cuantitativas están llenas de términos exactos ("Markov",
+"martingale", "E[X]") que la búsqueda densa recupera mal. Este índice usa
+SQLite FTS5 (ranking BM25 nativo) sobre los mismos chunks y con los mismos IDs
+por contenido que Chroma; `RAG.create_chroma_db` lo mantiene sincronizado.
+Consultarlo no carga ningún modelo de embeddings. Cada chunk guarda también sus
+metadatos aplanados (ver utils.chunk_metadata) para filtrar por firma, tag o
+dificultad dentro de la propia consulta.
+
+El tokenizador (unicode61) parte por la puntuación: "E[X]" se indexa como los
+tokens "e" y "x", y en la consulta se busca además como frase ("e x"), de modo
+que los chunks con la expresión exacta puntúan más.
+"""
+import re
+import json
+import sqlite3
+import logging
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Expresiones con símbolos que se buscan también como frase: E[X], Var(X), P(A|B)...
+_EXPRESSION = re.compile(r"\w+[\[\(][^\]\)]*[\]\)]")
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+def build_match_query(query: str) -> str:
+    """Consulta FTS5: OR de los términos de la pregunta más las expresiones como frase."""
+    terms = list(dict.fromkeys(t.lower() for t in _TOKEN.findall(query)))
+    phrases = []
+    for expression in _EXPRESSION.findall(query):
+        tokens = _TOKEN.findall(expression.lower())
+        if len(tokens) > 1:
+            phrases.append(" ".join(tokens))
+    # Comillas dobles: cada término se trata como literal (sin operadores de FTS5)
+    return " OR ".join(f'"{t}"' for t in list(dict.fromkeys(phrases)) + terms)
+
+
+class LexicalIndex:
+    def __init__(self, path: str):
+        """
+        Args:
+            path: fichero SQLite (se crea si no existe).
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        # Tabla de contenido + índice FTS5 externo sincronizado con triggers
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS chunks (
+                rowid INTEGER PRIMARY KEY,
+                id TEXT NOT NULL UNIQUE,
+                text TEXT NOT NULL,
+                metadata TEXT
+            );
+            CREATE VIRTUAL TABLE IF NOT EXISTS chunks_fts USING fts5(
+                text, content='chunks', content_rowid='rowid',
+                tokenize='unicode61 remove_diacritics 2'
+            );
+            CREATE TRIGGER IF NOT EXISTS chunks_ai AFTER INSERT ON chunks BEGIN
+                INSERT INTO chunks_fts(rowid, text) VALUES (new.rowid, new.text);
+            END;
+            CREATE TRIGGER IF NOT EXISTS chunks_ad AFTER DELETE ON chunks BEGIN
+                INSERT INTO chunks_fts(chunks_fts, rowid, text) VALUES ('delete', old.rowid, old.text);
+            END;
+            """
+        )
+        # Índices creados antes de guardar metadatos
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(chunks)")}
+        if "metadata" not in columns:
+            self.conn.execute("ALTER TABLE chunks ADD COLUMN metadata TEXT")
+
+    def upsert(self, ids: List[str], texts: List[str], metadatas: Optional[List[Optional[Dict]]] = None):
+        """Añade chunks; los IDs ya presentes se ignoran (el ID es el hash del contenido y metadatos)."""
+        metadatas = metadatas or [None] * len(ids)
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO chunks (id, text, metadata) VALUES (?, ?, ?)",
+                (
+                    (cid, text, json.dumps(meta, ensure_ascii=False) if meta else None)
+                    for cid, text, meta in zip(ids, texts, metadatas)
+                ),
+            )
+
+    def delete(self, ids: Iterable[str]):
+        with self._lock, self.conn:
+            self.conn.executemany("DELETE FROM chunks WHERE id = ?", ((i,) for i in ids))
+
+    def clear(self):
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM chunks")
+
+    def ids(self) -> Set[str]:
+        with self._lock:
+            return {row[0] for row in self.conn.execute("SELECT id FROM chunks")}
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def search(
+        self, query: str, k: int = 5, filters: Optional[Dict[str, Any]] = None
+    ) -> List[Tuple[str, str, Dict[str, Any], float]]:
+        """
+        Los k chunks con mejor BM25 para la consulta.
+
+        Args:
+            filters: metadatos aplanados que deben coincidir (p.ej. {"firm": "citadel", "tag:markov": True}).
+        Returns:
+            Lista de (id, texto, metadatos, puntuación); mayor puntuación = más relevante.
+        """
+        match = build_match_query(query)
+        if not match:
+            return []
+        sql = """
+            SELECT c.id, c.text, c.metadata, bm25(chunks_fts) AS score
+            FROM chunks_fts JOIN chunks c ON c.rowid = chunks_fts.rowid
+            WHERE chunks_fts MATCH ?
+        """
+        params: list = [match]
+        for key, value in (filters or {}).items():
+            # Ruta JSON entre comillas: las claves de tags llevan ':' y '-'
+            sql += " AND json_extract(c.metadata, ?) = ?"
+            params += [f'$."{key}"', (1 if value else 0) if isinstance(value, bool) else value]
+        sql += " ORDER BY score LIMIT ?"
+        params.append(k)
+        with self._lock:
+            rows = self.conn.execute(sql, params).fetchall()
+        # bm25() de FTS5 es negativo (más bajo = mejor)
+        return [(cid, text, json.loads(meta) if meta else {}, -score) for cid, text, meta, score in rows]
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
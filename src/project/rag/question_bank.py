@@ -0,0 +1,357 @@
+"""
+Banco de preguntas precalculado por dataset.
+
+Guarda en un SQLite local la pregunta parseada, la respuesta y la dificultad
+clasificada de cada par QA, de modo que el endpoint de preguntas pueda muestrear
+una pregunta del nivel pedido sin llamadas de clasificación al LLM.
+
+Uso (reconstrucción / refresco):
+    python -m project.rag.question_bank --dataset coachquant
+    python -m project.rag.question_bank --dataset squad --limit 500 --rebuild
+"""
+import os
+import json
+import asyncio
+import random
+import sqlite3
+import hashlib
+import logging
+import argparse
+from typing import Dict, Iterable, Iterator, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+DB_DIR = os.path.join(BASE_DIR, "database")
+
+LEVELS = ["Facil", "Medio", "Dificil"]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS questions (
+    id TEXT PRIMARY KEY,
+    difficulty TEXT NOT NULL,
+    slot INTEGER NOT NULL,
+    question TEXT NOT NULL,
+    answer TEXT NOT NULL,
+    firm TEXT,
+    tags TEXT
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_questions_difficulty_slot ON questions(difficulty, slot);
+CREATE INDEX IF NOT EXISTS idx_questions_firm ON questions(firm, difficulty);
+CREATE TABLE IF NOT EXISTS question_tags (
+    question_id TEXT NOT NULL,
+    tag TEXT NOT NULL,
+    PRIMARY KEY (tag, question_id)
+);
+CREATE TABLE IF NOT EXISTS level_counts (
+    difficulty TEXT PRIMARY KEY,
+    total INTEGER NOT NULL
+);
+"""
+
+
+def bank_path(dataset_type: str, db_path: str = DB_DIR) -> str:
+    """Ruta del fichero SQLite del banco para un dataset."""
+    return os.path.join(db_path, f"question_bank_{dataset_type.lower()}.sqlite")
+
+
+def question_id(question: str, answer: str) -> str:
+    """ID estable de un par QA (hash del contenido)."""
+    return hashlib.sha1(f"{question}\x00{answer}".encode("utf-8")).hexdigest()
+
+
+class QuestionBank:
+    def __init__(self, path: str):
+        """
+        Banco de preguntas indexado por dificultad, firma y tags.
+
+        Args:
+            path: ruta del fichero SQLite (se crea si no existe).
+        """
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript(_SCHEMA)
+
+    @classmethod
+    def open(cls, dataset_type: str, db_path: str = DB_DIR) -> Optional["QuestionBank"]:
+        """Abre el banco del dataset, o devuelve None si no existe o está vacío."""
+        path = bank_path(dataset_type, db_path)
+        if not os.path.exists(path):
+            return None
+        try:
+            bank = cls(path)
+        except sqlite3.Error as e:
+            logger.error(f"[QuestionBank] No se pudo abrir {path}: {e}")
+            return None
+        if bank.size() == 0:
+            bank.close()
+            return None
+        return bank
+
+    def close(self):
+        self.conn.close()
+
+    def size(self) -> int:
+        row = self.conn.execute("SELECT COALESCE(SUM(total), 0) FROM level_counts").fetchone()
+        return int(row[0])
+
+    def counts(self) -> Dict[str, int]:
+        rows = self.conn.execute("SELECT difficulty, total FROM level_counts").fetchall()
+        return {r["difficulty"]: r["total"] for r in rows}
+
+    def contains(self, qid: str) -> bool:
+        return self.conn.execute("SELECT 1 FROM questions WHERE id = ?", (qid,)).fetchone() is not None
+
+    def ids(self) -> Set[str]:
+        return {row[0] for row in self.conn.execute("SELECT id FROM questions")}
+
+    def remove(self, ids: Iterable[str]) -> int:
+        """
+        Elimina preguntas por ID y recompacta los slots de cada nivel, que deben
+        seguir siendo contiguos (0..total-1) para el muestreo por índice.
+
+        Returns:
+            Número de preguntas eliminadas.
+        """
+        ids = list(ids)
+        if not ids:
+            return 0
+        with self.conn:
+            removed = 0
+            for qid in ids:
+                removed += self.conn.execute("DELETE FROM questions WHERE id = ?", (qid,)).rowcount
+                self.conn.execute("DELETE FROM question_tags WHERE question_id = ?", (qid,))
+            rows = self.conn.execute("SELECT id, difficulty FROM questions ORDER BY difficulty, slot").fetchall()
+            # Dos pasadas: primero a slots negativos para no chocar con el índice único
+            self.conn.execute("UPDATE questions SET slot = -1 - slot")
+            totals: Dict[str, int] = {}
+            updates = []
+            for row in rows:
+                slot = totals.get(row["difficulty"], 0)
+                totals[row["difficulty"]] = slot + 1
+                updates.append((slot, row["id"]))
+            self.conn.executemany("UPDATE questions SET slot = ? WHERE id = ?", updates)
+            self.conn.execute("DELETE FROM level_counts")
+            self.conn.executemany(
+                "INSERT INTO level_counts (difficulty, total) VALUES (?, ?)", list(totals.items())
+            )
+        return removed
+
+    def clear(self):
+        with self.conn:
+            self.conn.execute("DELETE FROM questions")
+            self.conn.execute("DELETE FROM question_tags")
+            self.conn.execute("DELETE FROM level_counts")
+
+    def add(
+        self,
+        question: str,
+        answer: str,
+        difficulty: str,
+        firm: Optional[str] = None,
+        tags: Optional[List[str]] = None,
+    ) -> bool:
+        """Inserta un par QA ya clasificado. Devuelve False si ya existía."""
+        if difficulty not in LEVELS:
+            raise ValueError(f"Dificultad no válida: {difficulty}")
+        qid = question_id(question, answer)
+        tags = [t.strip().lower() for t in (tags or []) if t and t.strip()]
+        with self.conn:
+            if self.contains(qid):
+                return False
+            row = self.conn.execute(
+                "SELECT total FROM level_counts WHERE difficulty = ?", (difficulty,)
+            ).fetchone()
+            slot = row["total"] if row else 0
+            self.conn.execute(
+                "INSERT INTO questions (id, difficulty, slot, question, answer, firm, tags) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (qid, difficulty, slot, question, answer, firm, json.dumps(tags)),
+            )
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO question_tags (question_id, tag) VALUES (?, ?)",
+                [(qid, t) for t in tags],
+            )
+            self.conn.execute(
+                "INSERT INTO level_counts (difficulty, total) VALUES (?, 1) "
+                "ON CONFLICT(difficulty) DO UPDATE SET total = total + 1",
+                (difficulty,),
+            )
+        return True
+
+    def _row_to_dict(self, row: sqlite3.Row) -> Dict:
+        return {
+            "id": row["id"],
+            "question": row["question"],
+            "answer": row["answer"],
+            "difficulty": row["difficulty"],
+            "firm": row["firm"],
+            "tags": json.loads(row["tags"] or "[]"),
+        }
+
+    def _sample_level(self, difficulty: str, firm: Optional[str], tag: Optional[str]) -> Optional[Dict]:
+        if firm is None and tag is None:
+            # Los slots de cada nivel son contiguos: un slot aleatorio es una búsqueda por índice
+            total = self.counts().get(difficulty, 0)
+            if total == 0:
+                return None
+            row = self.conn.execute(
+                "SELECT * FROM questions WHERE difficulty = ? AND slot = ?",
+                (difficulty, random.randrange(total)),
+            ).fetchone()
+            return self._row_to_dict(row) if row else None
+
+        query = "SELECT q.* FROM questions q"
+        params: list = []
+        if tag is not None:
+            query += " JOIN question_tags t ON t.question_id = q.id AND t.tag = ?"
+            params.append(tag.lower())
+        query += " WHERE q.difficulty = ?"
+        params.append(difficulty)
+        if firm is not None:
+            query += " AND q.firm = ?"
+            params.append(firm)
+        query += " ORDER BY RANDOM() LIMIT 1"
+        row = self.conn.execute(query, params).fetchone()
+        return self._row_to_dict(row) if row else None
+
+    def sample(
+        self,
+        difficulty: str = "Facil",
+        firm: Optional[str] = None,
+        tag: Optional[str] = None,
+    ) -> Optional[Dict]:
+        """
+        Devuelve una pregunta aleatoria del nivel pedido.
+
+        Si el nivel no tiene preguntas (con los filtros dados), prueba los niveles
+        más cercanos. Devuelve None si no hay ninguna candidata.
+        """
+        target = LEVELS.index(difficulty) if difficulty in LEVELS else 0
+        for level in sorted(LEVELS, key=lambda l: abs(LEVELS.index(l) - target)):
+            row = self._sample_level(level, firm, tag)
+            if row:
+                return row
+        return None
+
+
+# ============================================================
+# CONSTRUCCIÓN OFFLINE
+# ============================================================
+
+def _iter_source_items(dataset_type: str, limit: Optional[int]) -> Iterator[Dict]:
+    """Recorre los pares QA del dataset con los metadatos disponibles."""
+    if dataset_type == "coachquant":
+        data_path = os.path.join(DB_DIR, "coachquant_all.jsonl")
+        with open(data_path, "r", encoding="utf-8") as f:
+            for line in f:
+                obj = json.loads(line)
+                raw = obj.get("raw", {})
+                question = raw.get("problem text", "") or obj.get("question_text", "")
+                answer = (
+                    raw.get("problem solution", "")
+                    or obj.get("answer_text", "")
+                    or raw.get("valid answer", "")
+                )
+                if question and answer:
+                    yield {
+                        "question": question.strip(),
+                        "answer": answer.strip(),
+                        "firm": obj.get("firm") or raw.get("problem firm"),
+                        "tags": obj.get("tags") or raw.get("problem tags") or [],
+                    }
+        return
+
+    from .rag import RAG
+    from .question_generator import QuestionGenerator
+
+    texts = RAG(dataset_type=dataset_type).read_dataset(max_texts=limit, sample_random=limit is not None)
+    for text in texts:
+        question = QuestionGenerator._extract_dataset_question(text)
+        answer = QuestionGenerator._extract_dataset_answer(text)
+        if question and answer:
+            yield {"question": question, "answer": answer, "firm": None, "tags": []}
+
+
+async def build_question_bank(
+    dataset_type: str,
+    limit: Optional[int] = None,
+    rebuild: bool = False,
+    db_path: str = DB_DIR,
+    verbose: bool = True,
+) -> QuestionBank:
+    """
+    Construye o refresca el banco de un dataset.
+
+    Clasifica con el LLM solo los pares que aún no están en el banco, así que
+    relanzarlo tras actualizar el dataset únicamente procesa lo nuevo. Los pares
+    cuya clasificación falla no se guardan (se reintentan en el siguiente
+    refresco) y, si se ha leído el dataset completo, se eliminan del banco los
+    que ya no están en él.
+
+    Args:
+        dataset_type: dataset a indexar ('squad', 'coachquant', ...).
+        limit: número máximo de pares a leer del dataset (muestreo aleatorio).
+            Con límite no se eliminan pares: no se sabe cuáles faltan.
+        rebuild: si True, vacía el banco antes de construirlo.
+    """
+    from .question_generator import QuestionGenerator
+
+    dataset_type = dataset_type.lower()
+    bank = QuestionBank(bank_path(dataset_type, db_path))
+    if rebuild:
+        bank.clear()
+
+    generator = QuestionGenerator(dataset_type=dataset_type)
+    added = skipped = failed = 0
+    seen: Set[str] = set()
+    for i, item in enumerate(_iter_source_items(dataset_type, limit), start=1):
+        if limit is not None and i > limit:
+            break
+        qid = question_id(item["question"], item["answer"])
+        seen.add(qid)
+        if bank.contains(qid):
+            skipped += 1
+            continue
+        difficulty = await generator._classify_answer_difficulty(item["question"], item["answer"], fallback=None)
+        if difficulty is None:
+            failed += 1
+            continue
+        bank.add(item["question"], item["answer"], difficulty, firm=item["firm"], tags=item["tags"])
+        added += 1
+        if verbose and added % 25 == 0:
+            print(f"[QuestionBank] {added} preguntas clasificadas ({skipped} ya existentes)")
+
+    # Una lectura vacía (fichero ausente, error de red) no debe vaciar el banco
+    removed = bank.remove(bank.ids() - seen) if limit is None and seen else 0
+
+    if verbose:
+        print(
+            f"[QuestionBank] Banco '{dataset_type}' listo: {bank.counts()} "
+            f"(+{added}, -{removed}, {skipped} sin cambios, {failed} sin clasificar)"
+        )
+        if failed:
+            print(f"[QuestionBank] {failed} pares no se pudieron clasificar; se reintentarán en el próximo refresco")
+    return bank
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Construye o refresca el banco de preguntas de un dataset.")
+    parser.add_argument("--dataset", default="coachquant", help="Dataset a indexar (squad, coachquant, ...)")
+    parser.add_argument("--limit", type=int, default=None, help="Máximo de pares QA a procesar")
+    parser.add_argument("--rebuild", action="store_true", help="Vacía el banco antes de construirlo")
+    args = parser.parse_args()
+
+    from dotenv import load_dotenv
+    load_dotenv()
+    from project.llm import get_llm
+
+    async def main():
+        try:
+            await build_question_bank(args.dataset, limit=args.limit, rebuild=args.rebuild)
+        finally:
+            # Cierra los pools (HTTP y caché) dentro de su propio event loop
+            await get_llm().aclose()
+
+    asyncio.run(main())
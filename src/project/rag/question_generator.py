@@ -1,74 +1,65 @@
-import os
-from typing import List, Optional
+import re
+import json
 import logging
-from .rag import RAG
+from typing import Dict, List, Optional, Tuple
+from .question_bank import QuestionBank
+from project.llm import get_llm
 
-try:
-    import google.generativeai as genai
-except ImportError:
-    genai = None
+logger = logging.getLogger(__name__)
 
-try:
-    from openai import OpenAI
-except ImportError:
-    OpenAI = None
+LEVELS = ["Facil", "Medio", "Dificil"]
+
+
+def _normalize_level(text: str) -> Optional[str]:
+    """'Fácil' / 'difícil.' / 'Medio' -> nivel canónico, o None si no es válido."""
+    if not isinstance(text, str) or not text.split():
+        return None
+    level = text.replace("á", "a").replace("í", "i").split()[0].strip(".,;:\"'").title()
+    return level if level in LEVELS else None
+
+
+def _level_distance(a: str, b: str) -> int:
+    return abs(LEVELS.index(a) - LEVELS.index(b))
 
-logger = logging.getLogger(__name__)
 
-class LLMGenerationError(Exception):
-    pass
+def _parse_json_object(content: str) -> Optional[Dict]:
+    """Extrae el primer objeto JSON de la respuesta (tolera ```json ... ``` y texto extra)."""
+    if not content:
+        return None
+    content = re.sub(r"^```(?:json)?|```$", "", content.strip(), flags=re.MULTILINE).strip()
+    start, end = content.find("{"), content.rfind("}")
+    if start == -1 or end <= start:
+        return None
+    try:
+        data = json.loads(content[start:end + 1])
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
 
 class QuestionGenerator:
-    def __init__(self, dataset_type: str = "squad"):
+    def __init__(self, dataset_type: str = "squad", answer_generator=None):
         self.dataset_type = dataset_type
+        # Solo se usa en el camino de fallback de prepare_question
+        self._answer_generator = answer_generator
+        # langchain/Chroma se importan al crear el primer generador, no al importar el módulo
+        from .rag import RAG
         self.rag = RAG(dataset_type=dataset_type)
         try:
             self.rag.load_chroma_db()
         except Exception as e:
             logger.error(f"[QuestionGenerator] No se pudo cargar chroma DB en init: {e}")
+        self.bank = QuestionBank.open(dataset_type)
+        if self.bank:
+            logger.info(f"[QuestionGenerator] Banco de preguntas cargado: {self.bank.counts()}")
 
         # --- CONFIGURACIÓN DEL PROVEEDOR ---
-        self.provider = os.getenv("LLM_PROVIDER", "GEMINI").upper()
-        self.api_key_gemini = os.getenv("GEMINI_API_KEY")
-        self.api_key_deepseek = os.getenv("DEEPSEEK_API_KEY")
-        self.api_key_groq = os.getenv("GROQ_API_KEY")
-        
-        self.client = None
-        self.model = None
-
-        if self.provider == "DEEPSEEK":
-            if not self.api_key_deepseek:
-                raise LLMGenerationError("DEEPSEEK_API_KEY no configurada.")
-            self.client = OpenAI(api_key=self.api_key_deepseek, base_url="https://api.deepseek.com")
-            self.model_name = "deepseek-chat"
-            logger.info("QuestionGenerator configurado con DEEPSEEK")
-            
-        elif self.provider == "GROQ":
-            if not self.api_key_groq:
-                raise LLMGenerationError("GROQ_API_KEY no configurada.")
-            self.client = OpenAI(api_key=self.api_key_groq, base_url="https://api.groq.com/openai/v1")
-            self.model_name = "llama-3.3-70b-versatile" 
-            logger.info("QuestionGenerator configurado con GROQ")
-
-        else: # Default to GEMINI
-            if not self.api_key_gemini:
-                raise LLMGenerationError("GEMINI_API_KEY no configurada.")
-            genai.configure(api_key=self.api_key_gemini)
-            self.model = genai.GenerativeModel("gemini-2.5-flash")
-            logger.info("QuestionGenerator configurado con GEMINI")
-
-
-    def set_dataset(self, dataset_type: str):
-        if dataset_type != self.dataset_type:
-            self.dataset_type = dataset_type
-            self.rag = RAG(dataset_type=dataset_type)
-            try:
-                self.rag.load_chroma_db()
-                logger.info(f"[QuestionGenerator] Dataset cambiado a: {dataset_type}")
-            except Exception as e:
-                logger.error(f"[QuestionGenerator] Error cargando dataset '{dataset_type}': {e}")
+        self.llm = get_llm()
+        self.provider = self.llm.provider
+        logger.info(f"QuestionGenerator configurado con {self.provider}")
 
-    def generate_interview_questions(self, num_questions: int = 5) -> List[str]:
+
+    async def generate_interview_questions(self, num_questions: int = 5) -> List[str]:
         try:
             contexts = self.rag.read_dataset(max_texts=num_questions * 4, sample_random=True)
             questions = []
@@ -83,7 +74,7 @@ class QuestionGenerator:
                 used_contexts.add(snippet)
 
                 raw_question = self._extract_dataset_question(context)
-                clean_question = self.normalize_question_with_llm(raw_question)
+                clean_question = await self.normalize_question_with_llm(raw_question)
                 questions.append(clean_question)
 
             return questions[:num_questions]
@@ -91,7 +82,8 @@ class QuestionGenerator:
             logger.error(f"Error generando preguntas: {str(e)}")
             return []
 
-    def _extract_dataset_question(self, text: str) -> str:
+    @staticmethod
+    def _extract_dataset_question(text: str) -> str:
         if "Pregunta:" in text:
             try:
                 return text.split("Pregunta:")[1].split("Respuesta:")[0].strip()
@@ -99,7 +91,8 @@ class QuestionGenerator:
                 return text.strip()
         return text.strip()
 
-    def _extract_dataset_answer(self, text: str) -> str:
+    @staticmethod
+    def _extract_dataset_answer(text: str) -> str:
         if "Respuesta:" in text:
             try:
                 return text.split("Respuesta:")[1].strip()
@@ -107,7 +100,7 @@ class QuestionGenerator:
                 return ""
         return ""
 
-    def normalize_question_with_llm(self, raw_question: str) -> str:
+    async def normalize_question_with_llm(self, raw_question: str) -> str:
         prompt = f"""
         Eres un experto en matemáticas y entrevistas técnicas.
         Vas a recibir una pregunta original escrita en inglés y posiblemente con LaTeX roto.
@@ -125,26 +118,28 @@ class QuestionGenerator:
         """
 
         try:
-            if self.provider in ["DEEPSEEK", "GROQ"]:
-                response = self.client.chat.completions.create(
-                    model=self.model_name,
-                    messages=[{"role": "user", "content": prompt}],
-                    temperature=0.1
-                )
-                return response.choices[0].message.content.strip()
-            else:
-                response = self.model.generate_content(prompt)
-                return response.text.strip()
+            # Subir prompt_version al cambiar la plantilla invalida la caché de este prompt
+            return await self.llm.complete(
+                prompt, temperature=0.1,
+                prompt_type="normalize_question", prompt_version=1,
+                cache_inputs={"question": raw_question}
+            )
         except Exception as e:
             logger.error(f"Error normalizando pregunta con {self.provider}: {e}")
             return raw_question
 
-    def normalize_question_with_gemini(self, raw_question: str) -> str:
-        return self.normalize_question_with_llm(raw_question)
+    async def normalize_question_with_gemini(self, raw_question: str) -> str:
+        return await self.normalize_question_with_llm(raw_question)
 
-    def _classify_answer_difficulty(self, question: str, answer: str) -> str:
+    async def _classify_answer_difficulty(
+        self, question: str, answer: str, fallback: Optional[str] = "Medio"
+    ) -> Optional[str]:
         """
         Usa el LLM para determinar la dificultad real basada en conceptos, no en longitud.
+
+        Args:
+            fallback: nivel que se devuelve si el LLM falla o responde algo no
+                reconocible (None para distinguir el fallo, como hace el banco).
         """
         prompt = f"""
         Eres un experto en entrevistas cuantitativas (Quant Finance) y de programación.
@@ -162,44 +157,43 @@ class QuestionGenerator:
         """
 
         try:
-            content = ""
-            if self.provider in ["DEEPSEEK", "GROQ"]:
-                response = self.client.chat.completions.create(
-                    model=self.model_name,
-                    messages=[{"role": "user", "content": prompt}],
-                    temperature=0.1,
-                    max_tokens=10
-                )
-                content = response.choices[0].message.content.strip()
-            else:
-                response = self.model.generate_content(prompt)
-                content = response.text.strip()
-            
+            # Gemini 2.5 consume tokens de "thinking", así que no limitamos max_tokens allí
+            max_tokens = None if self.llm.is_gemini else 10
+            content = await self.llm.complete(
+                prompt, temperature=0.1, max_tokens=max_tokens,
+                prompt_type="classify_difficulty", prompt_version=1,
+                cache_inputs={"question": question, "answer": answer}
+            )
+
             # Limpieza básica de la respuesta
-            difficulty = content.replace("á", "a").replace("í", "i").replace("cil", "cil").split()[0].title()
-            
-            valid_levels = ["Facil", "Medio", "Dificil"]
-            if difficulty not in valid_levels:
+            difficulty = _normalize_level(content)
+            if difficulty is None:
                 # Fallback si el modelo se pone creativo
-                logger.warning(f"Clasificación desconocida '{difficulty}', usando Medio.")
-                return "Medio"
-                
+                logger.warning(f"Clasificación desconocida '{content}', usando {fallback}.")
+                return fallback
+
             return difficulty
 
         except Exception as e:
             logger.error(f"Error clasificando dificultad: {e}")
-            return "Medio" # Fallback seguro
+            return fallback # Fallback seguro
+
+    async def generate_single_question_with_answer(self, target_difficulty: str = "Facil"):
+        # Camino rápido: banco precalculado (sin llamadas de clasificación)
+        if self.bank:
+            try:
+                item = self.bank.sample(target_difficulty)
+                if item:
+                    clean_question = await self.normalize_question_with_llm(item["question"])
+                    return clean_question, item["answer"], item["difficulty"]
+            except Exception as e:
+                logger.error(f"[QuestionGenerator] Error muestreando el banco, usando camino en vivo: {e}")
 
-    def generate_single_question_with_answer(self, target_difficulty: str = "Facil"):
         # Leemos un batch pequeño para no saturar, pero suficiente para encontrar variedad
-        # NOTA: En producción, idealmente esto se pre-calcula y se filtra por metadatos DB.
         contexts = self.rag.read_dataset(max_texts=10, sample_random=True)
         
         best_candidate = None
-        levels = ["Facil", "Medio", "Dificil"]
-
-        def dist(a, b):
-            return abs(levels.index(a) - levels.index(b))
+        dist = _level_distance
 
         # Iteramos sobre los contextos recuperados
         for i, ctx in enumerate(contexts):
@@ -210,12 +204,12 @@ class QuestionGenerator:
                 continue
             
             # Clasificamos con LLM (Ojo: esto hace llamadas API en bucle, limitamos con el break)
-            detected = self._classify_answer_difficulty(raw_question, correct_answer)
+            detected = await self._classify_answer_difficulty(raw_question, correct_answer)
             logger.info(f"Pregunta analizada: {detected} (Target: {target_difficulty})")
 
             # Si encontramos match exacto, normalizamos y devolvemos
             if detected == target_difficulty:
-                clean_question = self.normalize_question_with_llm(raw_question)
+                clean_question = await self.normalize_question_with_llm(raw_question)
                 return clean_question, correct_answer, detected
 
             # Si no, guardamos el mejor candidato por si acaso no encontramos el exacto
@@ -228,9 +222,166 @@ class QuestionGenerator:
 
         if best_candidate:
             raw_question, correct_answer, detected = best_candidate
-            clean_question = self.normalize_question_with_llm(raw_question)
+            clean_question = await self.normalize_question_with_llm(raw_question)
             # Retornamos lo que encontramos, aunque no sea el target exacto
             return clean_question, correct_answer, detected
 
         # Fallback total
-        return None, None, target_difficulty
\ No newline at end of file
+        return None, None, target_difficulty
+
+    # ============================================================
+    # PREPARACIÓN EN UNA SOLA LLAMADA
+    # ============================================================
+
+    def _sample_candidates(self, target_difficulty: str, num_candidates: int) -> Tuple[List[Dict], bool]:
+        """
+        Candidatos QA para prepare_question. Devuelve (candidatos, dificultad_conocida).
+        Con banco basta un candidato ya clasificado; sin él se leen varios del dataset.
+        """
+        if self.bank:
+            try:
+                item = self.bank.sample(target_difficulty)
+                if item:
+                    return [item], True
+            except Exception as e:
+                logger.error(f"[QuestionGenerator] Error muestreando el banco: {e}")
+
+        candidates = []
+        for ctx in self.rag.read_dataset(max_texts=num_candidates * 2, sample_random=True):
+            question = self._extract_dataset_question(ctx)
+            answer = self._extract_dataset_answer(ctx)
+            if question and answer:
+                candidates.append({"question": question, "answer": answer})
+            if len(candidates) >= num_candidates:
+                break
+        return candidates, False
+
+    def _prepare_prompt(self, candidates: List[Dict], target_difficulty: str, classify: bool) -> str:
+        blocks = "\n\n".join(
+            f"[{i}]\nPregunta: {c['question']}\nRespuesta: {c['answer']}" for i, c in enumerate(candidates)
+        )
+        if classify:
+            classify_rules = f"""
+        1. Clasifica la dificultad CONCEPTUAL de CADA candidato para un candidato junior:
+           - Facil: Cálculo directo, definiciones básicas, aritmética simple, lógica de sentido común.
+           - Medio: Requiere formular ecuaciones lineales, probabilidad condicional estándar, algoritmos conocidos o pasos múltiples.
+           - Dificil: Requiere intuición profunda, cálculo estocástico, combinatoria avanzada (simetrías), programación dinámica o pensamiento lateral complejo.
+        2. Elige el candidato cuya dificultad sea la más cercana a "{target_difficulty}"."""
+        else:
+            classify_rules = """
+        1. Usa el candidato [0] (su dificultad ya es conocida, no la clasifiques).
+        2. Devuelve "chosen": 0 y "difficulties": []."""
+
+        return f"""
+        Eres un experto en entrevistas cuantitativas (Quant Finance), matemáticas y programación.
+        Vas a recibir {len(candidates)} candidato(s) pregunta/respuesta de un dataset, escritos en inglés
+        y posiblemente con LaTeX roto.
+
+        Tareas:{classify_rules}
+        3. Para el candidato elegido:
+           - Pregunta: convierte LaTeX a matemáticas Unicode legibles (x², √5, π, ⅓, etc.) o LaTeX limpio,
+             quita los símbolos $, corrige el texto y tradúcela al español.
+           - Respuesta: elimina los $, corrige el LaTeX roto, usa Unicode claro, mantén los pasos
+             explicativos, no alteres el significado matemático y tradúcela al español.
+           - No inventes contenido.
+
+        Devuelve SOLO un objeto JSON con este formato:
+        {{"difficulties": ["Facil" | "Medio" | "Dificil", ...], "chosen": <índice>, "question": "<pregunta limpia>", "answer": "<respuesta limpia>"}}
+
+        Candidatos:
+        {blocks}
+        """
+
+    def _validate_prepared(
+        self, data: Optional[Dict], candidates: List[Dict], target_difficulty: str, known_level: Optional[str]
+    ) -> Optional[Tuple[int, str, Optional[str], Optional[str]]]:
+        """
+        Valida la respuesta estructurada. Devuelve (índice, nivel, pregunta, respuesta);
+        pregunta/respuesta son None si hay que rehacerlas con las llamadas individuales.
+        """
+        if not data:
+            return None
+        chosen = data.get("chosen")
+        if isinstance(chosen, str) and chosen.strip().isdigit():
+            chosen = int(chosen)
+        if not isinstance(chosen, int) or not 0 <= chosen < len(candidates):
+            return None
+
+        if known_level:
+            level = known_level
+        else:
+            levels = data.get("difficulties")
+            if not isinstance(levels, list) or len(levels) != len(candidates):
+                return None
+            levels = [_normalize_level(l) for l in levels]
+            if any(l is None for l in levels):
+                return None
+            best = min(range(len(levels)), key=lambda i: _level_distance(levels[i], target_difficulty))
+            if _level_distance(levels[chosen], target_difficulty) > _level_distance(levels[best], target_difficulty):
+                # Las clasificaciones valen, pero el texto es del candidato equivocado
+                return best, levels[best], None, None
+            level = levels[chosen]
+
+        question, answer = data.get("question"), data.get("answer")
+        if not isinstance(question, str) or not question.strip() or not isinstance(answer, str) or not answer.strip():
+            return chosen, level, None, None
+        return chosen, level, question.strip(), answer.strip()
+
+    async def _clean_answer_fallback(self, raw_answer: str) -> str:
+        if self._answer_generator is None:
+            from .answer_generator import AnswerGenerator
+            self._answer_generator = AnswerGenerator()
+        return await self._answer_generator.clean_answer(raw_answer)
+
+    async def prepare_question(self, target_difficulty: str = "Facil", num_candidates: int = 4):
+        """
+        Clasifica, normaliza y limpia en UNA llamada estructurada al LLM.
+
+        Envía varios candidatos QA y recibe JSON con la dificultad de cada uno y la
+        pregunta/respuesta ya limpias del elegido. Si la respuesta no es válida, recurre
+        a las llamadas individuales (clasificar -> normalizar -> limpiar).
+
+        Returns:
+            (pregunta_limpia, respuesta_limpia, nivel) o (None, None, target) si no hay datos.
+        """
+        candidates, known = self._sample_candidates(target_difficulty, num_candidates)
+        if not candidates:
+            return None, None, target_difficulty
+        known_level = candidates[0]["difficulty"] if known else None
+
+        prompt = self._prepare_prompt(candidates, target_difficulty, classify=not known)
+        result = None
+        try:
+            content = await self.llm.complete(
+                prompt, temperature=0.1, json_mode=True,
+                prompt_type="prepare_question", prompt_version=1,
+                cache_inputs={
+                    "candidates": [[c["question"], c["answer"]] for c in candidates],
+                    "target": None if known else target_difficulty,
+                }
+            )
+            result = self._validate_prepared(_parse_json_object(content), candidates, target_difficulty, known_level)
+            if result is None:
+                logger.warning("[QuestionGenerator] Respuesta estructurada no válida, usando llamadas individuales")
+        except Exception as e:
+            logger.error(f"[QuestionGenerator] Error en prepare_question con {self.provider}: {e}")
+
+        if result is None:
+            if known:
+                chosen, level = 0, known_level
+            else:
+                # Fallback completo: el camino clásico (clasificación por candidato)
+                question, raw_answer, level = await self.generate_single_question_with_answer(target_difficulty)
+                if not question:
+                    return None, None, target_difficulty
+                return question, await self._clean_answer_fallback(raw_answer), level
+            question = answer = None
+        else:
+            chosen, level, question, answer = result
+
+        raw = candidates[chosen]
+        if question is None:
+            question = await self.normalize_question_with_llm(raw["question"])
+            answer = await self._clean_answer_fallback(raw["answer"])
+        logger.info(f"Pregunta preparada: {level} (Target: {target_difficulty})")
+        return question, answer, level
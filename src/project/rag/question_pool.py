@@ -0,0 +1,248 @@
+"""
+Pool de preguntas ya preparadas por (dataset, dificultad), guardado en Redis.
+
+Un refiller en segundo plano mantiene cada pool por encima de un mínimo
+(low-water mark) llamando a `QuestionGenerator.prepare_question`, y el endpoint
+de preguntas saca una con un único script Lua atómico. Las entradas caducan
+(TTL) y no se sirve dos veces la misma pregunta dentro de una sesión. Usa el
+cliente redis.asyncio de la app, así que no bloquea el event loop.
+
+Cada worker solo rellena los pools de los datasets cuyo generador ya tiene
+cargado: rellenar un dataset no residente obligaría a cargarlo (y a descargar
+otro) en cada pasada. Los pools se comparten entre workers, así que basta con
+que uno de ellos tenga el dataset cargado.
+
+Configuración (variables de entorno):
+    QUESTION_POOL_ENABLED          1/0 (por defecto 1; requiere Redis real)
+    QUESTION_POOL_DATASETS         datasets a precalentar (por defecto "squad,coachquant")
+    QUESTION_POOL_SIZE             tamaño objetivo de cada pool (por defecto 10)
+    QUESTION_POOL_LOW_WATER        se rellena por debajo de este tamaño (por defecto 3)
+    QUESTION_POOL_TTL              segundos de validez de una entrada (por defecto 6h)
+    QUESTION_POOL_REFILL_INTERVAL  segundos entre pasadas del refiller (por defecto 5)
+    QUESTION_POOL_CONCURRENCY      preguntas generadas en paralelo por pool (por defecto 3)
+"""
+import os
+import json
+import time
+import asyncio
+import logging
+import uuid
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from .question_bank import question_id, LEVELS
+
+logger = logging.getLogger(__name__)
+
+# Saca del final de la lista (lo más antiguo) la primera entrada vigente que no
+# se haya servido en la sesión, sin mover las demás, borra las caducadas que
+# encuentra por el camino y cuenta el acierto/fallo. Todo en una operación.
+# KEYS: pool, stats | ARGV: ahora, ttl, máx. entradas a mirar, campo de stats, ids servidos...
+_POP_SCRIPT = """
+local window = redis.call('LRANGE', KEYS[1], -tonumber(ARGV[3]), -1)
+local served = {}
+for i = 5, #ARGV do served[ARGV[i]] = true end
+local oldest = tonumber(ARGV[1]) - tonumber(ARGV[2])
+local chosen = false
+for i = #window, 1, -1 do
+    local raw = window[i]
+    local ok, entry = pcall(cjson.decode, raw)
+    if not ok or (tonumber(entry['created_at']) or 0) < oldest then
+        redis.call('LREM', KEYS[1], -1, raw)
+    elseif not served[entry['id']] then
+        redis.call('LREM', KEYS[1], -1, raw)
+        chosen = raw
+        break
+    end
+end
+redis.call('HINCRBY', KEYS[2], ARGV[4] .. (chosen and 'hits' or 'misses'), 1)
+return chosen
+"""
+
+# Libera el lock de relleno solo si sigue siendo nuestro (pudo caducar y tomarlo otro worker)
+_RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class QuestionPool:
+    STATS_KEY = "pool:stats"
+    LOCK_TTL = 120
+
+    def __init__(
+        self,
+        redis_client,
+        generator_for: Callable[[str], Optional[Any]],
+        datasets: Iterable[str] = ("squad", "coachquant"),
+        size: int = 10,
+        low_water: int = 3,
+        ttl: int = 6 * 3600,
+        refill_interval: float = 5.0,
+        concurrency: int = 3,
+    ):
+        """
+        Args:
+            redis_client: cliente redis.asyncio (decode_responses=True).
+            generator_for: función dataset -> QuestionGenerator ya cargado (con
+                `prepare_question`), o None si no está residente (p.ej. `GeneratorRegistry.peek`).
+            datasets: datasets cuyos pools se mantienen llenos.
+        """
+        self.redis = redis_client
+        self.generator_for = generator_for
+        self.datasets = [d.lower() for d in datasets]
+        self.size = size
+        self.low_water = min(low_water, size)
+        self.ttl = ttl
+        self.refill_interval = refill_interval
+        self.concurrency = max(1, concurrency)
+        self._pop = redis_client.register_script(_POP_SCRIPT)
+        self._release = redis_client.register_script(_RELEASE_SCRIPT)
+
+    @classmethod
+    def from_env(cls, redis_client, generator_for) -> Optional["QuestionPool"]:
+        """Crea el pool según el entorno, o None si está desactivado."""
+        if os.getenv("QUESTION_POOL_ENABLED", "1") in {"0", "false", "False"}:
+            return None
+        datasets = [d.strip() for d in os.getenv("QUESTION_POOL_DATASETS", "squad,coachquant").split(",") if d.strip()]
+        return cls(
+            redis_client,
+            generator_for,
+            datasets=datasets,
+            size=int(os.getenv("QUESTION_POOL_SIZE", "10")),
+            low_water=int(os.getenv("QUESTION_POOL_LOW_WATER", "3")),
+            ttl=int(os.getenv("QUESTION_POOL_TTL", str(6 * 3600))),
+            refill_interval=float(os.getenv("QUESTION_POOL_REFILL_INTERVAL", "5")),
+            concurrency=int(os.getenv("QUESTION_POOL_CONCURRENCY", "3")),
+        )
+
+    @staticmethod
+    def _key(dataset: str, level: str) -> str:
+        return f"pool:{dataset.lower()}:{level}"
+
+    def _is_stale(self, entry: Dict) -> bool:
+        return time.time() - entry.get("created_at", 0) > self.ttl
+
+    # --------------------------------------------------------
+    # Lectura (request path)
+    # --------------------------------------------------------
+
+    async def pop(self, dataset: str, level: str, served: Iterable[str] = ()) -> Optional[Dict]:
+        """
+        Saca una pregunta preparada del pool.
+
+        Descarta las caducadas y deja en su sitio las ya servidas en esta sesión
+        (para otras sesiones). Devuelve None si no hay ninguna utilizable.
+        """
+        key = self._key(dataset, level)
+        try:
+            raw = await self._pop(
+                keys=[key, self.STATS_KEY],
+                args=[time.time(), self.ttl, self.size, f"{dataset}:{level}:", *served],
+            )
+        except Exception as e:
+            logger.error(f"[QuestionPool] Error leyendo {key}: {e}")
+            return None
+        return json.loads(raw) if raw else None
+
+    async def stats(self) -> Dict:
+        """Contadores de aciertos/fallos y tamaño actual de cada pool."""
+        pools = [(d, l) for d in self.datasets for l in LEVELS]
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.hgetall(self.STATS_KEY)
+        for dataset, level in pools:
+            pipe.llen(self._key(dataset, level))
+        raw_counters, *lengths = await pipe.execute()
+        counters = {k: int(v) for k, v in (raw_counters or {}).items()}
+        sizes = {f"{d}:{l}": n for (d, l), n in zip(pools, lengths)}
+        hits = sum(v for k, v in counters.items() if k.endswith(":hits"))
+        misses = sum(v for k, v in counters.items() if k.endswith(":misses"))
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / (hits + misses), 3) if hits + misses else None,
+            "counters": counters,
+            "sizes": sizes,
+        }
+
+    # --------------------------------------------------------
+    # Relleno (background)
+    # --------------------------------------------------------
+
+    async def _evict_stale(self, key: str):
+        # Las entradas más antiguas están al final de la lista (LPUSH / RPOP)
+        while True:
+            raw = await self.redis.lindex(key, -1)
+            if raw is None or not self._is_stale(json.loads(raw)):
+                return
+            await self.redis.rpop(key)
+
+    async def _prepare_entry(self, generator, level: str) -> Optional[Dict]:
+        question, answer, detected = await generator.prepare_question(target_difficulty=level)
+        if not question or detected != level:
+            # Solo entran al pool preguntas del nivel exacto
+            return None
+        return {
+            "id": question_id(question, answer),
+            "question": question,
+            "answer": answer,
+            "difficulty": detected,
+            "created_at": time.time(),
+        }
+
+    async def refill(self, dataset: str, level: str) -> int:
+        """
+        Rellena un pool hasta `size` si está por debajo del low-water mark y el
+        generador del dataset está cargado en este worker.
+        """
+        generator = self.generator_for(dataset)
+        if generator is None:
+            return 0
+        key = self._key(dataset, level)
+        await self._evict_stale(key)
+        length = await self.redis.llen(key)
+        if length >= self.low_water:
+            return 0
+        missing = self.size - length
+        # Evita que varios workers rellenen el mismo pool a la vez
+        lock_key, token = f"pool:lock:{dataset}:{level}", uuid.uuid4().hex
+        if not await self.redis.set(lock_key, token, nx=True, ex=self.LOCK_TTL):
+            return 0
+
+        added = 0
+        try:
+            # Intentos acotados: un nivel escaso en el dataset no debe bloquear el refiller
+            for _ in range(3):
+                batch = min(self.concurrency, missing - added)
+                if batch <= 0:
+                    break
+                results = await asyncio.gather(
+                    *(self._prepare_entry(generator, level) for _ in range(batch)), return_exceptions=True
+                )
+                entries = [json.dumps(r, ensure_ascii=False) for r in results if isinstance(r, dict)]
+                if entries:
+                    pipe = self.redis.pipeline(transaction=False)
+                    pipe.lpush(key, *entries)
+                    pipe.expire(key, self.ttl)
+                    await pipe.execute()
+                    added += len(entries)
+        finally:
+            await self._release(keys=[lock_key], args=[token])
+        if added:
+            logger.info(f"[QuestionPool] {key}: +{added} preguntas")
+        return added
+
+    async def run_refiller(self):
+        """Bucle del refiller (se lanza como tarea en el arranque de la app)."""
+        logger.info(f"[QuestionPool] Refiller activo para {self.datasets} (size={self.size}, low={self.low_water})")
+        while True:
+            for dataset in self.datasets:
+                for level in LEVELS:
+                    try:
+                        await self.refill(dataset, level)
+                    except asyncio.CancelledError:
+                        raise
+                    except Exception as e:
+                        logger.error(f"[QuestionPool] Error rellenando {dataset}/{level}: {e}")
+            await asyncio.sleep(self.refill_interval)
@@ -1,9 +1,16 @@
 import os
+import json
+import time
+import argparse
 from dotenv import load_dotenv
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_community.vectorstores import Chroma
-from langchain_community.embeddings import HuggingFaceEmbeddings
-import torch
+from langchain_core.documents import Document
+
+from ..model_registry import SharedEmbeddings, default_device, embedding_backend, retrieval_model_name
+from .ingestion import IngestionPipeline, chunk_id, corpus_version
+from .lexical_index import LexicalIndex
+from .utils.chunk_metadata import chroma_where, flatten_metadata, parse_filters
 
 # Unicamente usamos SQUAD y Coachquant, pero importamos todos para soporte multi-dataset
 from .utils.dataset_readers import (
@@ -11,7 +18,8 @@ from .utils.dataset_readers import (
     reader_SQUAD,
     reader_eli5,
     reader_hotpotqa,
-    reader_coachquant
+    reader_coachquant,
+    reader_theory_books,
 )
 
 load_dotenv()
@@ -19,12 +27,22 @@ load_dotenv()
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 DB_DIR = os.path.join(BASE_DIR, "database")
 
+# Manifiesto del índice (dentro de chroma_db_<dataset>): modelo, versión del dataset y progreso
+MANIFEST_NAME = "index_manifest.json"
+# Chunks embebidos y confirmados en Chroma por lote (unidad de reanudación)
+INDEX_BATCH_SIZE = 256
+# Índice BM25 (SQLite FTS5) con los mismos chunks, dentro de chroma_db_<dataset>
+LEXICAL_INDEX_NAME = "lexical.sqlite"
+# Constante de reciprocal-rank fusion: 1 / (RRF_K + posición)
+RRF_K = 60
+SEARCH_MODES = ("hybrid", "vector", "lexical")
+
 
 class RAG:
     def __init__(
         self,
         db_path: str = DB_DIR,
-        model_embedder: str = "sentence-transformers/multi-qa-mpnet-base-dot-v1",
+        model_embedder: str | None = None,
         verbose: bool = False,
         dataset_type: str = "squad",  # Nuevo parámetro
     ):
@@ -33,66 +51,73 @@ class RAG:
 
         Args:
             db_path: ruta base donde se guardará chroma_db.
-            model_embedder: modelo de embeddings.
+            model_embedder: modelo de embeddings (por defecto el de recuperación del registro).
             verbose: si True imprime información extra durante las operaciones.
-            dataset_type: tipo de dataset ('squad', 'natural_questions', 'eli5', 'hotpotqa')
+            dataset_type: tipo de dataset ('squad', 'natural_questions', 'eli5', 'hotpotqa', 'coachquant', 'theory')
         """
         self.db_path = db_path
-        self.model_embedder = model_embedder
+        self.model_embedder = model_embedder or retrieval_model_name()
         self.db = None
+        self.lexical = None
         self.verbose = verbose
         self.dataset_type = dataset_type.lower()
 
-        if torch.cuda.is_available():
-            self.device = "cuda"
+        self.backend = embedding_backend()
+        self.device = default_device() if self.backend == "torch" else "cpu"
+        if self.device == "cuda":
             self.batch_size = 64
             if self.verbose:
-                print(f"[RAG] GPU detectada: {torch.cuda.get_device_name(0)}")
-        elif torch.backends.mps.is_available():
-            self.device = "mps"
+                print("[RAG] GPU detectada usando CUDA")
+        elif self.device == "mps":
             self.batch_size = 32
             if self.verbose:
                 print("[RAG] GPU detectada usando MPS")
+        elif self.backend != "torch":
+            # ONNX Runtime en CPU admite lotes mayores sin penalizar la latencia
+            self.batch_size = 32
+            if self.verbose:
+                print(f"[RAG] Usando CPU con backend {self.backend}")
         else:
-            self.device = "cpu"
             self.batch_size = 8
             if self.verbose:
                 print("[RAG] Usando CPU")
 
     def _get_embeddings(self):
-        """Crear instancia de embeddings (usa self.batch_size y self.device)."""
+        """Embeddings sobre el modelo compartido del proceso (usa self.batch_size y self.device)."""
         if self.verbose:
             print(
-                f"[RAG] Creando embeddings con modelo {self.model_embedder} en {self.device} (batch_size={self.batch_size})"
+                f"[RAG] Usando embeddings {self.model_embedder} en {self.device} (batch_size={self.batch_size})"
             )
-        return HuggingFaceEmbeddings(
-            model_name=self.model_embedder,
-            model_kwargs={
-                "device": self.device,
-                "trust_remote_code": True,
-            },
-            encode_kwargs={
-                "normalize_embeddings": True,
-                "batch_size": self.batch_size,
-            },
+        return SharedEmbeddings(
+            self.model_embedder, device=self.device, batch_size=self.batch_size, backend=self.backend
         )
 
-    def read_dataset(self, max_texts: int | None = None, sample_random: bool = False):
+    def read_dataset(
+        self,
+        max_texts: int | None = None,
+        sample_random: bool = False,
+        stream: bool = False,
+        with_metadata: bool = False,
+    ):
         """
         Método unificado para leer cualquier dataset según self.dataset_type.
+        Con stream=True devuelve un generador en lugar de una lista; con
+        with_metadata=True cada elemento es (texto, metadatos del registro).
         """
 
         # Solo se usan SQUAD y CoachQuant aquí, pero se importan todos para soporte multi-dataset
         if self.dataset_type == "squad":
-            return reader_SQUAD(max_texts, sample_random)
+            return reader_SQUAD(max_texts, sample_random, stream=stream, with_metadata=with_metadata)
         elif self.dataset_type == "natural_questions":
-            return reader_natural_questions(max_texts, sample_random)
+            return reader_natural_questions(max_texts, sample_random, stream=stream, with_metadata=with_metadata)
         elif self.dataset_type == "eli5":
-            return reader_eli5(max_texts, sample_random)
+            return reader_eli5(max_texts, sample_random, stream=stream, with_metadata=with_metadata)
         elif self.dataset_type == "hotpotqa":
-            return reader_hotpotqa(max_texts, sample_random)
+            return reader_hotpotqa(max_texts, sample_random, stream=stream, with_metadata=with_metadata)
         elif self.dataset_type == "coachquant":
-            return reader_coachquant(max_texts=max_texts, sample_random=sample_random)
+            return reader_coachquant(max_texts=max_texts, sample_random=sample_random, stream=stream, with_metadata=with_metadata)
+        elif self.dataset_type == "theory":
+            return reader_theory_books(max_texts=max_texts, stream=stream, with_metadata=with_metadata)
         else:
             raise ValueError(f"Tipo de dataset no soportado: {self.dataset_type}")
 
@@ -136,6 +161,32 @@ class RAG:
             print(f"[RAG] Total de chunks creados: {len(all_chunks)}")
         return all_chunks
 
+    def _db_dir(self) -> str:
+        return os.path.join(self.db_path, f"chroma_db_{self.dataset_type}")
+
+    def _get_lexical(self) -> LexicalIndex:
+        """Índice BM25 del dataset (se abre la primera vez; no carga modelos)."""
+        if self.lexical is None:
+            os.makedirs(self._db_dir(), exist_ok=True)
+            self.lexical = LexicalIndex(os.path.join(self._db_dir(), LEXICAL_INDEX_NAME))
+        return self.lexical
+
+    def _read_manifest(self) -> dict:
+        path = os.path.join(self._db_dir(), MANIFEST_NAME)
+        try:
+            with open(path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_manifest(self, manifest: dict):
+        # Escritura atómica: un corte a mitad no deja un manifiesto truncado
+        path = os.path.join(self._db_dir(), MANIFEST_NAME)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({**manifest, "updated_at": time.time()}, f, indent=2)
+        os.replace(tmp, path)
+
     def create_chroma_db(
         self,
         sample_size: int | None = None,
@@ -143,9 +194,22 @@ class RAG:
         chunk_size: int = 1024,
         max_chunks: int | None = None,
         verbose: bool | None = None,
+        rebuild: bool = False,
     ):
         """
-        Crea y guarda una base vectorial con Chroma.
+        Crea o actualiza de forma incremental la base vectorial Chroma del dataset.
+
+        El dataset se procesa en streaming (ver `ingestion.IngestionPipeline`):
+        lector -> chunking en procesos -> lotes de embeddings -> escritura por
+        lotes, con colas acotadas entre etapas, así que la memoria no crece con
+        el corpus. Cada chunk se guarda con un ID derivado de su contenido: solo
+        se embeben los chunks que aún no están en la base y, si se ha leído el
+        dataset completo, al final se borran los que ya no salen de él (con
+        sample_size, sample_random o max_chunks la lectura es parcial y no se
+        borra nada: un chunk no leído no es un chunk obsoleto). Los lotes se confirman uno a uno y el
+        manifiesto registra el progreso, de modo que una ejecución interrumpida
+        continúa donde se quedó. Si cambia el modelo de embeddings, la base se
+        reconstruye entera.
 
         Args:
             sample_size: si se pasa un entero, solo se usan hasta sample_size pares QA (útil para testing).
@@ -153,6 +217,9 @@ class RAG:
             chunk_size: tamaño de chunk para splitter.
             max_chunks: si se pasa, limita el número total de chunks a indexar (útil para testing).
             verbose: override del verbosity por llamada.
+            rebuild: si True, vacía la base antes de indexar.
+        Returns:
+            Dict con los chunks añadidos, borrados y sin cambios, y las estadísticas por etapa.
         """
         if verbose is None:
             verbose = self.verbose
@@ -162,36 +229,116 @@ class RAG:
                 f"[RAG] Iniciando creación de la DB para dataset '{self.dataset_type}' (sample_size={sample_size}, sample_random={sample_random}, chunk_size={chunk_size}, max_chunks={max_chunks})"
             )
 
-        qa_texts = self.read_dataset(max_texts=sample_size, sample_random=sample_random)
-        if not qa_texts:
-            raise ValueError("No text to generate the embedding database")
+        db_dir = self._db_dir()
+        os.makedirs(db_dir, exist_ok=True)
+        manifest = self._read_manifest()
+        self.load_chroma_db(verbose=False)
 
-        chunks = self.chunker(qa_texts, chunk_size=chunk_size, max_chunks=max_chunks)
-        if not chunks:
-            raise ValueError("No chunks created from the texts")
+        if manifest.get("embedding_model") not in (None, self.model_embedder) or rebuild:
+            if verbose:
+                print(
+                    f"[RAG] Reconstruyendo la DB (modelo anterior: {manifest.get('embedding_model')}, "
+                    f"actual: {self.model_embedder})"
+                )
+            self.db.delete_collection()
+            self.load_chroma_db(verbose=False)
+            self._get_lexical().clear()
+        elif manifest.get("status") == "building" and verbose:
+            print(f"[RAG] Reanudando indexación interrumpida ({manifest.get('committed', 0)} chunks confirmados)")
 
-        embeddings = self._get_embeddings()
+        existing = set(self.db.get(include=[])["ids"])
+        manifest = {
+            "dataset_type": self.dataset_type,
+            "embedding_model": self.model_embedder,
+            "chunk_size": chunk_size,
+            "committed": len(existing),
+            "status": "building",
+        }
+        self._write_manifest(manifest)
 
-        # Crear directorio específico por dataset
-        db_dir = os.path.join(self.db_path, f"chroma_db_{self.dataset_type}")
-        if verbose:
-            print(f"[RAG] Creando Database con {len(chunks)} chunks en {db_dir}")
+        def commit(n: int):
+            manifest["committed"] += n
+            self._write_manifest(manifest)
 
-        self.db = Chroma.from_texts(
-            texts=chunks,
-            embedding=embeddings,
-            persist_directory=db_dir,
+        # Se escribe con los vectores ya calculados en la etapa de embedding
+        # (add_texts volvería a embeber); upsert es idempotente al reanudar
+        lexical = self._get_lexical()
+
+        def write(ids, texts, metadatas, vectors):
+            self.db._collection.upsert(ids=ids, documents=texts, metadatas=metadatas, embeddings=vectors)
+            lexical.upsert(ids, texts, metadatas)
+
+        embeddings = self._get_embeddings()
+        pipeline = IngestionPipeline.from_env(
+            embed=embeddings.embed_documents,
+            write=write,
+            chunk_size=chunk_size,
+            batch_size=INDEX_BATCH_SIZE,
+            verbose=verbose,
+        )
+        # Cada chunk hereda los metadatos aplanados de su registro (firma, tags, dificultad...)
+        records = self.read_dataset(
+            max_texts=sample_size, sample_random=sample_random, stream=True, with_metadata=True
         )
+        result = pipeline.run(
+            ((text, flatten_metadata(meta)) for text, meta in records),
+            existing_ids=existing,
+            max_chunks=max_chunks,
+            on_commit=commit,
+        )
+        seen = result["seen_ids"]
+        if not seen:
+            raise ValueError("No chunks created from the texts")
+
+        # Primero se añaden los nuevos y después se borran los obsoletos: un corte
+        # a mitad nunca deja la base con menos contenido del que tenía. Solo se
+        # podan si se ha leído todo el corpus
+        partial = sample_size is not None or sample_random or max_chunks is not None
+        stale_ids = [] if partial else list(existing - seen)
+        for offset in range(0, len(stale_ids), INDEX_BATCH_SIZE):
+            self.db.delete(ids=stale_ids[offset:offset + INDEX_BATCH_SIZE])
+        indexed = existing | seen if partial else seen
+        self._sync_lexical(indexed, verbose=verbose)
 
+        manifest.update({
+            "status": "complete",
+            "partial": partial,
+            "chunks": len(indexed),
+            "committed": len(indexed),
+            "dataset_version": corpus_version(indexed),
+            "stages": result["stages"],
+        })
+        self._write_manifest(manifest)
         if verbose:
-            print("[RAG] Base de datos creada y persistida")
+            print(
+                f"[RAG] Base de datos actualizada: {result['added']} chunks nuevos, "
+                f"{len(stale_ids)} obsoletos borrados, {result['unchanged']} sin cambios"
+            )
+        return {
+            "added": result["added"],
+            "deleted": len(stale_ids),
+            "unchanged": result["unchanged"],
+            "stages": result["stages"],
+        }
+
+    def _sync_lexical(self, ids: set, verbose: bool = False):
+        """Deja el índice BM25 con exactamente los chunks `ids` (rellena desde Chroma los que falten)."""
+        lexical = self._get_lexical()
+        indexed = lexical.ids()
+        lexical.delete(indexed - ids)
+        missing = list(ids - indexed)
+        for offset in range(0, len(missing), INDEX_BATCH_SIZE):
+            batch = self.db.get(ids=missing[offset:offset + INDEX_BATCH_SIZE], include=["documents", "metadatas"])
+            lexical.upsert(batch["ids"], batch["documents"], batch["metadatas"])
+        if verbose and (missing or indexed - ids):
+            print(f"[RAG] Índice BM25 sincronizado: {len(missing)} añadidos, {len(indexed - ids)} borrados")
 
     def load_chroma_db(self, verbose: bool | None = None):
         """Cargar base de datos existente"""
         if verbose is None:
             verbose = self.verbose
         embeddings = self._get_embeddings()
-        db_dir = os.path.join(self.db_path, f"chroma_db_{self.dataset_type}")
+        db_dir = self._db_dir()
         if verbose:
             print(f"[RAG] Cargando DB desde {db_dir}")
         self.db = Chroma(
@@ -201,34 +348,111 @@ class RAG:
         if verbose:
             print("[RAG] DB cargada")
 
-    def search(self, query: str, k: int = 5, verbose: bool | None = None):
-        """Buscar contextos similares a una query"""
+    def search(self, query: str, k: int = 5, filters=None, verbose: bool | None = None):
+        """
+        Buscar contextos similares a una query.
+
+        Args:
+            filters: metadatos que deben cumplir los chunks, como dict o cadena
+                ("firm=worldquant, difficulty=Dificil, tag=markov-chains"). Se aplican
+                en Chroma (filtro `where`), no descartando resultados en Python.
+        """
         if verbose is None:
             verbose = self.verbose
         if not self.db:
             if verbose:
                 print("[RAG] DB no cargada, intentando load_chroma_db()")
             self.load_chroma_db(verbose=verbose)
-        results = self.db.similarity_search(query, k=k)
+        results = self.db.similarity_search(query, k=k, filter=chroma_where(parse_filters(filters)))
         if verbose:
             print(f"[RAG] Se encontraron {len(results)} contextos similares.")
         return results
 
 
+    def lexical_search(self, query: str, k: int = 5, filters=None):
+        """
+        Búsqueda BM25 pura: barata y sin modelos (para llamadas sensibles a la latencia).
+        Admite los mismos `filters` que `search`.
+        """
+        return [
+            Document(page_content=text, metadata={**meta, "id": cid, "bm25": round(score, 4)})
+            for cid, text, meta, score in self._get_lexical().search(query, k=k, filters=parse_filters(filters))
+        ]
+
+    def hybrid_search(
+        self,
+        query: str,
+        k: int = 5,
+        mode: str = "hybrid",
+        candidates: int | None = None,
+        filters=None,
+        verbose: bool | None = None,
+    ):
+        """
+        Búsqueda combinando BM25 y vectores con reciprocal-rank fusion.
+
+        Args:
+            mode: 'hybrid' (ambos), 'vector' (solo Chroma) o 'lexical' (solo BM25).
+            candidates: resultados que aporta cada recuperador antes de fusionar (por defecto 4*k).
+            filters: filtros de metadatos (ver `search`), aplicados en ambos índices.
+        Returns:
+            Lista de Documents; en modo híbrido cada uno lleva `rrf_score` en metadata.
+        """
+        if verbose is None:
+            verbose = self.verbose
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"Modo de búsqueda no soportado: {mode}")
+        if mode == "lexical":
+            return self.lexical_search(query, k=k, filters=filters)
+        if mode == "vector":
+            return self.search(query, k=k, filters=filters, verbose=verbose)
+
+        candidates = candidates or max(4 * k, 20)
+        lexical = self.lexical_search(query, k=candidates, filters=filters)
+        dense = self.search(query, k=candidates, filters=filters, verbose=verbose)
+        if not lexical and verbose:
+            print("[RAG] Índice BM25 vacío o sin coincidencias; solo resultados vectoriales")
+
+        # Los IDs son el hash de contenido y metadatos: los resultados de Chroma se
+        # identifican recalculándolo; los de BM25 ya traen su ID
+        scores, docs = {}, {}
+        for ranking in (lexical, dense):
+            for rank, doc in enumerate(ranking, start=1):
+                cid = doc.metadata.get("id") if ranking is lexical else chunk_id(doc.page_content, doc.metadata)
+                scores[cid] = scores.get(cid, 0.0) + 1.0 / (RRF_K + rank)
+                docs.setdefault(cid, doc)
+        best = sorted(scores, key=scores.get, reverse=True)[:k]
+        results = []
+        for cid in best:
+            doc = docs[cid]
+            results.append(Document(
+                page_content=doc.page_content,
+                metadata={
+                    **{key: v for key, v in (doc.metadata or {}).items() if key != "bm25"},
+                    "id": cid,
+                    "rrf_score": round(scores[cid], 5),
+                },
+            ))
+        if verbose:
+            print(f"[RAG] Híbrida: {len(lexical)} BM25 + {len(dense)} vectoriales -> {len(results)}")
+        return results
+
+
 if __name__ == "__main__":
-    # Ejemplo de uso con diferentes datasets
-    print("=== Testing SQuAD ===")
-    rag_squad = RAG(dataset_type="squad", verbose=True)
-    rag_squad.create_chroma_db(sample_random=True, chunk_size=512, max_chunks=50)
-
-    print("\n=== Testing Natural Questions ===")
-    rag_nq = RAG(dataset_type="natural_questions", verbose=True)
-    rag_nq.create_chroma_db(sample_random=True, chunk_size=512, max_chunks=50)
-
-    print("\n=== Testing ELI5 ===")
-    rag_eli5 = RAG(dataset_type="eli5", verbose=True)
-    rag_eli5.create_chroma_db(sample_random=True, chunk_size=512, max_chunks=50)
-
-    print("\n=== Testing HotPotQA ===")
-    rag_hotpotqa = RAG(dataset_type="hotpotqa", verbose=True)
-    rag_hotpotqa.create_chroma_db(sample_random=True, chunk_size=512, max_chunks=50)
+    parser = argparse.ArgumentParser(description="Crea o actualiza (incremental) la base Chroma de un dataset.")
+    parser.add_argument("--dataset", default="squad", help="Dataset a indexar (squad, coachquant, ...)")
+    parser.add_argument("--sample-size", type=int, default=None, help="Máximo de pares QA a leer")
+    parser.add_argument("--sample-random", action="store_true", help="Muestra aleatoria (con --sample-size)")
+    parser.add_argument("--chunk-size", type=int, default=1024, help="Tamaño de chunk")
+    parser.add_argument("--max-chunks", type=int, default=None, help="Máximo de chunks a indexar")
+    parser.add_argument("--rebuild", action="store_true", help="Vacía la base antes de indexar")
+    args = parser.parse_args()
+
+    stats = RAG(dataset_type=args.dataset, verbose=True).create_chroma_db(
+        sample_size=args.sample_size,
+        sample_random=args.sample_random,
+        chunk_size=args.chunk_size,
+        max_chunks=args.max_chunks,
+        rebuild=args.rebuild,
+    )
+    print(f"[RAG] {stats}")
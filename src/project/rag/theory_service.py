@@ -0,0 +1,131 @@
+"""
+Servicio de teoría sobre un índice local de los libros (PDF).
+
+Los libros de THEORY_BOOKS_DIR se indexan una vez, por secciones y con
+referencia de página, con la misma maquinaria que los datasets
+(`./scripts/load_db.sh theory`: Chroma + BM25). Cada consulta recupera solo los
+pasajes más relevantes y los envía al proveedor configurado (Gemini, DeepSeek o
+Groq), en lugar de adjuntar los libros completos en cada llamada.
+
+Configuración (variables de entorno):
+    THEORY_BOOKS_DIR     carpeta de los PDF (por defecto misc/books)
+    THEORY_TOP_K         pasajes enviados al LLM (por defecto 4)
+    THEORY_SEARCH_MODE   hybrid | vector | lexical (por defecto hybrid)
+"""
+import os
+import asyncio
+import logging
+
+from project.llm import get_llm
+from .ingestion import chunk_id
+
+logger = logging.getLogger(__name__)
+
+
+class TheoryService:
+    def __init__(self):
+        self.llm = get_llm()
+        self.provider = self.llm.provider
+        self.model_name = self.llm.settings.model
+        self.top_k = int(os.getenv("THEORY_TOP_K", "4"))
+        self.search_mode = os.getenv("THEORY_SEARCH_MODE", "hybrid")
+        self.rag = None
+        self._load_lock = asyncio.Lock()
+        self._load_error = None
+        logger.info(f"TheoryService configurado con {self.provider} ({self.model_name})")
+
+    def _open_index(self):
+        from .rag import RAG
+        rag = RAG(dataset_type="theory")
+        if not len(rag._get_lexical()):
+            raise FileNotFoundError("índice de teoría vacío (ejecuta ./scripts/load_db.sh theory)")
+        if self.search_mode != "lexical":
+            rag.load_chroma_db()
+        return rag
+
+    async def warm_up(self):
+        """Abre el índice (y el modelo de embeddings si hace falta) una sola vez."""
+        async with self._load_lock:
+            # Si falló (p.ej. aún no se había indexado), se reintenta en la siguiente consulta
+            if self.rag is not None:
+                return
+            try:
+                self.rag = await asyncio.to_thread(self._open_index)
+                self._load_error = None
+                logger.info("📚 Índice de teoría cargado")
+            except Exception as e:
+                self._load_error = str(e)
+                logger.error(f"Error cargando el índice de teoría: {e}")
+
+    async def _retrieve(self, question_text):
+        await self.warm_up()
+        if self.rag is None:
+            return None
+        return await asyncio.to_thread(
+            self.rag.hybrid_search, question_text, k=self.top_k, mode=self.search_mode
+        )
+
+    @staticmethod
+    def _reference(doc):
+        meta = doc.metadata or {}
+        return f"{meta.get('book', '?')}, {meta.get('section', '?')}, p. {meta.get('page', '?')}"
+
+    def _build_prompt(self, question_text, passages):
+        blocks = "\n\n".join(
+            f"[{i}] ({self._reference(doc)})\n{doc.page_content}" for i, doc in enumerate(passages, start=1)
+        )
+        return f"""
+            Actúa como un profesor experto en matemáticas.
+            Explica la TEORÍA necesaria para entender: "{question_text}"
+            Usa SOLO los siguientes pasajes de los libros y cita entre corchetes
+            el pasaje y la página de cada idea (p.ej. [1, p. 42]).
+
+            PASAJES:
+            {blocks}
+            """
+
+    def _llm_kwargs(self, question_text, passages):
+        return dict(
+            model=self.model_name,
+            prompt_type="theory", prompt_version=2,
+            cache_inputs={
+                "question": question_text,
+                "passages": [doc.metadata.get("id") or chunk_id(doc.page_content) for doc in passages],
+            }
+        )
+
+    def _unavailable_message(self):
+        return (
+            "No hay libros de teoría indexados o no se pudieron cargar"
+            + (f": {self._load_error}." if self._load_error else ".")
+        )
+
+    async def get_theory_explanation(self, question_text):
+        passages = await self._retrieve(question_text)
+        if passages is None:
+            return self._unavailable_message()
+        if not passages:
+            return "No se encontraron pasajes relevantes en los libros de teoría."
+
+        try:
+            return await self.llm.complete(
+                self._build_prompt(question_text, passages), **self._llm_kwargs(question_text, passages)
+            )
+        except Exception as e:
+            logger.error(f"Error generando explicación: {e}")
+            return "Error consultando biblioteca."
+
+    async def stream_theory_explanation(self, question_text):
+        """Versión en streaming de get_theory_explanation."""
+        passages = await self._retrieve(question_text)
+        if passages is None:
+            yield self._unavailable_message()
+            return
+        if not passages:
+            yield "No se encontraron pasajes relevantes en los libros de teoría."
+            return
+
+        async for delta in self.llm.stream(
+            self._build_prompt(question_text, passages), **self._llm_kwargs(question_text, passages)
+        ):
+            yield delta
@@ -5,3 +5,4 @@ from .dataset_readers import (
     reader_hotpotqa,
     reader_coachquant,
 )
+from .dataset_store import DatasetStore, get_store
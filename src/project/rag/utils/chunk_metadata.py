@@ -0,0 +1,111 @@
+"""
+Metadatos estructurados de los chunks (firma, título, url, tags, dificultad).
+
+Chroma solo admite valores escalares en los metadatos, así que cada registro se
+aplana: los campos de texto se guardan tal cual y cada tag se convierte en una
+clave booleana `tag:<slug>`. Los filtros ("firm=worldquant, difficulty=Dificil",
+"tag=markov-chains") se traducen a ese mismo esquema, tanto para el filtro
+`where` de Chroma como para el índice BM25.
+"""
+import re
+import unicodedata
+from typing import Any, Dict, Iterable, Optional, Union
+
+# Dificultad de la fuente (CoachQuant: Easy/Medium/Hard) -> niveles de la app
+DIFFICULTY_LEVELS = {
+    "easy": "Facil",
+    "facil": "Facil",
+    "medium": "Medio",
+    "medio": "Medio",
+    "hard": "Dificil",
+    "dificil": "Dificil",
+}
+
+# Campos escalares que se copian a los metadatos de cada chunk (book/section/page: libros de teoría)
+SCALAR_FIELDS = ("dataset", "firm", "title", "url_page", "difficulty", "book", "section", "page")
+TAG_PREFIX = "tag:"
+
+
+def _ascii(text: str) -> str:
+    return unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode("ascii")
+
+
+def slugify(text: str) -> str:
+    """'Conditional Expectation' -> 'conditional-expectation'."""
+    return re.sub(r"[^a-z0-9]+", "-", _ascii(str(text)).lower()).strip("-")
+
+
+def normalize_difficulty(value: Any) -> Optional[str]:
+    """Easy/Medium/Hard (o Facil/Medio/Difícil) -> Facil/Medio/Dificil; None si no se reconoce."""
+    if not value:
+        return None
+    return DIFFICULTY_LEVELS.get(_ascii(str(value)).strip().lower())
+
+
+def flatten_metadata(meta: Optional[Dict[str, Any]]) -> Dict[str, Union[str, bool]]:
+    """Metadatos de un registro -> dict escalar para Chroma (sin None ni listas)."""
+    flat: Dict[str, Union[str, bool]] = {}
+    for field in SCALAR_FIELDS:
+        value = (meta or {}).get(field)
+        if value not in (None, ""):
+            flat[field] = str(value)
+    for tag in (meta or {}).get("tags") or []:
+        slug = slugify(tag)
+        if slug:
+            flat[f"{TAG_PREFIX}{slug}"] = True
+    return flat
+
+
+def tags_of(flat: Dict[str, Any]) -> list:
+    """Slugs de los tags de unos metadatos aplanados."""
+    return sorted(k[len(TAG_PREFIX):] for k, v in flat.items() if k.startswith(TAG_PREFIX) and v)
+
+
+def parse_filters(filters: Union[None, str, Dict[str, Any]]) -> Dict[str, Union[str, bool]]:
+    """
+    Normaliza filtros al esquema aplanado.
+
+    Acepta un dict ({"firm": "worldquant", "tags": ["markov"]}) o una cadena
+    "firm=worldquant, difficulty=Dificil, tag=markov-chains".
+
+    Raises:
+        ValueError si un filtro no tiene la forma clave=valor o la clave no existe.
+    """
+    if not filters:
+        return {}
+    if isinstance(filters, str):
+        items = []
+        for part in filters.split(","):
+            if not part.strip():
+                continue
+            if "=" not in part:
+                raise ValueError(f"Filtro no válido (se esperaba clave=valor): {part.strip()}")
+            key, value = part.split("=", 1)
+            items.append((key.strip(), value.strip()))
+    else:
+        items = list(filters.items())
+
+    flat: Dict[str, Union[str, bool]] = {}
+    for key, value in items:
+        key = key.lower()
+        if key in ("tag", "tags"):
+            values: Iterable = value if isinstance(value, (list, tuple, set)) else [value]
+            for tag in values:
+                flat[f"{TAG_PREFIX}{slugify(tag)}"] = True
+        elif key == "difficulty":
+            flat[key] = normalize_difficulty(value) or str(value)
+        elif key == "firm":
+            flat[key] = slugify(value)
+        elif key in SCALAR_FIELDS:
+            flat[key] = str(value)
+        else:
+            raise ValueError(f"Filtro desconocido: {key}")
+    return flat
+
+
+def chroma_where(flat: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Filtro `where` de Chroma (igualdad de todas las claves)."""
+    if not flat:
+        return None
+    conditions = [{key: value} for key, value in flat.items()]
+    return conditions[0] if len(conditions) == 1 else {"$and": conditions}
@@ -1,35 +1,89 @@
-import numpy as np
-from datasets import load_dataset
+import os
+import json
+import random
+from itertools import islice
+
+from .dataset_store import get_store, format_qa_record
+from .chunk_metadata import normalize_difficulty, slugify
+from .pdf_reader import read_pdf_sections
 
 '''
 NOTA: Aqui solo usamos el SQUAD y Coachquant en la version final. Pero dejamos los otros readers
 por si en el futuro se quieren usar otros datasets.
+
+Todos los readers pasan por un DatasetStore: el dataset se convierte una sola vez
+a un snapshot local indexado y las lecturas posteriores solo tocan los registros
+devueltos (funciona offline una vez creado el snapshot).
 '''
 
-def _process_qa_texts(qa_texts, max_texts, sample_random, verbose=1):
-    """Helper para procesar y limitar qa_texts."""
-    total = len(qa_texts)
+# Campos del registro que forman el texto; el resto son metadatos
+_TEXT_FIELDS = ("question", "answer", "context", "context_id")
+
+
+def _record_metadata(store, rec):
+    meta = {k: v for k, v in rec.items() if k not in _TEXT_FIELDS}
+    meta["dataset"] = store.name
+    return meta
+
+
+def _read_from_store(store, max_texts, sample_random, verbose=1, stream=False, with_metadata=False):
+    """
+    Helper para limitar/muestrear los pares QA de un DatasetStore.
+
+    Con stream=True devuelve un generador: los registros se leen del snapshot
+    según se consumen, sin materializar la lista (ingestión de corpus grandes).
+    Con with_metadata=True cada elemento es (texto, metadatos del registro).
+    """
+    if store is None:
+        return iter(()) if stream else []
+    total = len(store)
     if verbose:
-        print(f"[RAG] Pares QA construidos totales: {total}")
+        print(f"[RAG] Pares QA en el snapshot: {total}")
 
     if max_texts is not None and total > max_texts:
         if sample_random:
             if verbose:
                 print(f"[RAG] Muestreando aleatoriamente {max_texts} pares")
-            indices = np.random.choice(total, size=max_texts, replace=False)
-            qa_texts = [qa_texts[i] for i in indices]
+            indices = random.sample(range(total), max_texts)
         else:
             if verbose:
                 print(f"[RAG] Limitando a los primeros {max_texts} pares")
-            qa_texts = qa_texts[:max_texts]
-
+            indices = range(max_texts)
+    else:
+        indices = range(total)
+
+    if with_metadata:
+        qa_texts = (
+            (format_qa_record(rec), _record_metadata(store, rec))
+            for rec in (store.get(i) for i in indices)
+        )
+    else:
+        qa_texts = (format_qa_record(store.get(i)) for i in indices)
+    if stream:
+        return qa_texts
+    qa_texts = list(qa_texts)
     if verbose:
         print(f"[RAG] Pares QA devueltos: {len(qa_texts)}")
     return qa_texts
 
 
+# Libros de teoría (PDF) por defecto: <repo>/misc/books
+DEFAULT_THEORY_BOOKS_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))),
+    "misc",
+    "books",
+)
+
+
+def _load_hf_dataset(*args, **kwargs):
+    # Import diferido: con el snapshot ya creado no hace falta cargar `datasets`
+    from datasets import load_dataset
+    return load_dataset(*args, **kwargs)
+
+
 def reader_SQUAD(
-    max_texts: int | None = None, sample_random: bool = False, verbose: bool = True
+    max_texts: int | None = None, sample_random: bool = False, verbose: bool = True, stream: bool = False,
+    with_metadata: bool = False,
 ):
     """
     Leer SQuAD dataset desde Hugging Face.
@@ -40,14 +94,11 @@ def reader_SQUAD(
     Returns:
         Lista de strings con "Contexto: ... \nPregunta: ... \nRespuesta: ..."
     """
-    qa_texts = []
-
-    if verbose:
-        print("[RAG] Cargando SQuAD desde Hugging Face...")
-
-    try:
+    def build():
+        if verbose:
+            print("[RAG] Cargando SQuAD desde Hugging Face...")
         # Cargar dataset SQuAD v1.1
-        dataset = load_dataset("squad", split="train", trust_remote_code=True)
+        dataset = _load_hf_dataset("squad", split="train", trust_remote_code=True)
 
         if verbose:
             print(f"[RAG] Dataset cargado: {len(dataset)} ejemplos")
@@ -62,36 +113,27 @@ def reader_SQUAD(
             answer = answer_texts[0] if answer_texts else ""
 
             if context and question and answer:
-                text_block = (
-                    f"Contexto: {context}\nPregunta: {question}\nRespuesta: {answer}"
-                )
-                qa_texts.append(text_block)
-
-    except Exception as e:
-        if verbose:
-            print(f"[RAG] Error cargando SQuAD: {e}")
-        return []
+                yield {"context": context, "question": question, "answer": answer}
 
-    return _process_qa_texts(qa_texts, max_texts, sample_random, verbose)
+    store = get_store("squad", build, version="squad:train", verbose=verbose)
+    return _read_from_store(store, max_texts, sample_random, verbose, stream, with_metadata)
 
 
 def reader_natural_questions(
-    max_texts: int | None = None, sample_random: bool = False, verbose: bool = True
+    max_texts: int | None = None, sample_random: bool = False, verbose: bool = True, stream: bool = False,
+    with_metadata: bool = False,
 ):
     """
     Leer Natural Questions dataset desde Hugging Face.
 
     Usa el dataset 'google-research-datasets/natural_questions'
     """
-    qa_texts = []
-
-    if verbose:
-        print("[RAG] Cargando Natural Questions desde Hugging Face...")
-
-    try:
+    def build():
+        if verbose:
+            print("[RAG] Cargando Natural Questions desde Hugging Face...")
         # Cargar solo una porción del dataset (es muy grande)
         # Usamos el validation split que es más pequeño
-        dataset = load_dataset(
+        dataset = _load_hf_dataset(
             "google-research-datasets/natural_questions",
             split="validation[:10000]",  # Primeros 10k ejemplos
             trust_remote_code=True,
@@ -126,35 +168,28 @@ def reader_natural_questions(
                     answer = annotations[0]["yes_no_answer"]
 
             if question and context and answer:
-                text_block = (
-                    f"Contexto: {context}\nPregunta: {question}\nRespuesta: {answer}"
-                )
-                qa_texts.append(text_block)
-
-    except Exception as e:
-        if verbose:
-            print(f"[RAG] Error cargando Natural Questions: {e}")
-        return []
+                yield {"context": context, "question": question, "answer": answer}
 
-    return _process_qa_texts(qa_texts, max_texts, sample_random, verbose)
+    store = get_store(
+        "natural_questions", build, version="natural_questions:validation[:10000]", verbose=verbose
+    )
+    return _read_from_store(store, max_texts, sample_random, verbose, stream, with_metadata)
 
 
 def reader_eli5(
-    max_texts: int | None = None, sample_random: bool = False, verbose: bool = True
+    max_texts: int | None = None, sample_random: bool = False, verbose: bool = True, stream: bool = False,
+    with_metadata: bool = False,
 ):
     """
     Leer ELI5 dataset desde Hugging Face.
 
     Usa el dataset 'eli5'
     """
-    qa_texts = []
-
-    if verbose:
-        print("[RAG] Cargando ELI5 desde Hugging Face...")
-
-    try:
+    def build():
+        if verbose:
+            print("[RAG] Cargando ELI5 desde Hugging Face...")
         # Cargar train split del dataset ELI5
-        dataset = load_dataset(
+        dataset = _load_hf_dataset(
             "eli5_category",
             split="train[:5000]",  # Primeros 5k ejemplos
             trust_remote_code=True,
@@ -179,33 +214,26 @@ def reader_eli5(
                     answer_text = answer_texts[0][:500]
 
             if question and answer_text:
-                text_block = f"Pregunta: {question}\nRespuesta: {answer_text}"
-                qa_texts.append(text_block)
-
-    except Exception as e:
-        if verbose:
-            print(f"[RAG] Error cargando ELI5: {e}")
-        return []
+                yield {"question": question, "answer": answer_text}
 
-    return _process_qa_texts(qa_texts, max_texts, sample_random, verbose)
+    store = get_store("eli5", build, version="eli5_category:train[:5000]", verbose=verbose)
+    return _read_from_store(store, max_texts, sample_random, verbose, stream, with_metadata)
 
 
 def reader_hotpotqa(
-    max_texts: int | None = None, sample_random: bool = False, verbose: bool = True
+    max_texts: int | None = None, sample_random: bool = False, verbose: bool = True, stream: bool = False,
+    with_metadata: bool = False,
 ):
     """
     Leer HotpotQA dataset desde Hugging Face.
 
     Usa el dataset 'hotpot_qa'
     """
-    qa_texts = []
-
-    if verbose:
-        print("[RAG] Cargando HotpotQA desde Hugging Face...")
-
-    try:
+    def build():
+        if verbose:
+            print("[RAG] Cargando HotpotQA desde Hugging Face...")
         # Cargar distractor split (contiene preguntas multi-hop)
-        dataset = load_dataset(
+        dataset = _load_hf_dataset(
             "hotpot_qa",
             "distractor",
             split="train[:5000]",  # Primeros 5k ejemplos
@@ -236,28 +264,20 @@ def reader_hotpotqa(
             context = " ".join(context_parts)[:1500]
 
             if question and answer and context:
-                text_block = (
-                    f"Contexto: {context}\nPregunta: {question}\nRespuesta: {answer}"
-                )
-                qa_texts.append(text_block)
-
-    except Exception as e:
-        if verbose:
-            print(f"[RAG] Error cargando HotpotQA: {e}")
-        return []
+                yield {"context": context, "question": question, "answer": answer}
 
-    return _process_qa_texts(qa_texts, max_texts, sample_random, verbose)
+    store = get_store("hotpotqa", build, version="hotpot_qa:distractor:train[:5000]", verbose=verbose)
+    return _read_from_store(store, max_texts, sample_random, verbose, stream, with_metadata)
 
 def reader_coachquant(
     data_path: str = "src/database/coachquant_all.jsonl",
     max_texts: int | None = None,
     sample_random: bool = False,
     verbose: bool = True,
+    stream: bool = False,
+    with_metadata: bool = False,
 ):
     """Lee tu dataset scrapeado (JSONL con un objeto por línea)."""
-    import json, os
-    import numpy as np
-
     if verbose:
         print("[RAG] Cargando dataset CoachQuant...")
 
@@ -266,34 +286,72 @@ def reader_coachquant(
             print(f"[RAG] No existe el archivo: {data_path}")
         return []
 
-    qa_texts = []
-    with open(data_path, "r", encoding="utf-8") as f:
-        for line in f:
-            try:
-                obj = json.loads(line)
-                raw = obj.get("raw", {})
-                question = raw.get("problem text", "") or obj.get("question_text", "")
-                answer = (
-                    raw.get("problem solution", "")
-                    or obj.get("answer_text", "")
-                    or raw.get("valid answer", "")
-                )
-                if question and answer:
-                    qa_texts.append(f"Pregunta: {question}\nRespuesta: {answer}")
-            except Exception as e:
-                if verbose:
-                    print(f"[RAG] Error leyendo línea: {e}")
-
-    total = len(qa_texts)
-    if verbose:
-        print(f"[RAG] Total pares QA leídos: {total}")
+    def build():
+        with open(data_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    obj = json.loads(line)
+                    raw = obj.get("raw", {})
+                    question = raw.get("problem text", "") or obj.get("question_text", "")
+                    answer = (
+                        raw.get("problem solution", "")
+                        or obj.get("answer_text", "")
+                        or raw.get("valid answer", "")
+                    )
+                    if question and answer:
+                        firms = raw.get("problem firm") or []
+                        yield {
+                            "question": question,
+                            "answer": answer,
+                            "firm": obj.get("firm") or (slugify(firms[0]) if firms else None),
+                            "title": obj.get("title") or raw.get("problem name"),
+                            "url_page": obj.get("url_page"),
+                            "tags": obj.get("tags") or raw.get("problem tags") or [],
+                            "difficulty": normalize_difficulty(
+                                obj.get("difficulty") or raw.get("problem difficulty")
+                            ),
+                        }
+                except Exception as e:
+                    if verbose:
+                        print(f"[RAG] Error leyendo línea: {e}")
+
+    # El snapshot se regenera si cambia el fichero fuente (p.ej. tras un nuevo scrape)
+    stat = os.stat(data_path)
+    # "meta1": los registros incluyen firm/title/url_page/tags/difficulty
+    version = f"{os.path.abspath(data_path)}:{stat.st_size}:{int(stat.st_mtime)}:meta1"
+    store = get_store("coachquant", build, version=version, verbose=verbose)
+    return _read_from_store(store, max_texts, sample_random, verbose, stream, with_metadata)
+
+
+def reader_theory_books(
+    books_dir: str | None = None,
+    max_texts: int | None = None,
+    sample_random: bool = False,
+    verbose: bool = True,
+    stream: bool = False,
+    with_metadata: bool = False,
+):
+    """
+    Lee los libros de teoría (PDF) de THEORY_BOOKS_DIR por secciones y páginas.
 
-    if max_texts and total > max_texts:
-        if sample_random:
-            idx = np.random.choice(total, size=max_texts, replace=False)
-            qa_texts = [qa_texts[i] for i in idx]
-        else:
-            qa_texts = qa_texts[:max_texts]
+    Cada elemento es el texto de una página dentro de una sección, encabezado por
+    el título de la sección; los metadatos llevan libro, sección y página.
+    sample_random se ignora: los libros se leen en orden.
+    """
+    books_dir = books_dir or os.getenv("THEORY_BOOKS_DIR") or DEFAULT_THEORY_BOOKS_DIR
+    paths = sorted(
+        os.path.join(books_dir, name) for name in (os.listdir(books_dir) if os.path.isdir(books_dir) else [])
+        if name.lower().endswith(".pdf")
+    )
     if verbose:
-        print(f"[RAG] Pares QA devueltos: {len(qa_texts)}")
-    return qa_texts
+        print(f"[RAG] Libros de teoría en {books_dir}: {len(paths)}")
+
+    def items():
+        for path in paths:
+            for text, meta in read_pdf_sections(path):
+                meta = {**meta, "dataset": "theory"}
+                text = f"{meta['section']}\n{text}"
+                yield (text, meta) if with_metadata else text
+
+    texts = islice(items(), max_texts) if max_texts is not None else items()
+    return texts if stream else list(texts)
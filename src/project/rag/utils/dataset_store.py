@@ -0,0 +1,276 @@
+"""
+Snapshots locales de datasets con acceso aleatorio por índice.
+
+Cada dataset se convierte una sola vez a un fichero JSONL con un índice de
+offsets (uint64) que se abre con mmap. Los contextos que comparten muchas
+preguntas (SQuAD) se guardan una única vez en un fichero aparte y los registros
+solo guardan su id. Así, muestrear k registros no exige construir la lista
+completa ni volver a descargar/parsear el dataset.
+
+Cada construcción va a su propio directorio (`snap-<id>`) y se publica
+reescribiendo de forma atómica el fichero `CURRENT`, que apunta a él. Los
+lectores nunca ven un snapshot a medias ni un momento sin snapshot, y dos
+workers que construyen a la vez no se pisan.
+"""
+import os
+import json
+import mmap
+import random
+import uuid
+import shutil
+import logging
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+STORE_DIR = os.path.join(BASE_DIR, "database", "datasets")
+
+SNAPSHOT_FORMAT = 2
+CURRENT_FILE = "CURRENT"
+
+
+class _IndexedFile:
+    """Fichero JSONL + índice de offsets, abierto con mmap."""
+
+    def __init__(self, data_path: str, index_path: str):
+        self.offsets = np.load(index_path, mmap_mode="r")
+        self._file = open(data_path, "rb")
+        size = os.path.getsize(data_path)
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+    def __len__(self) -> int:
+        return max(len(self.offsets) - 1, 0)
+
+    def get(self, i: int):
+        start, end = int(self.offsets[i]), int(self.offsets[i + 1])
+        return json.loads(self._mm[start:end])
+
+    def close(self):
+        if isinstance(self._mm, mmap.mmap):
+            self._mm.close()
+        self._file.close()
+
+
+class _IndexedWriter:
+    def __init__(self, data_path: str, index_path: str):
+        self._f = open(data_path, "wb")
+        self._index_path = index_path
+        self._offsets = [0]
+
+    def append(self, obj) -> int:
+        line = json.dumps(obj, ensure_ascii=False).encode("utf-8") + b"\n"
+        self._f.write(line)
+        self._offsets.append(self._offsets[-1] + len(line))
+        return len(self._offsets) - 2
+
+    def close(self):
+        self._f.close()
+        np.save(self._index_path, np.asarray(self._offsets, dtype=np.uint64))
+
+
+class DatasetStore:
+    def __init__(
+        self,
+        name: str,
+        builder: Callable[[], Iterable[Dict]],
+        version: str = "",
+        store_dir: str = STORE_DIR,
+        verbose: bool = True,
+    ):
+        """
+        Snapshot local de un dataset.
+
+        Args:
+            name: nombre del dataset (subdirectorio del snapshot).
+            builder: función que devuelve un iterable de registros
+                {"question", "answer", opcionalmente "context"}. Solo se llama
+                si el snapshot no existe o su versión no coincide.
+            version: identificador de la fuente; si cambia, se reconstruye el snapshot.
+            store_dir: directorio base de snapshots.
+        """
+        self.name = name
+        self.version = version
+        self.path = os.path.join(store_dir, name)
+        self.verbose = verbose
+        snapshot = self._current_snapshot()
+        if snapshot is None or not self._is_current(snapshot):
+            snapshot = self._build(builder)
+        self.snapshot_path = snapshot
+        self.records = _IndexedFile(
+            os.path.join(snapshot, "records.jsonl"), os.path.join(snapshot, "records.npy")
+        )
+        self.contexts = _IndexedFile(
+            os.path.join(snapshot, "contexts.jsonl"), os.path.join(snapshot, "contexts.npy")
+        )
+
+    def _current_snapshot(self) -> Optional[str]:
+        """Directorio del snapshot publicado, o None si no hay ninguno."""
+        try:
+            with open(os.path.join(self.path, CURRENT_FILE), "r", encoding="utf-8") as f:
+                name = f.read().strip()
+        except OSError:
+            return None
+        return os.path.join(self.path, name) if name else None
+
+    def _is_current(self, snapshot: str) -> bool:
+        meta_path = os.path.join(snapshot, "meta.json")
+        if not os.path.exists(meta_path):
+            return False
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return False
+        return meta.get("format") == SNAPSHOT_FORMAT and meta.get("version") == self.version
+
+    def _build(self, builder: Callable[[], Iterable[Dict]]) -> str:
+        """Construye un snapshot nuevo, lo publica en CURRENT y devuelve su directorio."""
+        if self.verbose:
+            print(f"[DatasetStore] Construyendo snapshot local de '{self.name}'...")
+        build_id = f"{os.getpid()}-{uuid.uuid4().hex[:12]}"
+        tmp_path = os.path.join(self.path, f"tmp-{build_id}")
+        os.makedirs(tmp_path)
+
+        records = _IndexedWriter(os.path.join(tmp_path, "records.jsonl"), os.path.join(tmp_path, "records.npy"))
+        contexts = _IndexedWriter(os.path.join(tmp_path, "contexts.jsonl"), os.path.join(tmp_path, "contexts.npy"))
+        context_ids: Dict[str, int] = {}
+        try:
+            for rec in builder():
+                rec = dict(rec)
+                context = rec.pop("context", None)
+                if context:
+                    if context not in context_ids:
+                        context_ids[context] = contexts.append(context)
+                    rec["context_id"] = context_ids[context]
+                records.append(rec)
+        except Exception:
+            records.close()
+            contexts.close()
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            raise
+        records.close()
+        contexts.close()
+
+        with open(os.path.join(tmp_path, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "format": SNAPSHOT_FORMAT,
+                    "version": self.version,
+                    "records": len(records._offsets) - 1,
+                    "contexts": len(context_ids),
+                },
+                f,
+            )
+
+        # Publicación: el directorio completo se renombra a su nombre final y después
+        # CURRENT se sustituye con un único os.replace (atómico)
+        snapshot_name = f"snap-{build_id}"
+        snapshot = os.path.join(self.path, snapshot_name)
+        os.replace(tmp_path, snapshot)
+        previous = self._current_snapshot()
+        pointer_tmp = os.path.join(self.path, f"{CURRENT_FILE}.tmp-{build_id}")
+        with open(pointer_tmp, "w", encoding="utf-8") as f:
+            f.write(snapshot_name)
+        os.replace(pointer_tmp, os.path.join(self.path, CURRENT_FILE))
+        self._remove_stale(snapshot, previous)
+
+        if self.verbose:
+            print(
+                f"[DatasetStore] Snapshot '{self.name}' listo: "
+                f"{len(records._offsets) - 1} registros, {len(context_ids)} contextos únicos"
+            )
+        return snapshot
+
+    @staticmethod
+    def _built_at(snapshot: Optional[str]) -> float:
+        try:
+            return os.path.getmtime(os.path.join(snapshot, "meta.json"))
+        except (OSError, TypeError):
+            return 0.0
+
+    def _remove_stale(self, snapshot: str, previous: Optional[str]):
+        """
+        Borra los snapshots anteriores al último publicado. Se conservan el nuevo,
+        el anterior (otro worker puede haber leído CURRENT justo antes del cambio)
+        y cualquiera más reciente que este (otro worker que lo está publicando).
+        Los ficheros ya abiertos (mmap) siguen siendo legibles tras borrarlos en POSIX.
+        """
+        cutoff = self._built_at(previous) if previous else self._built_at(snapshot)
+        for entry in os.listdir(self.path):
+            path = os.path.join(self.path, entry)
+            if path in (snapshot, previous) or entry == CURRENT_FILE or entry.startswith(("tmp-", f"{CURRENT_FILE}.tmp-")):
+                continue
+            if entry.startswith("snap-"):
+                if self._built_at(path) < cutoff:
+                    shutil.rmtree(path, ignore_errors=True)
+                continue
+            # Restos del formato 1 (snapshot directamente en el directorio del dataset)
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def get(self, i: int) -> Dict:
+        """Devuelve el registro i con su contexto resuelto."""
+        rec = self.records.get(i)
+        context_id = rec.pop("context_id", None)
+        if context_id is not None:
+            rec["context"] = self.contexts.get(context_id)
+        return rec
+
+    def __iter__(self) -> Iterator[Dict]:
+        for i in range(len(self)):
+            yield self.get(i)
+
+    def sample(self, k: int) -> List[Dict]:
+        """k registros aleatorios sin reemplazo (coste O(k))."""
+        k = min(k, len(self))
+        return [self.get(i) for i in random.sample(range(len(self)), k)]
+
+    def head(self, k: int) -> List[Dict]:
+        return [self.get(i) for i in range(min(k, len(self)))]
+
+    def close(self):
+        self.records.close()
+        self.contexts.close()
+
+
+_STORES: Dict[str, DatasetStore] = {}
+
+
+def get_store(
+    name: str,
+    builder: Callable[[], Iterable[Dict]],
+    version: str = "",
+    verbose: bool = True,
+    store_dir: str = STORE_DIR,
+) -> Optional[DatasetStore]:
+    """Devuelve el store del dataset, construyéndolo la primera vez (cacheado por proceso)."""
+    current = _STORES.get(name)
+    if current is not None and current.version == version:
+        return current
+    try:
+        store = DatasetStore(name, builder, version=version, store_dir=store_dir, verbose=verbose)
+    except Exception as e:
+        if verbose:
+            print(f"[DatasetStore] Error construyendo '{name}': {e}")
+        return None
+    _STORES[name] = store
+    if current is not None:
+        # El store sustituido libera su mmap y su descriptor de fichero
+        current.close()
+    return store
+
+
+def format_qa_record(rec: Dict) -> str:
+    """Convierte un registro al bloque de texto 'Contexto/Pregunta/Respuesta'."""
+    text = f"Pregunta: {rec['question']}\nRespuesta: {rec['answer']}"
+    if rec.get("context"):
+        text = f"Contexto: {rec['context']}\n{text}"
+    return text
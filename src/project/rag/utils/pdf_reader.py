@@ -0,0 +1,101 @@
+"""
+Lectura de libros en PDF por secciones, con referencia de página.
+
+Las secciones salen del índice (outline/marcadores) del PDF; si no lo tiene, de
+los encabezados detectados en el texto ("Chapter 3", "2.4 Martingales"...).
+Cada elemento devuelto es el texto de una página dentro de una sección, de modo
+que los chunks nunca mezclan dos secciones y siempre se pueden citar por página.
+"""
+import os
+import re
+import logging
+from typing import Dict, Iterator, List, Optional, Tuple
+
+try:
+    from pypdf import PdfReader
+except ImportError:
+    PdfReader = None
+
+logger = logging.getLogger(__name__)
+
+# Encabezados habituales cuando el PDF no trae outline ("Capítulo 3 ...", "2.4 Martingales"),
+# sin dígitos en el título (descarta filas de tablas) y sin el nº de página final del índice
+_HEADING = re.compile(
+    r"^[ \t]*((?:chapter|cap[ií]tulo|section|secci[oó]n)[ \t]+\d+[^\d\n]{0,80}?"
+    r"|\d+(?:\.\d+){1,2}\.?[ \t]+[^\W\d_][^\d\n]{2,80}?)(?:[ \t]+\d+)?[ \t]*$",
+    re.IGNORECASE | re.MULTILINE,
+)
+
+
+def _outline_sections(reader) -> List[Tuple[int, str]]:
+    """(página inicial, título) de cada entrada del outline, ordenadas por página."""
+    sections = []
+
+    def walk(items):
+        for item in items:
+            if isinstance(item, list):
+                walk(item)
+                continue
+            try:
+                sections.append((reader.get_destination_page_number(item), str(item.title).strip()))
+            except Exception:
+                continue
+
+    try:
+        walk(reader.outline or [])
+    except Exception as e:
+        logger.warning(f"[PDFReader] Outline ilegible: {e}")
+    return sorted(set(sections))
+
+
+def _clean(text: str) -> str:
+    # Une palabras cortadas con guion al final de línea y compacta espacios
+    text = re.sub(r"(\w)-\n(\w)", r"\1\2", text)
+    return re.sub(r"[ \t]+", " ", text).strip()
+
+
+def read_pdf_sections(path: str) -> Iterator[Tuple[str, Dict[str, object]]]:
+    """
+    Recorre el PDF página a página.
+
+    Yields:
+        (texto de la página, {"book", "section", "page"}) con la página en base 1.
+    Raises:
+        ImportError si pypdf no está instalado.
+    """
+    if PdfReader is None:
+        raise ImportError("pypdf no está instalado: pip install pypdf")
+
+    reader = PdfReader(path)
+    book = os.path.splitext(os.path.basename(path))[0]
+    outline = _outline_sections(reader)
+    section: Optional[str] = None
+    next_outline = 0
+
+    for page_number, page in enumerate(reader.pages):
+        while next_outline < len(outline) and outline[next_outline][0] <= page_number:
+            section = outline[next_outline][1]
+            next_outline += 1
+        try:
+            text = _clean(page.extract_text() or "")
+        except Exception as e:
+            logger.warning(f"[PDFReader] Página {page_number + 1} de {book} ilegible: {e}")
+            continue
+        if not text:
+            continue
+
+        if not outline:
+            # Sin outline: un encabezado a mitad de página abre una sección nueva
+            position = 0
+            for match in _HEADING.finditer(text):
+                before = text[position:match.start()].strip()
+                if before:
+                    yield before, {"book": book, "section": section or book, "page": page_number + 1}
+                # Entradas del índice: sin los puntos de relleno ("2.6.2. Objetos ... . . .")
+                section = re.sub(r"[\s.]+$", "", match.group(1))
+                position = match.start()
+            text = text[position:].strip()
+            if not text:
+                continue
+
+        yield text, {"book": book, "section": section or book, "page": page_number + 1}
@@ -0,0 +1,821 @@
+"""
+Almacén de sesiones de entrevista con escrituras por campo, atómicas y con TTL.
+
+Esquema en Redis (cada valor de campo es JSON):
+    session:{<sid>}    hash con el estado de la sesión (un campo por clave)
+    qmap:{<sid>}       hash: "{n}" -> pregunta n, "{n}:reference_features" -> features
+    answers:{<sid>}    hash: "{n}:{campo}" -> campo de la respuesta n (un campo por clave)
+
+Las llaves `{<sid>}` son un hash tag: las tres claves de una sesión caen en el
+mismo slot de Redis Cluster, y cada script declara en KEYS todas las que toca.
+
+El cliente es redis.asyncio (pool de conexiones, sin bloquear el event loop) y
+las lecturas/escrituras relacionadas van en un mismo pipeline: enviar una
+respuesta cuesta dos round trips (sesión + pregunta, y registro atómico).
+
+Las actualizaciones tocan solo los campos que cambian y las que dependen del
+estado leído (registrar una respuesta y avanzar la sesión, guardar un campo solo
+si la respuesta existe, explicación solo si no hay otra, features solo si la
+pregunta no ha cambiado) se hacen en un script Lua, de modo que dos peticiones
+concurrentes no se pisan. Todas las claves de una sesión caducan tras SESSION_TTL
+segundos sin actividad (TTL deslizante: cada lectura de la sesión lo renueva).
+
+Sin Redis, `SQLiteSessionStore` ofrece la misma interfaz sobre un fichero SQLite
+en modo WAL: lo comparten todos los workers de uvicorn de una máquina, las
+operaciones compuestas van en transacciones `BEGIN IMMEDIATE` y las sesiones
+caducadas se purgan periódicamente. `MemorySessionStore` (solo un worker) queda
+para pruebas.
+
+Configuración (variables de entorno):
+    SESSION_BACKEND   auto | redis | sqlite | memory (por defecto auto: Redis si responde, si no SQLite)
+    SESSION_DB_PATH   fichero del backend sqlite (por defecto src/database/sessions.sqlite)
+    SESSION_TTL       segundos de inactividad antes de expirar una sesión (por defecto 24h)
+"""
+import os
+import json
+import time
+import asyncio
+import sqlite3
+import hashlib
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from redis.exceptions import NoScriptError
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SESSION_TTL = 24 * 3600
+SESSION_BACKENDS = ("auto", "redis", "sqlite", "memory")
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_SESSION_DB_PATH = os.path.join(BASE_DIR, "database", "sessions.sqlite")
+# Campos de la respuesta que se rellenan después (y que no se guardan mientras son None)
+ANSWER_DEFAULTS = {"feedback": None, "explanation": None, "metrics": None}
+
+
+def session_ttl_from_env() -> int:
+    return int(os.getenv("SESSION_TTL", str(DEFAULT_SESSION_TTL)))
+
+
+def session_backend_from_env() -> str:
+    backend = os.getenv("SESSION_BACKEND", "auto").lower()
+    if backend not in SESSION_BACKENDS:
+        logger.warning(f"[SessionStore] SESSION_BACKEND '{backend}' no soportado, usando auto")
+        return "auto"
+    return backend
+
+
+def create_session_store(redis_client=None):
+    """
+    Crea el almacén de sesiones según SESSION_BACKEND.
+
+    Args:
+        redis_client: cliente redis.asyncio ya comprobado, o None si Redis no responde.
+    """
+    backend, ttl = session_backend_from_env(), session_ttl_from_env()
+    if backend in {"auto", "redis"} and redis_client is not None:
+        return RedisSessionStore(redis_client, ttl=ttl)
+    if backend == "redis":
+        logger.warning("[SessionStore] Redis no disponible, usando el backend sqlite")
+    if backend == "memory":
+        return MemorySessionStore(ttl=ttl)
+    path = os.getenv("SESSION_DB_PATH", DEFAULT_SESSION_DB_PATH)
+    logger.info(f"[SessionStore] Sesiones en SQLite: {path}")
+    return SQLiteSessionStore(path, ttl=ttl)
+
+
+def _encode(fields: Dict[str, Any]) -> Dict[str, str]:
+    return {k: json.dumps(v, ensure_ascii=False) for k, v in fields.items() if v is not None}
+
+
+def _decode(raw: Dict[str, str]) -> Dict[str, Any]:
+    return {k: json.loads(v) for k, v in raw.items()}
+
+
+def _answer(raw: Dict[str, str]) -> Dict[str, Any]:
+    return {**ANSWER_DEFAULTS, **_decode(raw)}
+
+
+# Renueva el TTL de todas las claves de la sesión y devuelve su estado
+_GET_SESSION = """
+local fields = redis.call('HGETALL', KEYS[1])
+if #fields == 0 then return fields end
+local ttl = tonumber(ARGV[1])
+for _, key in ipairs(KEYS) do redis.call('EXPIRE', key, ttl) end
+return fields
+"""
+
+# Registra la respuesta y avanza la sesión solo si current_question sigue siendo el esperado
+# ARGV: esperado, ttl, nº de pares de la respuesta, pares "{n}:{campo}"..., pares de la sesión...
+_RECORD_ANSWER = """
+local current = redis.call('HGET', KEYS[1], 'current_question')
+if not current or tonumber(current) ~= tonumber(ARGV[1]) then return 0 end
+local ttl = tonumber(ARGV[2])
+local answer_end = 3 + 2 * tonumber(ARGV[3])
+for i = 4, answer_end, 2 do redis.call('HSET', KEYS[2], ARGV[i], ARGV[i + 1]) end
+for i = answer_end + 1, #ARGV, 2 do redis.call('HSET', KEYS[1], ARGV[i], ARGV[i + 1]) end
+redis.call('HINCRBY', KEYS[1], 'current_question', 1)
+for _, key in ipairs(KEYS) do redis.call('EXPIRE', key, ttl) end
+return 1
+"""
+
+# Guarda un campo de la respuesta n si existe (ARGV[5] = '1': solo si el campo no existe)
+# ARGV: n, campo, valor, ttl, solo si falta
+_SET_ANSWER_FIELD = """
+if redis.call('HEXISTS', KEYS[1], ARGV[1] .. ':question_number') == 0 then return 0 end
+local field = ARGV[1] .. ':' .. ARGV[2]
+local written = 1
+if ARGV[5] == '1' then
+    written = redis.call('HSETNX', KEYS[1], field, ARGV[3])
+else
+    redis.call('HSET', KEYS[1], field, ARGV[3])
+end
+redis.call('EXPIRE', KEYS[1], tonumber(ARGV[4]))
+return written
+"""
+
+# Añade un elemento a un campo lista (JSON) de la sesión
+_APPEND_SESSION_ITEM = """
+if redis.call('EXISTS', KEYS[1]) == 0 then return 0 end
+local raw = redis.call('HGET', KEYS[1], ARGV[1])
+local items = {}
+if raw then items = cjson.decode(raw) end
+table.insert(items, cjson.decode(ARGV[2]))
+redis.call('HSET', KEYS[1], ARGV[1], cjson.encode(items))
+redis.call('EXPIRE', KEYS[1], tonumber(ARGV[3]))
+return 1
+"""
+
+# Guarda los features de la pregunta n solo si sigue siendo la misma respuesta correcta
+_SET_REFERENCE_FEATURES = """
+local raw = redis.call('HGET', KEYS[1], ARGV[1])
+if not raw or cjson.decode(raw)['correct_answer'] ~= ARGV[2] then return 0 end
+redis.call('HSET', KEYS[1], ARGV[1] .. ':reference_features', ARGV[3])
+redis.call('EXPIRE', KEYS[1], tonumber(ARGV[4]))
+return 1
+"""
+
+_SCRIPTS = {
+    "get_session": _GET_SESSION,
+    "record_answer": _RECORD_ANSWER,
+    "set_answer_field": _SET_ANSWER_FIELD,
+    "append_session_item": _APPEND_SESSION_ITEM,
+    "set_reference_features": _SET_REFERENCE_FEATURES,
+}
+_SCRIPT_SHAS = {name: hashlib.sha1(script.encode("utf-8")).hexdigest() for name, script in _SCRIPTS.items()}
+
+
+class RedisSessionStore:
+    def __init__(self, redis_client, ttl: int = DEFAULT_SESSION_TTL):
+        """
+        Args:
+            redis_client: cliente redis.asyncio (decode_responses=True, con su pool de conexiones).
+            ttl: segundos de inactividad antes de que expiren las claves de la sesión.
+        """
+        self.redis = redis_client
+        self.ttl = ttl
+
+    @staticmethod
+    def _keys(session_id: str):
+        # Hash tag {sid}: todas las claves de la sesión en el mismo slot
+        tag = f"{{{session_id}}}"
+        return f"session:{tag}", f"qmap:{tag}", f"answers:{tag}"
+
+    @staticmethod
+    def _script(pipe, name: str, keys: List[str], args: List[Any]):
+        pipe.evalsha(_SCRIPT_SHAS[name], len(keys), *keys, *args)
+
+    async def _execute(self, queue: Callable[[Any], None], transaction: bool = False) -> List[Any]:
+        """
+        Ejecuta en un solo round trip los comandos que `queue` encola en un pipeline.
+        Los scripts se invocan por SHA; si el servidor no los tiene (arranque, SCRIPT FLUSH)
+        se cargan y se repite el pipeline.
+        """
+        for attempt in range(2):
+            pipe = self.redis.pipeline(transaction=transaction)
+            queue(pipe)
+            try:
+                return await pipe.execute()
+            except NoScriptError:
+                if attempt:
+                    raise
+                for script in _SCRIPTS.values():
+                    await self.redis.script_load(script)
+
+    def _queue_get(self, pipe, session_id: str):
+        self._script(pipe, "get_session", list(self._keys(session_id)), [self.ttl])
+
+    def _queue_get_question(self, pipe, session_id: str, question_number: int):
+        pipe.hmget(self._keys(session_id)[1], str(question_number), f"{question_number}:reference_features")
+
+    def _queue_get_answers(self, pipe, session_id: str):
+        pipe.hgetall(self._keys(session_id)[2])
+
+    @staticmethod
+    def _session_from(flat: List[str]) -> Optional[Dict[str, Any]]:
+        return _decode(dict(zip(flat[::2], flat[1::2]))) if flat else None
+
+    @staticmethod
+    def _question_from(values: List[Optional[str]]) -> Optional[Dict[str, Any]]:
+        raw, features = values
+        if raw is None:
+            return None
+        data = json.loads(raw)
+        if features:
+            data["reference_features"] = json.loads(features)
+        return data
+
+    @staticmethod
+    def _answers_from(raw: Dict[str, str]) -> List[Dict[str, Any]]:
+        """Campos "{n}:{campo}" del hash de respuestas -> respuestas ordenadas por n."""
+        by_number: Dict[int, Dict[str, str]] = {}
+        for key, value in raw.items():
+            number, _, field = key.partition(":")
+            by_number.setdefault(int(number), {})[field] = value
+        return [_answer(by_number[n]) for n in sorted(by_number)]
+
+    # --------------------------------------------------------
+    # Sesión
+    # --------------------------------------------------------
+
+    async def create(self, session_id: str, data: Dict[str, Any]):
+        session_key = self._keys(session_id)[0]
+
+        def queue(pipe):
+            pipe.hset(session_key, mapping=_encode(data))
+            pipe.expire(session_key, self.ttl)
+
+        await self._execute(queue, transaction=True)
+
+    async def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Estado de la sesión (o None); renueva el TTL de todas sus claves."""
+        (flat,) = await self._execute(lambda pipe: self._queue_get(pipe, session_id))
+        return self._session_from(flat)
+
+    async def get_with_question(
+        self, session_id: str, question_number: int
+    ) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        """Sesión y pregunta n en un solo round trip."""
+
+        def queue(pipe):
+            self._queue_get(pipe, session_id)
+            self._queue_get_question(pipe, session_id, question_number)
+
+        flat, values = await self._execute(queue)
+        return self._session_from(flat), self._question_from(values)
+
+    async def get_with_answers(self, session_id: str) -> Tuple[Optional[Dict[str, Any]], List[Dict[str, Any]]]:
+        """Sesión y todas sus respuestas en un solo round trip."""
+
+        def queue(pipe):
+            self._queue_get(pipe, session_id)
+            self._queue_get_answers(pipe, session_id)
+
+        flat, raw_answers = await self._execute(queue)
+        return self._session_from(flat), self._answers_from(raw_answers)
+
+    async def update(self, session_id: str, fields: Dict[str, Any]):
+        """Sobrescribe solo los campos indicados de la sesión."""
+        session_key = self._keys(session_id)[0]
+
+        def queue(pipe):
+            pipe.hset(session_key, mapping=_encode(fields))
+            pipe.expire(session_key, self.ttl)
+
+        await self._execute(queue, transaction=True)
+
+    async def delete(self, session_id: str):
+        # Las respuestas viven en un único hash: un solo DEL, sin claves huérfanas
+        await self.redis.delete(*self._keys(session_id))
+
+    async def session_ids(self) -> List[str]:
+        return [key[len("session:{"):-1] async for key in self.redis.scan_iter("session:{*}")]
+
+    # --------------------------------------------------------
+    # Preguntas
+    # --------------------------------------------------------
+
+    async def set_question(
+        self, session_id: str, question_number: int, data: Dict[str, Any], served_id: Optional[str] = None
+    ):
+        """
+        Guarda la pregunta n (y descarta los features de una pregunta anterior con ese
+        número); con `served_id` la añade también a served_questions, en el mismo round trip.
+        """
+        session_key, qmap_key, _ = self._keys(session_id)
+
+        def queue(pipe):
+            if served_id:
+                self._script(
+                    pipe, "append_session_item", [session_key],
+                    ["served_questions", json.dumps(served_id, ensure_ascii=False), self.ttl],
+                )
+            pipe.hset(qmap_key, str(question_number), json.dumps(data, ensure_ascii=False))
+            pipe.hdel(qmap_key, f"{question_number}:reference_features")
+            pipe.expire(qmap_key, self.ttl)
+
+        await self._execute(queue)
+
+    async def get_question(self, session_id: str, question_number: int) -> Optional[Dict[str, Any]]:
+        """Pregunta n con sus `reference_features` si ya se calcularon."""
+        (values,) = await self._execute(lambda pipe: self._queue_get_question(pipe, session_id, question_number))
+        return self._question_from(values)
+
+    async def set_reference_features(
+        self, session_id: str, question_number: int, correct_answer: str, features: Dict[str, Any]
+    ) -> bool:
+        (written,) = await self._execute(lambda pipe: self._script(
+            pipe, "set_reference_features", [self._keys(session_id)[1]],
+            [str(question_number), correct_answer, json.dumps(features), self.ttl],
+        ))
+        return bool(written)
+
+    # --------------------------------------------------------
+    # Respuestas
+    # --------------------------------------------------------
+
+    async def record_answer(
+        self, session_id: str, expected_question: int, answer: Dict[str, Any], session_updates: Dict[str, Any]
+    ) -> bool:
+        """
+        Guarda la respuesta, aplica `session_updates` e incrementa current_question,
+        todo de forma atómica y solo si current_question sigue valiendo `expected_question`.
+        Devuelve False si otra petición ya registró esa respuesta.
+        """
+        session_key, _, answers_key = self._keys(session_id)
+        number = answer["question_number"]
+        answer_fields = {f"{number}:{key}": value for key, value in _encode(answer).items()}
+        args = [expected_question, self.ttl, len(answer_fields)]
+        for fields in (answer_fields, _encode(session_updates)):
+            for key, value in fields.items():
+                args.extend((key, value))
+        (recorded,) = await self._execute(lambda pipe: self._script(
+            pipe, "record_answer", [session_key, answers_key], args
+        ))
+        return bool(recorded)
+
+    async def get_answer(self, session_id: str, question_number: int) -> Optional[Dict[str, Any]]:
+        prefix = f"{question_number}:"
+        raw = await self.redis.hgetall(self._keys(session_id)[2])
+        fields = {key[len(prefix):]: value for key, value in raw.items() if key.startswith(prefix)}
+        return _answer(fields) if fields else None
+
+    async def get_answers(self, session_id: str) -> List[Dict[str, Any]]:
+        """Respuestas de la sesión ordenadas por número de pregunta."""
+        (raw_answers,) = await self._execute(lambda pipe: self._queue_get_answers(pipe, session_id))
+        return self._answers_from(raw_answers)
+
+    async def set_answer_field(
+        self, session_id: str, question_number: int, field: str, value: Any, only_if_missing: bool = False
+    ) -> bool:
+        """
+        Guarda un campo (métricas, feedback, explicación...) de una respuesta existente.
+        Con only_if_missing no sobrescribe un valor ya guardado (el primero gana).
+        """
+        (written,) = await self._execute(lambda pipe: self._script(
+            pipe, "set_answer_field", [self._keys(session_id)[2]],
+            [question_number, field, json.dumps(value, ensure_ascii=False), self.ttl, "1" if only_if_missing else "0"],
+        ))
+        return bool(written)
+
+
+class SQLiteSessionStore:
+    """
+    Misma interfaz que RedisSessionStore sobre SQLite (WAL): válido para varios
+    workers en una misma máquina. Cada respuesta es una fila y sus campos se
+    actualizan con las funciones JSON de SQLite, sin reescribir la sesión.
+    """
+
+    EVICT_INTERVAL = 60  # segundos entre purgas de sesiones caducadas
+    TOUCH_INTERVAL = 60  # las lecturas solo renuevan el TTL si se renovó hace más de esto
+
+    def __init__(self, path: str = DEFAULT_SESSION_DB_PATH, ttl: int = DEFAULT_SESSION_TTL):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._last_eviction = 0.0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # Autocommit: las operaciones compuestas abren su propia transacción (BEGIN IMMEDIATE)
+        self.conn = sqlite3.connect(path, check_same_thread=False, timeout=10, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA foreign_keys=ON")
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS sessions (
+                session_id TEXT PRIMARY KEY,
+                data TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_sessions_expires ON sessions(expires_at);
+            CREATE TABLE IF NOT EXISTS questions (
+                session_id TEXT NOT NULL REFERENCES sessions(session_id) ON DELETE CASCADE,
+                question_number INTEGER NOT NULL,
+                data TEXT NOT NULL,
+                reference_features TEXT,
+                PRIMARY KEY (session_id, question_number)
+            );
+            CREATE TABLE IF NOT EXISTS answers (
+                session_id TEXT NOT NULL REFERENCES sessions(session_id) ON DELETE CASCADE,
+                question_number INTEGER NOT NULL,
+                data TEXT NOT NULL,
+                PRIMARY KEY (session_id, question_number)
+            );
+            """
+        )
+
+    @contextmanager
+    def _transaction(self, mode: str = "IMMEDIATE"):
+        # IMMEDIATE toma el lock de escritura al empezar: lo leído en la transacción no
+        # puede quedar obsoleto por otro worker. DEFERRED: instantánea de solo lectura (WAL)
+        with self._lock:
+            self.conn.execute(f"BEGIN {mode}")
+            try:
+                yield self.conn
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.conn.execute("COMMIT")
+
+    async def _run(self, fn, *args):
+        # SQLite bloquea (disco, espera del lock de escritura): fuera del event loop
+        return await asyncio.to_thread(fn, *args)
+
+    @staticmethod
+    def _session(conn, session_id: str, now: float):
+        """(estado, expires_at) de la sesión, o None si no existe o ha caducado."""
+        row = conn.execute(
+            "SELECT data, expires_at FROM sessions WHERE session_id = ? AND expires_at >= ?", (session_id, now)
+        ).fetchone()
+        return (json.loads(row[0]), row[1]) if row else None
+
+    def _touch(self, conn, session_id: str) -> Optional[Dict[str, Any]]:
+        """Renueva el TTL de la sesión y devuelve su estado (dentro de una transacción de escritura)."""
+        now = time.time()
+        found = self._session(conn, session_id, now)
+        if found is None:
+            return None
+        conn.execute("UPDATE sessions SET expires_at = ? WHERE session_id = ?", (now + self.ttl, session_id))
+        return found[0]
+
+    # Las filas de una sesión caducada (aún sin purgar) no se leen ni se escriben
+    _LIVE = "EXISTS (SELECT 1 FROM sessions s WHERE s.session_id = {table}.session_id AND s.expires_at >= ?)"
+
+    @classmethod
+    def _question(cls, conn, session_id: str, question_number: int, now: float) -> Optional[Dict[str, Any]]:
+        row = conn.execute(
+            "SELECT data, reference_features FROM questions WHERE session_id = ? AND question_number = ? "
+            "AND " + cls._LIVE.format(table="questions"),
+            (session_id, question_number, now),
+        ).fetchone()
+        if row is None:
+            return None
+        data = json.loads(row[0])
+        if row[1]:
+            data["reference_features"] = json.loads(row[1])
+        return data
+
+    @classmethod
+    def _answers(cls, conn, session_id: str, now: float) -> List[Dict[str, Any]]:
+        rows = conn.execute(
+            "SELECT data FROM answers WHERE session_id = ? AND " + cls._LIVE.format(table="answers")
+            + " ORDER BY question_number",
+            (session_id, now),
+        ).fetchall()
+        return [{**ANSWER_DEFAULTS, **json.loads(row[0])} for row in rows]
+
+    @staticmethod
+    def _field_path(field: str) -> str:
+        return f'$."{field}"'
+
+    def _evict_expired(self, conn):
+        # Se llama desde lecturas y escrituras: un worker que no crea sesiones también purga
+        now = time.time()
+        if now - self._last_eviction < self.EVICT_INTERVAL:
+            return
+        self._last_eviction = now
+        deleted = conn.execute("DELETE FROM sessions WHERE expires_at < ?", (now,)).rowcount
+        if deleted:
+            logger.info(f"[SessionStore] {deleted} sesiones caducadas eliminadas")
+
+    # --------------------------------------------------------
+    # Operaciones síncronas (se ejecutan en un hilo)
+    # --------------------------------------------------------
+
+    def _create(self, session_id: str, data: Dict[str, Any]):
+        with self._transaction() as conn:
+            self._evict_expired(conn)
+            conn.execute(
+                "INSERT OR REPLACE INTO sessions (session_id, data, expires_at) VALUES (?, ?, ?)",
+                (session_id, json.dumps(data, ensure_ascii=False), time.time() + self.ttl),
+            )
+
+    def _get_with(self, session_id: str, question_number: Optional[int] = None, answers: bool = False):
+        now = time.time()
+        with self._transaction("DEFERRED") as conn:
+            found = self._session(conn, session_id, now)
+            if found is None:
+                return None, None
+            session, expires_at = found
+            if question_number is not None:
+                extra = self._question(conn, session_id, question_number, now)
+            else:
+                extra = self._answers(conn, session_id, now) if answers else None
+        with self._lock:
+            # TTL deslizante sin convertir cada lectura en una escritura
+            if expires_at < now + self.ttl - self.TOUCH_INTERVAL:
+                self.conn.execute(
+                    "UPDATE sessions SET expires_at = ? WHERE session_id = ?", (now + self.ttl, session_id)
+                )
+            self._evict_expired(self.conn)
+        return session, extra
+
+    def _update(self, session_id: str, fields: Dict[str, Any]):
+        now = time.time()
+        with self._lock:
+            self.conn.execute(
+                "UPDATE sessions SET data = json_patch(data, ?), expires_at = ? "
+                "WHERE session_id = ? AND expires_at >= ?",
+                (json.dumps(fields, ensure_ascii=False), now + self.ttl, session_id, now),
+            )
+            self._evict_expired(self.conn)
+
+    def _delete(self, session_id: str):
+        with self._lock:
+            self.conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+    def _session_ids(self) -> List[str]:
+        with self._lock:
+            rows = self.conn.execute("SELECT session_id FROM sessions WHERE expires_at >= ?", (time.time(),))
+            return [row[0] for row in rows.fetchall()]
+
+    def _set_question(self, session_id: str, question_number: int, data: Dict[str, Any], served_id: Optional[str]):
+        with self._transaction() as conn:
+            self._evict_expired(conn)
+            if self._touch(conn, session_id) is None:
+                return
+            if served_id:
+                conn.execute(
+                    "UPDATE sessions SET data = json_set(data, '$.served_questions', json_insert("
+                    "coalesce(json_extract(data, '$.served_questions'), json('[]')), '$[#]', ?)) "
+                    "WHERE session_id = ?",
+                    (served_id, session_id),
+                )
+            conn.execute(
+                "INSERT OR REPLACE INTO questions (session_id, question_number, data, reference_features) "
+                "VALUES (?, ?, ?, NULL)",
+                (session_id, question_number, json.dumps(data, ensure_ascii=False)),
+            )
+
+    def _get_question(self, session_id: str, question_number: int) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            self._evict_expired(self.conn)
+            return self._question(self.conn, session_id, question_number, time.time())
+
+    def _set_reference_features(
+        self, session_id: str, question_number: int, correct_answer: str, features: Dict[str, Any]
+    ) -> bool:
+        with self._lock:
+            self._evict_expired(self.conn)
+            cursor = self.conn.execute(
+                "UPDATE questions SET reference_features = ? WHERE session_id = ? AND question_number = ? "
+                "AND json_extract(data, '$.correct_answer') = ? AND " + self._LIVE.format(table="questions"),
+                (json.dumps(features), session_id, question_number, correct_answer, time.time()),
+            )
+            return cursor.rowcount > 0
+
+    def _record_answer(
+        self, session_id: str, expected_question: int, answer: Dict[str, Any], session_updates: Dict[str, Any]
+    ) -> bool:
+        with self._transaction() as conn:
+            self._evict_expired(conn)
+            session = self._touch(conn, session_id)
+            if session is None or session.get("current_question") != expected_question:
+                return False
+            conn.execute(
+                "INSERT OR REPLACE INTO answers (session_id, question_number, data) VALUES (?, ?, ?)",
+                (session_id, answer["question_number"],
+                 json.dumps({k: v for k, v in answer.items() if v is not None}, ensure_ascii=False)),
+            )
+            conn.execute(
+                "UPDATE sessions SET data = json_set(json_patch(data, ?), '$.current_question', ?) "
+                "WHERE session_id = ?",
+                (json.dumps(session_updates, ensure_ascii=False), expected_question + 1, session_id),
+            )
+            return True
+
+    def _get_answer(self, session_id: str, question_number: int) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            self._evict_expired(self.conn)
+            row = self.conn.execute(
+                "SELECT data FROM answers WHERE session_id = ? AND question_number = ? "
+                "AND " + self._LIVE.format(table="answers"),
+                (session_id, question_number, time.time()),
+            ).fetchone()
+        return {**ANSWER_DEFAULTS, **json.loads(row[0])} if row else None
+
+    def _get_answers(self, session_id: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            self._evict_expired(self.conn)
+            return self._answers(self.conn, session_id, time.time())
+
+    def _set_answer_field(
+        self, session_id: str, question_number: int, field: str, value: Any, only_if_missing: bool
+    ) -> bool:
+        path = self._field_path(field)
+        sql = (
+            "UPDATE answers SET data = json_set(data, ?, json(?)) "
+            "WHERE session_id = ? AND question_number = ? AND " + self._LIVE.format(table="answers")
+        )
+        params = [path, json.dumps(value, ensure_ascii=False), session_id, question_number, time.time()]
+        if only_if_missing:
+            sql += " AND json_extract(data, ?) IS NULL"
+            params.append(path)
+        with self._lock:
+            self._evict_expired(self.conn)
+            return self.conn.execute(sql, params).rowcount > 0
+
+    # --------------------------------------------------------
+    # Interfaz asíncrona
+    # --------------------------------------------------------
+
+    async def create(self, session_id: str, data: Dict[str, Any]):
+        await self._run(self._create, session_id, data)
+
+    async def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        session, _ = await self._run(self._get_with, session_id)
+        return session
+
+    async def get_with_question(
+        self, session_id: str, question_number: int
+    ) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        return await self._run(self._get_with, session_id, question_number)
+
+    async def get_with_answers(self, session_id: str) -> Tuple[Optional[Dict[str, Any]], List[Dict[str, Any]]]:
+        session, answers = await self._run(self._get_with, session_id, None, True)
+        return session, answers or []
+
+    async def update(self, session_id: str, fields: Dict[str, Any]):
+        await self._run(self._update, session_id, fields)
+
+    async def delete(self, session_id: str):
+        await self._run(self._delete, session_id)
+
+    async def session_ids(self) -> List[str]:
+        return await self._run(self._session_ids)
+
+    async def set_question(
+        self, session_id: str, question_number: int, data: Dict[str, Any], served_id: Optional[str] = None
+    ):
+        await self._run(self._set_question, session_id, question_number, data, served_id)
+
+    async def get_question(self, session_id: str, question_number: int) -> Optional[Dict[str, Any]]:
+        return await self._run(self._get_question, session_id, question_number)
+
+    async def set_reference_features(
+        self, session_id: str, question_number: int, correct_answer: str, features: Dict[str, Any]
+    ) -> bool:
+        return await self._run(self._set_reference_features, session_id, question_number, correct_answer, features)
+
+    async def record_answer(
+        self, session_id: str, expected_question: int, answer: Dict[str, Any], session_updates: Dict[str, Any]
+    ) -> bool:
+        return await self._run(self._record_answer, session_id, expected_question, answer, session_updates)
+
+    async def get_answer(self, session_id: str, question_number: int) -> Optional[Dict[str, Any]]:
+        return await self._run(self._get_answer, session_id, question_number)
+
+    async def get_answers(self, session_id: str) -> List[Dict[str, Any]]:
+        return await self._run(self._get_answers, session_id)
+
+    async def set_answer_field(
+        self, session_id: str, question_number: int, field: str, value: Any, only_if_missing: bool = False
+    ) -> bool:
+        return await self._run(self._set_answer_field, session_id, question_number, field, value, only_if_missing)
+
+
+class MemorySessionStore:
+    """Misma interfaz en memoria del proceso (NO apto para múltiples workers; para pruebas)."""
+
+    def __init__(self, ttl: int = DEFAULT_SESSION_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        # sid -> {"session": {...}, "questions": {"n": {...}}, "answers": {"n": {...}}, "expires_at": t}
+        self._sessions: Dict[str, Dict[str, Any]] = {}
+
+    def _entry(self, session_id: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        entry = self._sessions.get(session_id)
+        if entry is not None and entry["expires_at"] < now:
+            del self._sessions[session_id]
+            entry = None
+        if entry is not None:
+            entry["expires_at"] = now + self.ttl
+        return entry
+
+    def _evict_expired(self):
+        now = time.time()
+        for sid in [sid for sid, e in self._sessions.items() if e["expires_at"] < now]:
+            del self._sessions[sid]
+
+    @staticmethod
+    def _copy(value):
+        # Copia profunda vía JSON: mismo comportamiento que el backend Redis
+        return json.loads(json.dumps(value)) if value is not None else None
+
+    async def create(self, session_id: str, data: Dict[str, Any]):
+        with self._lock:
+            self._evict_expired()
+            self._sessions[session_id] = {
+                "session": self._copy(data), "questions": {}, "answers": {}, "expires_at": time.time() + self.ttl
+            }
+
+    async def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entry(session_id)
+            return self._copy(entry["session"]) if entry else None
+
+    async def get_with_question(
+        self, session_id: str, question_number: int
+    ) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        return await self.get(session_id), await self.get_question(session_id, question_number)
+
+    async def get_with_answers(self, session_id: str) -> Tuple[Optional[Dict[str, Any]], List[Dict[str, Any]]]:
+        return await self.get(session_id), await self.get_answers(session_id)
+
+    async def update(self, session_id: str, fields: Dict[str, Any]):
+        with self._lock:
+            entry = self._entry(session_id)
+            if entry:
+                entry["session"].update(self._copy(fields))
+
+    async def delete(self, session_id: str):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    async def session_ids(self) -> List[str]:
+        with self._lock:
+            self._evict_expired()
+            return list(self._sessions)
+
+    async def set_question(
+        self, session_id: str, question_number: int, data: Dict[str, Any], served_id: Optional[str] = None
+    ):
+        with self._lock:
+            entry = self._entry(session_id)
+            if entry:
+                if served_id:
+                    entry["session"].setdefault("served_questions", []).append(served_id)
+                entry["questions"][str(question_number)] = self._copy(data)
+
+    async def get_question(self, session_id: str, question_number: int) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entry(session_id)
+            return self._copy(entry["questions"].get(str(question_number))) if entry else None
+
+    async def set_reference_features(
+        self, session_id: str, question_number: int, correct_answer: str, features: Dict[str, Any]
+    ) -> bool:
+        with self._lock:
+            entry = self._entry(session_id)
+            question = entry["questions"].get(str(question_number)) if entry else None
+            if not question or question.get("correct_answer") != correct_answer:
+                return False
+            question["reference_features"] = self._copy(features)
+            return True
+
+    async def record_answer(
+        self, session_id: str, expected_question: int, answer: Dict[str, Any], session_updates: Dict[str, Any]
+    ) -> bool:
+        with self._lock:
+            entry = self._entry(session_id)
+            if not entry or entry["session"].get("current_question") != expected_question:
+                return False
+            entry["answers"][str(answer["question_number"])] = {**ANSWER_DEFAULTS, **self._copy(answer)}
+            entry["session"].update(self._copy(session_updates))
+            entry["session"]["current_question"] += 1
+            return True
+
+    async def get_answer(self, session_id: str, question_number: int) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entry(session_id)
+            return self._copy(entry["answers"].get(str(question_number))) if entry else None
+
+    async def get_answers(self, session_id: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entry(session_id)
+            if not entry:
+                return []
+            return [self._copy(entry["answers"][n]) for n in sorted(entry["answers"], key=int)]
+
+    async def set_answer_field(
+        self, session_id: str, question_number: int, field: str, value: Any, only_if_missing: bool = False
+    ) -> bool:
+        with self._lock:
+            entry = self._entry(session_id)
+            answer = entry["answers"].get(str(question_number)) if entry else None
+            if answer is None or (only_if_missing and answer.get(field) is not None):
+                return False
+            answer[field] = self._copy(value)
+            return True
@@ -0,0 +1,79 @@
+"""
+Seguimiento del arranque de la app: duración de cada fase y preparación (readiness).
+
+Las fases síncronas (imports, conexión a Redis, servicios) se miden al importar
+`project.app`; las pesadas (modelos del evaluador, generadores, LLM) se ejecutan
+en segundo plano tras arrancar. `/healthz` solo indica que el proceso responde;
+`/readyz` devuelve 200 cuando todas las fases requeridas han terminado bien.
+"""
+import time
+import logging
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class StartupReport:
+    def __init__(self, started: Optional[float] = None):
+        """
+        Args:
+            started: instante (time.perf_counter) de inicio del arranque; por defecto, ahora.
+        """
+        self.started = started if started is not None else time.perf_counter()
+        self.phases: Dict[str, Dict[str, Any]] = {}
+
+    def expect(self, *names: str):
+        """Registra fases requeridas que aún no han empezado (la app no está lista hasta que acaben)."""
+        for name in names:
+            self.phases.setdefault(name, {"status": "pending", "required": True, "seconds": None})
+
+    def record(self, name: str, seconds: float, status: str = "ready", required: bool = False, error: str = None):
+        self.phases[name] = {
+            "status": status,
+            "required": required or self.phases.get(name, {}).get("required", False),
+            "seconds": round(seconds, 3),
+        }
+        if error:
+            self.phases[name]["error"] = error
+        log = logger.info if status == "ready" else logger.error
+        log(f"[Startup] {name}: {status} en {seconds:.2f}s" + (f" ({error})" if error else ""))
+
+    @contextmanager
+    def phase(self, name: str):
+        """Mide una fase síncrona del arranque."""
+        start = time.perf_counter()
+        yield
+        self.record(name, time.perf_counter() - start)
+
+    async def run(self, name: str, fn: Callable[[], Awaitable[Any]], required: bool = True):
+        """Ejecuta y mide una fase de warm-up; los errores se registran, no se propagan."""
+        if required:
+            self.expect(name)
+        # Las fases opcionales no se registran con expect: aparecen al empezar
+        self.phases.setdefault(name, {"status": "pending", "required": required, "seconds": None})
+        self.phases[name]["status"] = "running"
+        start = time.perf_counter()
+        try:
+            await fn()
+        except Exception as e:
+            self.record(name, time.perf_counter() - start, status="failed", required=required, error=str(e))
+            return
+        self.record(name, time.perf_counter() - start, required=required)
+
+    @property
+    def ready(self) -> bool:
+        return all(p["status"] == "ready" for p in self.phases.values() if p["required"])
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "uptime": round(time.perf_counter() - self.started, 1),
+            "phases": self.phases,
+        }
+
+    def log_summary(self, title: str):
+        breakdown = ", ".join(
+            f"{name}={p['seconds']}s" for name, p in self.phases.items() if p["seconds"] is not None
+        )
+        logger.info(f"[Startup] {title} en {time.perf_counter() - self.started:.1f}s: {breakdown}")
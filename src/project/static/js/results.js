@@ -58,27 +58,72 @@ const CollapsibleContent = ({ endpoint, payload, targetField, title, colorTheme,
     };
     const t = themes[colorTheme];
 
-    const fetchContent = () => {
+    // Lee un stream SSE (event: delta/done/error) y va acumulando el texto.
+    // El render (marked + KaTeX) se limita a uno cada ~150ms mientras llegan fragmentos.
+    const fetchContent = async () => {
         if (content || loading) return;
         setLoading(true);
-        fetch(endpoint, {
-            method: "POST",
-            headers: { "Content-Type": "application/json" },
-            body: JSON. stringify(payload)
-        })
-        .then(res => res.json())
-        .then(data => {
-            const result = data[targetField] || data.feedback || data.explanation || data.theory;
-            if (result) {
-                setContent(result);
-                payload[targetField] = result;
+        let text = "";
+        let lastFlush = 0;
+        const flush = (force) => {
+            const now = Date.now();
+            if (force || now - lastFlush > 150) {
+                lastFlush = now;
+                setContent(text);
+            }
+        };
+        try {
+            const res = await fetch(endpoint, {
+                method: "POST",
+                headers: { "Content-Type": "application/json" },
+                body: JSON.stringify(payload)
+            });
+            if (!res.ok || !res.body) throw new Error(`HTTP ${res.status}`);
+
+            const reader = res.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = "";
+            let finished = false;
+            while (!finished) {
+                const { value, done } = await reader.read();
+                if (done) break;
+                buffer += decoder.decode(value, { stream: true });
+                let sep;
+                while ((sep = buffer.indexOf("\n\n")) !== -1) {
+                    const raw = buffer.slice(0, sep);
+                    buffer = buffer.slice(sep + 2);
+                    let event = "message";
+                    let data = "";
+                    raw.split("\n").forEach(line => {
+                        if (line.startsWith("event:")) event = line.slice(6).trim();
+                        else if (line.startsWith("data:")) data += line.slice(5).trim();
+                    });
+                    if (!data) continue;
+                    const parsed = JSON.parse(data);
+                    if (event === "delta") {
+                        text += parsed.text;
+                        flush(false);
+                    } else if (event === "done") {
+                        text = parsed[targetField] || text;
+                        finished = true;
+                    } else if (event === "error") {
+                        throw new Error(parsed.error);
+                    }
+                }
+            }
+            if (text) {
+                flush(true);
+                payload[targetField] = text;
                 loadedRef.current = true;
             } else {
                 setError(true);
             }
-        })
-        .catch(() => setError(true))
-        .finally(() => setLoading(false));
+        } catch (e) {
+            setContent(undefined);
+            setError(true);
+        } finally {
+            setLoading(false);
+        }
     };
 
     useEffect(() => {
@@ -113,9 +158,9 @@ const CollapsibleContent = ({ endpoint, payload, targetField, title, colorTheme,
 
             {isOpen && (
                 <div className="p-4 bg-slate-900/50 border-t border-slate-700/50 animate-fade-in">
-                    {loading && <div className="flex items-center gap-2 text-sm text-slate-400 italic"><Icons.Loader /> Generando respuesta...</div>}
+                    {loading && !content && <div className="flex items-center gap-2 text-sm text-slate-400 italic"><Icons.Loader /> Generando respuesta...</div>}
                     {error && <div className="text-rose-400 text-sm">Error cargando contenido.  <button onClick={() => { setError(false); fetchContent(); }} className="underline">Reintentar</button></div>}
-                    {! loading && !error && content && <div id={renderId} className="text-sm prose prose-invert prose-sm max-w-none text-slate-300 leading-relaxed">{! renderId && <p className="whitespace-pre-wrap">{content}</p>}</div>}
+                    {!error && content && <div id={renderId} className="text-sm prose prose-invert prose-sm max-w-none text-slate-300 leading-relaxed">{! renderId && <p className="whitespace-pre-wrap">{content}</p>}</div>}
                 </div>
             )}
         </div>
@@ -185,15 +230,15 @@ const QuestionResultCard = ({ answerData, index, sessionId, defaultOpen }) => {
                             </div>
                             <div className="space-y-1">
                                 <CollapsibleContent 
-                                    endpoint="/api/feedback" 
-                                    payload={{... answerData, user_answer: answerData.answer, metrics: m}} 
+                                    endpoint="/api/feedback/stream" 
+                                    payload={{... answerData, session_id: sessionId, user_answer: answerData.answer, metrics: m}} 
                                     targetField="feedback" 
                                     title="Feedback Detallado de IA" 
                                     colorTheme="purple"
                                     icon={<Icons.Brain />}
                                 />
                                 <CollapsibleContent 
-                                    endpoint="/api/explanation"
+                                    endpoint="/api/explanation/stream"
                                     payload={{
                                         session_id: sessionId,
                                         question_number: answerData.question_number,
@@ -207,7 +252,7 @@ const QuestionResultCard = ({ answerData, index, sessionId, defaultOpen }) => {
                                     icon={<Icons.Calculator />}
                                 />
                                 <CollapsibleContent 
-                                    endpoint="/api/theory" 
+                                    endpoint="/api/theory/stream" 
                                     payload={{question: answerData.question}} 
                                     targetField="theory" 
                                     title="Biblioteca de Teoría (RAG)" 
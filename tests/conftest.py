@@ -0,0 +1,33 @@
+import os
+import importlib
+from unittest import mock
+
+import pytest
+
+# Entorno mínimo para importar la app sin Redis, modelos ni claves reales
+APP_ENV = {
+    "SESSION_BACKEND": "memory",
+    "REDIS_URL": "redis://127.0.0.1:1/0",
+    "EVAL_WORKERS": "0",
+    "QUESTION_POOL_ENABLED": "0",
+    "LLM_CACHE_BACKEND": "none",
+    "LLM_PROVIDER": "GEMINI",
+    "GEMINI_API_KEY": "test",
+}
+
+
+@pytest.fixture(scope="session")
+def app_module():
+    """Módulo project.app importado con APP_ENV (sin ejecutar el lifespan)."""
+    with mock.patch.dict(os.environ, APP_ENV):
+        return importlib.import_module("project.app")
+
+
+@pytest.fixture
+def client(app_module, monkeypatch):
+    """TestClient con un almacén de sesiones en memoria nuevo para cada test."""
+    from fastapi.testclient import TestClient
+    from project.session_store import MemorySessionStore
+
+    monkeypatch.setattr(app_module, "session_store", MemorySessionStore())
+    return TestClient(app_module.app)
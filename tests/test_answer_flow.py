@@ -0,0 +1,76 @@
+import asyncio
+
+from project.metrics.evaluation_executor import EvaluationExecutor
+
+run = asyncio.run
+
+
+class StagedExecutor(EvaluationExecutor):
+    """Progresión con etapas pendientes; la evaluación completa las rellena."""
+
+    def __init__(self, score):
+        super().__init__(workers=0)
+        self.score = score
+        self.full_calls = []
+
+    async def evaluate_progression(self, correct_answer, user_answer, reference=None):
+        return {"final_score": self.score, "final_score_max": 1.0, "semantic_score": None,
+                "pending_stages": ["semantic_score"]}
+
+    async def evaluate_full(self, correct_answer, user_answer, reference=None):
+        self.full_calls.append((correct_answer, user_answer, reference))
+        return {"final_score": self.score, "semantic_score": 0.9}
+
+
+def start_session(store, total=3):
+    async def main():
+        await store.create("s1", {
+            "current_question": 0, "total_questions": total,
+            "current_difficulty": "Facil", "streak_correctas": 0,
+        })
+        for n in range(1, total + 1):
+            await store.set_question("s1", n, {
+                "question": f"P{n}", "correct_answer": "1/2", "reference_features": {"numbers": [0.5]},
+            })
+    run(main())
+
+
+def answer(client, n, text="1/2"):
+    return client.post("/api/interview/answer", json={
+        "session_id": "s1", "question_number": n, "question_text": f"P{n}", "answer_text": text,
+    })
+
+
+def test_pending_stages_are_completed_in_background(app_module, client, monkeypatch):
+    executor = StagedExecutor(0.9)
+    monkeypatch.setattr(app_module, "evaluation_executor", executor)
+    start_session(app_module.session_store)
+
+    response = answer(client, 1)
+
+    assert response.status_code == 200
+    assert executor.full_calls == [("1/2", "1/2", {"numbers": [0.5]})]
+    stored = run(app_module.session_store.get_answer("s1", 1))
+    assert stored["metrics"] == {"final_score": 0.9, "semantic_score": 0.9}
+
+
+def test_progression_uses_the_staged_lower_bound(app_module, client, monkeypatch):
+    monkeypatch.setattr(app_module, "evaluation_executor", StagedExecutor(0.86))
+    start_session(app_module.session_store, total=4)
+
+    assert answer(client, 1).json()["next_difficulty"] == "Facil"
+    assert answer(client, 2).json()["next_difficulty"] == "Medio"
+
+    app_module.evaluation_executor.score = 0.3
+    assert answer(client, 3).json()["next_difficulty"] == "Facil"
+    session = run(app_module.session_store.get("s1"))
+    assert session["current_question"] == 3 and session["streak_correctas"] == 0
+
+
+def test_resubmitted_answer_is_rejected(app_module, client, monkeypatch):
+    monkeypatch.setattr(app_module, "evaluation_executor", StagedExecutor(0.9))
+    start_session(app_module.session_store)
+
+    assert answer(client, 1).status_code == 200
+    assert answer(client, 1).status_code == 409
+    assert len(run(app_module.session_store.get_answers("s1"))) == 1
@@ -0,0 +1,103 @@
+import asyncio
+
+import pytest
+
+from project.metrics import evaluation_executor as executor_module
+from project.metrics.evaluation_executor import EvaluationExecutor
+from project.session_store import MemorySessionStore
+
+run = asyncio.run
+
+
+def fake_many(pairs):
+    return [{"final_score": float(c == u)} for c, u in pairs]
+
+
+def test_bulk_endpoint_returns_metrics_in_order(app_module, client, monkeypatch):
+    monkeypatch.setattr(app_module, "evaluation_executor", EvaluationExecutor(workers=0))
+    monkeypatch.setattr(executor_module, "_evaluate_many", fake_many)
+
+    response = client.post("/api/evaluation/bulk", json={"pairs": [
+        {"correct_answer": "1/2", "user_answer": "1/2"},
+        {"correct_answer": "1/2", "user_answer": "1/3"},
+        {"correct_answer": "3"},
+    ]})
+
+    assert response.status_code == 200
+    assert response.json() == {"results": [
+        {"final_score": 1.0}, {"final_score": 0.0}, {"final_score": 0.0},
+    ]}
+
+
+def test_bulk_endpoint_returns_503_when_saturated(app_module, client, monkeypatch):
+    executor = EvaluationExecutor(workers=0, max_pending=1)
+    executor.pending = 1
+    monkeypatch.setattr(app_module, "evaluation_executor", executor)
+
+    response = client.post("/api/evaluation/bulk", json={"pairs": [{"correct_answer": "a", "user_answer": "b"}]})
+
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "2"
+
+
+@pytest.fixture
+def regrade_env(monkeypatch):
+    pytest.importorskip("sentence_transformers")
+    from project.metrics import regrade
+
+    batches = []
+
+    def recording_many(pairs):
+        batches.append(list(pairs))
+        return fake_many(pairs)
+
+    monkeypatch.setattr(regrade, "evaluate_many", recording_many)
+    return regrade, batches
+
+
+async def graded_session(store, sid, answers):
+    await store.create(sid, {"current_question": 0, "total_questions": len(answers)})
+    for n, (correct, user, metrics) in enumerate(answers):
+        answer = {"question_number": n + 1, "correct_answer": correct, "answer": user}
+        if metrics is not None:
+            answer["metrics"] = metrics
+        assert await store.record_answer(sid, n, answer, {})
+
+
+def test_regrade_batches_pairs_and_only_writes_metrics(regrade_env):
+    regrade, batches = regrade_env
+    store = MemorySessionStore()
+
+    async def main():
+        await graded_session(store, "s1", [("a", "a", {"final_score": 0.2}), ("b", "c", None)])
+        await graded_session(store, "s2", [("d", "d", None)])
+        count = await regrade.regrade_sessions(
+            store, await regrade._session_ids(store, [], True), batch_size=2, verbose=False
+        )
+        return count, await store.get_answers("s1"), await store.get_answers("s2")
+
+    count, s1, s2 = run(main())
+    assert count == 3
+    assert [len(b) for b in batches] == [2, 1]
+    assert [a["metrics"] for a in s1 + s2] == [{"final_score": 1.0}, {"final_score": 0.0}, {"final_score": 1.0}]
+    assert s1[1]["answer"] == "c"
+
+
+def test_regrade_only_missing_and_dry_run(regrade_env):
+    regrade, _ = regrade_env
+    store = MemorySessionStore()
+
+    async def main():
+        await graded_session(store, "s1", [
+            ("a", "a", {"final_score": 0.2}),
+            ("b", "b", {"final_score": 0.4, "pending_stages": ["semantic_score"]}),
+            ("c", "c", None),
+        ])
+        assert await regrade.regrade_sessions(store, ["s1"], only_missing=True, dry_run=True, verbose=False) == 2
+        dry = await store.get_answers("s1")
+        assert await regrade.regrade_sessions(store, ["s1", "missing"], only_missing=True, verbose=False) == 2
+        return dry, await store.get_answers("s1")
+
+    dry, after = run(main())
+    assert [a.get("metrics") for a in dry][:2] == [{"final_score": 0.2}, {"final_score": 0.4, "pending_stages": ["semantic_score"]}]
+    assert [a["metrics"] for a in after] == [{"final_score": 0.2}, {"final_score": 1.0}, {"final_score": 1.0}]
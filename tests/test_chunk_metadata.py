@@ -0,0 +1,82 @@
+import json
+from functools import partial
+
+import pytest
+
+from project.rag.utils import dataset_readers, dataset_store
+from project.rag.utils.chunk_metadata import (
+    chroma_where, flatten_metadata, normalize_difficulty, parse_filters, slugify, tags_of,
+)
+
+
+def test_flatten_metadata_keeps_scalars_and_turns_tags_into_booleans():
+    flat = flatten_metadata({
+        "firm": "worldquant",
+        "title": "Dados",
+        "url_page": "",
+        "difficulty": None,
+        "page": 12,
+        "tags": ["Markov Chains", "Conditional Expectation", "¿?"],
+        "otro": "se ignora",
+    })
+    assert flat == {
+        "firm": "worldquant", "title": "Dados", "page": "12",
+        "tag:markov-chains": True, "tag:conditional-expectation": True,
+    }
+    assert tags_of(flat) == ["conditional-expectation", "markov-chains"]
+    assert flatten_metadata(None) == {}
+
+
+def test_difficulty_and_slugs_are_normalized():
+    assert [normalize_difficulty(v) for v in ("Easy", "medium", " HARD ", "Difícil", "??", None)] == [
+        "Facil", "Medio", "Dificil", "Dificil", None, None,
+    ]
+    assert slugify("Two Sigma Investments, LLC") == "two-sigma-investments-llc"
+    assert slugify("Árboles") == "arboles"
+
+
+def test_parse_filters_from_string_and_dict():
+    expected = {"firm": "worldquant", "difficulty": "Dificil", "tag:markov-chains": True}
+    assert parse_filters("firm=WorldQuant, difficulty=Hard, tag=Markov Chains") == expected
+    assert parse_filters({"Firm": "worldquant", "difficulty": "Dificil", "tags": ["markov chains"]}) == expected
+    assert parse_filters("title=a=b, ") == {"title": "a=b"}
+    assert parse_filters(None) == parse_filters("") == {}
+
+
+@pytest.mark.parametrize("filters", ["firm", "color=rojo", {"sector": "hft"}])
+def test_parse_filters_rejects_malformed_or_unknown_keys(filters):
+    with pytest.raises(ValueError):
+        parse_filters(filters)
+
+
+def test_chroma_where_ands_every_condition():
+    assert chroma_where({}) is None
+    assert chroma_where({"firm": "citadel"}) == {"firm": "citadel"}
+    assert chroma_where(parse_filters("firm=citadel, tag=probability")) == {
+        "$and": [{"firm": "citadel"}, {"tag:probability": True}]
+    }
+
+
+def test_reader_coachquant_keeps_metadata(tmp_path, monkeypatch):
+    monkeypatch.setattr(dataset_store, "_STORES", {})
+    monkeypatch.setattr(dataset_readers, "get_store", partial(dataset_store.get_store, store_dir=str(tmp_path)))
+    data_path = tmp_path / "coachquant.jsonl"
+    lines = [
+        {"firm": "citadel", "title": "Dados", "url_page": "https://x/1", "tags": ["Probability"],
+         "difficulty": "Hard", "question_text": "¿E[X] de un dado?", "answer_text": "3.5"},
+        {"raw": {"problem text": "¿Martingala?", "problem solution": "Sí", "problem firm": ["Jane Street"],
+                 "problem name": "Juego", "problem difficulty": "Easy"}},
+        {"question_text": "Sin respuesta"},
+    ]
+    data_path.write_text("\n".join(json.dumps(line) for line in lines), encoding="utf-8")
+
+    records = dataset_readers.reader_coachquant(str(data_path), verbose=False, with_metadata=True)
+
+    assert [text for text, _ in records] == [
+        "Pregunta: ¿E[X] de un dado?\nRespuesta: 3.5", "Pregunta: ¿Martingala?\nRespuesta: Sí",
+    ]
+    assert [flatten_metadata(meta) for _, meta in records] == [
+        {"dataset": "coachquant", "firm": "citadel", "title": "Dados", "url_page": "https://x/1",
+         "difficulty": "Dificil", "tag:probability": True},
+        {"dataset": "coachquant", "firm": "jane-street", "title": "Juego", "difficulty": "Facil"},
+    ]
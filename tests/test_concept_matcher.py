@@ -0,0 +1,53 @@
+import random
+
+import pytest
+
+from project.metrics import concept_matcher
+from project.metrics.concept_matcher import ConceptMatcher, fuzzy_match
+
+
+def brute_force(a, concepts, threshold):
+    return any(fuzzy_match(a, b, threshold) for b in concepts)
+
+
+def random_concepts(rng, n):
+    words = ["varianza", "esperanza", "martingala", "markov", "cadena", "proceso", "media", "ab", "x"]
+    concepts = []
+    for _ in range(n):
+        if rng.random() < 0.5:
+            word = rng.choice(words)
+            # Pequeñas mutaciones para caer cerca del umbral
+            for _ in range(rng.randint(0, 3)):
+                i = rng.randrange(len(word) + 1)
+                word = word[:i] + rng.choice("aeiosrn") + word[i + 1:]
+        else:
+            word = "".join(rng.choice("abcdeimnorst ") for _ in range(rng.randint(1, 14)))
+        concepts.append(word.strip())
+    return concepts
+
+
+@pytest.mark.parametrize("use_rapidfuzz", [True, False])
+@pytest.mark.parametrize("threshold", [0.0, 0.5, 0.75, 0.85, 0.95, 1.0])
+def test_matches_brute_force(monkeypatch, use_rapidfuzz, threshold):
+    if use_rapidfuzz:
+        pytest.importorskip("rapidfuzz")
+    else:
+        monkeypatch.setattr(concept_matcher, "process", None)
+    rng = random.Random(threshold)
+    for _ in range(30):
+        indexed = random_concepts(rng, rng.randint(0, 25))
+        queries = random_concepts(rng, 25)
+        matcher = ConceptMatcher(indexed, threshold)
+        for a in queries:
+            assert matcher.matches(a) == brute_force(a, indexed, threshold), (a, indexed)
+
+
+def test_overlap_counts_equality_containment_and_ratio():
+    matcher = ConceptMatcher(["esperanza condicional", "varianza", "markov", ""], threshold=0.75)
+    assert matcher.matches("esperanza")          # contenido en un concepto
+    assert matcher.matches("cadena de markov")   # contiene un concepto
+    assert matcher.matches("varianzas")          # ratio alto
+    assert not matcher.matches("ab")             # la contención exige 3+ caracteres
+    assert not matcher.matches("")
+    assert matcher.overlap(["varianza", "martingala", "markov"]) == 2
+    assert ConceptMatcher([]).overlap(["varianza"]) == 0
@@ -0,0 +1,96 @@
+import os
+
+import pytest
+
+from project.rag.utils import dataset_store
+from project.rag.utils.dataset_store import CURRENT_FILE, DatasetStore, get_store
+
+RECORDS = [
+    {"question": "q1", "answer": "a1", "context": "ctx"},
+    {"question": "q2", "answer": "a2", "context": "ctx"},
+    {"question": "q3", "answer": "a3"},
+]
+
+
+def snapshots(path):
+    return sorted(e for e in os.listdir(path) if e.startswith("snap-"))
+
+
+def test_snapshot_roundtrip_and_shared_contexts(tmp_path):
+    store = DatasetStore("ds", lambda: RECORDS, version="v1", store_dir=str(tmp_path), verbose=False)
+    assert list(store) == RECORDS
+    assert len(store.contexts) == 1
+    assert sorted(r["question"] for r in store.sample(10)) == ["q1", "q2", "q3"]
+    store.close()
+
+    def fail():
+        raise AssertionError("no debería reconstruirse")
+
+    reopened = DatasetStore("ds", fail, version="v1", store_dir=str(tmp_path), verbose=False)
+    assert reopened.get(1) == RECORDS[1]
+    reopened.close()
+
+
+def test_rebuild_keeps_published_snapshot_readable(tmp_path):
+    store_dir = str(tmp_path)
+    DatasetStore("ds", lambda: RECORDS, version="v1", store_dir=store_dir, verbose=False).close()
+
+    def builder_v2():
+        # Durante la construcción, CURRENT sigue apuntando a un snapshot v1 completo
+        reader = DatasetStore("ds", lambda: [], version="v1", store_dir=store_dir, verbose=False)
+        assert len(reader) == 3
+        reader.close()
+        yield {"question": "nueva", "answer": "x"}
+
+    store = DatasetStore("ds", builder_v2, version="v2", store_dir=store_dir, verbose=False)
+    assert list(store) == [{"question": "nueva", "answer": "x"}]
+    with open(os.path.join(store_dir, "ds", CURRENT_FILE)) as f:
+        assert os.path.join(store_dir, "ds", f.read()) == store.snapshot_path
+    store.close()
+
+
+def test_old_snapshots_are_removed_but_previous_is_kept(tmp_path):
+    store_dir = str(tmp_path)
+    path = os.path.join(store_dir, "ds")
+    for version in ("v1", "v2", "v3"):
+        store = DatasetStore("ds", lambda: RECORDS, version=version, store_dir=store_dir, verbose=False)
+        store.close()
+    assert len(snapshots(path)) == 2
+    assert not [e for e in os.listdir(path) if e.startswith("tmp-")]
+
+
+def test_failed_build_leaves_current_snapshot(tmp_path):
+    store_dir = str(tmp_path)
+    DatasetStore("ds", lambda: RECORDS, version="v1", store_dir=store_dir, verbose=False).close()
+
+    def broken():
+        yield RECORDS[0]
+        raise RuntimeError("descarga cortada")
+
+    with pytest.raises(RuntimeError):
+        DatasetStore("ds", broken, version="v2", store_dir=store_dir, verbose=False)
+    store = DatasetStore("ds", lambda: [], version="v1", store_dir=store_dir, verbose=False)
+    assert len(store) == 3
+    store.close()
+
+
+def test_legacy_layout_is_replaced(tmp_path):
+    legacy = tmp_path / "ds"
+    legacy.mkdir()
+    for name in ("records.jsonl", "records.npy", "meta.json"):
+        (legacy / name).write_text("{}")
+    store = DatasetStore("ds", lambda: RECORDS, version="v1", store_dir=str(tmp_path), verbose=False)
+    assert len(store) == 3
+    assert sorted(os.listdir(legacy)) == sorted([CURRENT_FILE] + snapshots(legacy))
+    store.close()
+
+
+def test_get_store_closes_replaced_store(tmp_path, monkeypatch):
+    monkeypatch.setattr(dataset_store, "_STORES", {})
+    old = get_store("ds", lambda: RECORDS, version="v1", verbose=False, store_dir=str(tmp_path))
+    assert get_store("ds", lambda: [], version="v1", verbose=False, store_dir=str(tmp_path)) is old
+
+    new = get_store("ds", lambda: RECORDS[:1], version="v2", verbose=False, store_dir=str(tmp_path))
+    assert new is not old and len(new) == 1
+    assert old.records._file.closed and old.records._mm.closed
+    new.close()
@@ -0,0 +1,134 @@
+import asyncio
+import threading
+
+import pytest
+
+from project.metrics import evaluation_executor
+from project.metrics.evaluation_executor import EvaluationExecutor, EvaluationQueueFull
+
+run = asyncio.run
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    """Sustituye las funciones de evaluación del módulo por versiones sin modelos."""
+    calls = []
+
+    def fake_evaluate(correct, user, reference=None):
+        calls.append(("full", correct, user, reference))
+        if user == "boom":
+            return {"error": "fallo transitorio"}
+        return {"score": float(correct == user)}
+
+    def fake_progression(correct, user, reference=None):
+        calls.append(("progression", correct, user, reference))
+        if user.startswith("partial"):
+            return {"score": 0.5, "pending_stages": ["semantic"]}
+        return {"score": float(correct == user)}
+
+    def fake_many(pairs):
+        calls.append(("many", list(pairs)))
+        return [{"score": float(c == u)} for c, u in pairs]
+
+    monkeypatch.setattr(evaluation_executor, "_evaluate", fake_evaluate)
+    monkeypatch.setattr(evaluation_executor, "_evaluate_progression", fake_progression)
+    monkeypatch.setattr(evaluation_executor, "_evaluate_many", fake_many)
+    monkeypatch.setattr(evaluation_executor, "_reference_features", lambda correct: {"ref": correct})
+    return calls
+
+
+def test_evaluate_full_is_memoized_and_errors_are_not(calls):
+    executor = EvaluationExecutor(workers=0)
+
+    async def main():
+        first = await executor.evaluate_full("a", "a", reference={"r": 1})
+        first["score"] = -1  # el memo devuelve copias
+        assert await executor.evaluate_full("a", "a") == {"score": 1.0}
+        await executor.evaluate_full("a", "boom")
+        await executor.evaluate_full("a", "boom")
+
+    run(main())
+    assert [c[0] for c in calls] == ["full", "full", "full"]
+    assert calls[0][3] == {"r": 1}
+    stats = executor.stats()
+    assert stats["memo_hits"] == 1 and stats["memo_entries"] == 1
+    assert stats["pending"] == 0 and stats["completed"] == 3
+
+
+def test_memo_is_bounded_lru(calls):
+    executor = EvaluationExecutor(workers=0, memo_size=2)
+
+    async def main():
+        await executor.evaluate_full("a", "1")
+        await executor.evaluate_full("a", "2")
+        await executor.evaluate_full("a", "1")  # "1" pasa a ser el más reciente
+        await executor.evaluate_full("a", "3")  # expulsa "2"
+        await executor.evaluate_full("a", "1")
+        await executor.evaluate_full("a", "2")
+
+    run(main())
+    assert [c[2] for c in calls] == ["1", "2", "3", "2"]
+    assert executor.stats()["memo_entries"] == 2
+
+
+def test_progression_with_pending_stages_is_not_memoized(calls):
+    executor = EvaluationExecutor(workers=0)
+
+    async def main():
+        for _ in range(2):
+            await executor.evaluate_progression("a", "partial")
+            await executor.evaluate_progression("a", "a")
+
+    run(main())
+    assert [c[2] for c in calls] == ["partial", "a", "partial"]
+
+
+def test_queue_full_rejects_while_saturated(monkeypatch, calls):
+    started, release = threading.Event(), threading.Event()
+
+    def blocking(correct, user, reference=None):
+        started.set()
+        release.wait(5)
+        return {"score": 1.0}
+
+    monkeypatch.setattr(evaluation_executor, "_evaluate", blocking)
+    executor = EvaluationExecutor(workers=0, max_pending=1)
+
+    async def main():
+        task = asyncio.create_task(executor.evaluate_full("a", "x"))
+        await asyncio.to_thread(started.wait, 5)
+        with pytest.raises(EvaluationQueueFull):
+            await executor.evaluate_full("a", "y")
+        with pytest.raises(EvaluationQueueFull):
+            await executor.evaluate_many([("a", "z")])
+        # Las features de referencia son opcionales: sin hueco se devuelve None
+        assert await executor.reference_features("a") is None
+        release.set()
+        assert await task == {"score": 1.0}
+        # Lo ya memorizado se sirve aunque el evaluador esté lleno
+        executor.pending = executor.max_pending
+        assert await executor.evaluate_full("a", "x") == {"score": 1.0}
+        executor.pending = 0
+        assert await executor.reference_features("a") == {"ref": "a"}
+
+    run(main())
+    assert executor.stats()["rejected"] == 2
+
+
+def test_evaluate_many_reuses_memo(calls):
+    executor = EvaluationExecutor(workers=0)
+    pairs = [("a", str(i)) for i in range(20)] + [("b", "b")]
+
+    async def main():
+        await executor.evaluate_full("b", "b")
+        results = await executor.evaluate_many(pairs, min_chunk=8)
+        assert results[-1] == {"score": 1.0}
+        assert all(r == {"score": 0.0} for r in results[:-1])
+        # Todo memorizado: no se vuelve a evaluar nada
+        assert await executor.evaluate_many(pairs) == results
+
+    run(main())
+    batches = [c[1] for c in calls if c[0] == "many"]
+    # Con workers=0 los pendientes van en un único trozo
+    assert [len(b) for b in batches] == [20]
+    assert ("b", "b") not in sum(batches, [])
@@ -0,0 +1,174 @@
+import json
+
+import pytest
+
+pytest.importorskip("sentence_transformers")
+
+import numpy as np
+
+from project.metrics import evaluator
+
+
+class FakeEmbedder:
+    """Embeddings deterministas de 3 dimensiones; registra los textos codificados."""
+
+    def __init__(self):
+        self.calls = []
+
+    @staticmethod
+    def _vector(text):
+        return [len(text) + 1.0, 1.0, text.count("a") + 0.5]
+
+    def encode(self, texts, batch_size=32, convert_to_tensor=False):
+        self.calls.append(texts)
+        if isinstance(texts, str):
+            return np.array(self._vector(texts))
+        return np.array([self._vector(t) for t in texts])
+
+
+class FakeToken:
+    def __init__(self, word):
+        self.lemma_ = word
+        self.pos_ = "NOUN"
+
+    def __len__(self):
+        return len(self.lemma_)
+
+
+class FakeDoc(list):
+    noun_chunks = ()
+
+
+class FakeNLP:
+    def __call__(self, text):
+        return FakeDoc(FakeToken(w) for w in text.split())
+
+    def pipe(self, texts, batch_size=1):
+        return [self(t) for t in texts]
+
+
+class FakeKeyBERT:
+    def extract_keywords(self, docs, top_n=7):
+        def keywords(text):
+            return [(w, 0.5) for w in text.split()[:top_n]]
+        if isinstance(docs, str):
+            return keywords(docs)
+        # Como KeyBERT: con un único documento devuelve una lista plana
+        return keywords(docs[0]) if len(docs) == 1 else [keywords(d) for d in docs]
+
+
+class FakeModels:
+    def __init__(self):
+        self.embedding_model = FakeEmbedder()
+        self.nlp = FakeNLP()
+        self.kw_model = FakeKeyBERT()
+
+
+@pytest.fixture
+def models(monkeypatch):
+    evaluator._reference_features_cached.cache_clear()
+    models = FakeModels()
+    monkeypatch.setattr(evaluator, "EvaluatorModels", lambda: models)
+    yield models
+    evaluator._reference_features_cached.cache_clear()
+
+
+PAIRS = [
+    ("La esperanza es 1/2", "la esperanza vale 0.5"),
+    ("La esperanza es 1/2", "creo que es 0.9"),
+    ("Varianza n = 4", "Primero calculamos: n = 4, por lo tanto"),
+]
+
+
+def test_evaluate_many_matches_evaluate_full(models):
+    batched = evaluator.evaluate_many(PAIRS)
+    assert batched == [evaluator.evaluate_full(c, u, reference=None) for c, u in PAIRS]
+    assert batched[0]["numeric_score"] == 1.0 and batched[1]["numeric_score"] < 1.0
+
+
+def test_evaluate_many_encodes_each_text_once(models):
+    evaluator.evaluate_many(PAIRS + PAIRS[:1])
+    assert len(models.embedding_model.calls) == 1
+    texts = models.embedding_model.calls[0]
+    assert len(texts) == len(set(texts)) == 5
+
+
+def test_evaluate_many_single_text_and_empty(models):
+    assert evaluator.evaluate_many([]) == []
+    [metrics] = evaluator.evaluate_many([("media cero", "media cero")])
+    assert metrics["concept_score"] == 1.0
+
+
+def test_evaluate_many_falls_back_to_pairwise(models, monkeypatch):
+    def broken(texts, batch_size=32, convert_to_tensor=False):
+        if isinstance(texts, list):
+            raise RuntimeError("OOM")
+        return np.array(FakeEmbedder._vector(texts))
+
+    expected = [evaluator.evaluate_full(c, u) for c, u in PAIRS]
+    monkeypatch.setattr(models.embedding_model, "encode", broken)
+    assert evaluator.evaluate_many(PAIRS) == expected
+
+
+def test_reference_features_are_json_and_reused(models):
+    correct, user = PAIRS[2]
+    reference = json.loads(json.dumps(evaluator.reference_features(correct)))
+    assert reference["numbers"] == [4.0] and reference["math_expr"] == "4"
+
+    models.embedding_model.calls.clear()
+    with_reference = evaluator.evaluate_full(correct, user, reference=reference)
+    # Con los features precalculados solo se codifica la respuesta del usuario
+    assert models.embedding_model.calls == [user]
+    assert with_reference == evaluator.evaluate_full(correct, user)
+    assert evaluator.reference_features(correct) == reference
+
+
+@pytest.fixture
+def stages(monkeypatch):
+    """Etapas con puntuaciones fijas que registran cuáles se ejecutan."""
+    ran = []
+
+    def stage(metric, weight, cost, score):
+        def run(correct, user, reference):
+            ran.append(metric)
+            return score[user] if isinstance(score, dict) else score
+        return evaluator.Stage(metric, weight, cost, run)
+
+    def install(scores):
+        ran.clear()
+        monkeypatch.setattr(evaluator, "STAGES", tuple(
+            stage(st.metric, st.weight, st.cost, scores[st.metric]) for st in evaluator.STAGES
+        ))
+    return install, ran
+
+
+def test_staged_stops_once_the_band_is_decided(stages):
+    install, ran = stages
+    # Razonamiento + numérico = 0.75 de peso: con 0 en ambos, el máximo es 0.25 < 0.45
+    install({"reasoning_score": 0.0, "numeric_score": 0.0, "semantic_score": 1.0, "concept_score": 1.0})
+    result = evaluator.evaluate_staged("c", "u")
+    assert ran == ["reasoning_score", "numeric_score"]
+    assert result["pending_stages"] == ["semantic_score", "concept_score"]
+    assert (result["final_score"], result["final_score_max"]) == (0.0, 0.25)
+    assert result["semantic_score"] is None
+
+
+def test_staged_lower_bound_is_in_the_final_band(stages):
+    install, ran = stages
+    install({"reasoning_score": 1.0, "numeric_score": 1.0, "semantic_score": 1.0, "concept_score": 0.5})
+    staged = evaluator.evaluate_staged("c", "u")
+    full = evaluator.evaluate_staged("c", "u", thresholds=None)
+    assert staged["pending_stages"] == ["concept_score"]
+    bands = evaluator.PROGRESSION_THRESHOLDS
+    assert evaluator._band(staged["final_score"], bands) == evaluator._band(full["final_score"], bands) == 2
+    assert "pending_stages" not in full and full["final_score"] == 0.95
+
+
+def test_staged_runs_everything_near_a_threshold(stages):
+    install, ran = stages
+    # 0.69 + 0.15·sem + 0.10·conc: cerca de 0.85 hasta la última etapa
+    install({"reasoning_score": 1.0, "numeric_score": 0.9, "semantic_score": 0.5, "concept_score": 0.5})
+    result = evaluator.evaluate_staged("c", "u")
+    assert ran == ["reasoning_score", "numeric_score", "semantic_score", "concept_score"]
+    assert "pending_stages" not in result
+    assert evaluator.score_bounds({}) == (0.0, 1.0)
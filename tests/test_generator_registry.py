@@ -0,0 +1,73 @@
+import asyncio
+import threading
+
+from project.rag.generator_registry import GeneratorRegistry
+
+run = asyncio.run
+
+
+class FakeGenerator:
+    def __init__(self, dataset_type):
+        self.dataset_type = dataset_type
+
+    async def prepare_question(self, target_difficulty):
+        return f"Pregunta de {self.dataset_type}", "42", target_difficulty
+
+
+def test_concurrent_requests_load_a_dataset_once():
+    loads = []
+    release = threading.Event()
+
+    def factory(dataset_type):
+        loads.append(dataset_type)
+        release.wait(5)
+        return FakeGenerator(dataset_type)
+
+    registry = GeneratorRegistry(factory)
+
+    async def main():
+        tasks = [asyncio.create_task(registry.get("squad")) for _ in range(5)]
+        await asyncio.sleep(0.05)
+        release.set()
+        return await asyncio.gather(*tasks)
+
+    generators = run(main())
+    assert loads == ["squad"]
+    assert len({id(g) for g in generators}) == 1
+    assert registry.stats()["loads"] == 1 and registry.stats()["hits"] == 4
+
+
+def test_least_recently_used_dataset_is_evicted():
+    registry = GeneratorRegistry(FakeGenerator, max_resident=2)
+
+    async def main():
+        first = await registry.get("a")
+        await registry.get("b")
+        await registry.get("a")  # "b" pasa a ser el menos usado
+        await registry.get("c")
+        return first, await registry.get("a")
+
+    first, again = run(main())
+    assert first is again
+    assert registry.stats() == {
+        "resident": ["c", "a"], "max_resident": 2, "hits": 2, "loads": 3, "evictions": 1,
+    }
+
+
+def test_sessions_use_their_own_dataset(app_module, client, monkeypatch):
+    async def no_features(correct_answer):
+        return None
+
+    monkeypatch.setattr(app_module, "generators", GeneratorRegistry(FakeGenerator, max_resident=1))
+    monkeypatch.setattr(app_module.evaluation_executor, "reference_features", no_features)
+
+    ids = {}
+    for dataset in ("squad", "gsm8k"):
+        response = client.post("/api/interview/start", json={"dataset_type": dataset, "total_questions": 2})
+        ids[dataset] = response.json()["session_id"]
+
+    # Con un solo generador residente, cada sesión vuelve a cargar el suyo
+    questions = {d: client.get(f"/api/interview/question/{sid}").json() for d, sid in ids.items()}
+    assert questions["squad"]["question_text"] == "Pregunta de squad"
+    assert questions["gsm8k"]["question_text"] == "Pregunta de gsm8k"
+    assert app_module.generators.stats()["evictions"] == 3
@@ -0,0 +1,103 @@
+import threading
+
+import pytest
+
+from project.rag import ingestion
+from project.rag.ingestion import IngestionPipeline, chunk_id
+
+
+class LineSplitter:
+    """Una línea por chunk (sustituye al splitter de LangChain)."""
+
+    def split_text(self, text):
+        return [line for line in text.splitlines() if line]
+
+
+@pytest.fixture(autouse=True)
+def splitter(monkeypatch):
+    monkeypatch.setattr(ingestion, "_make_splitter", lambda size, overlap: LineSplitter())
+
+
+def embed(texts):
+    return [[float(len(t))] for t in texts]
+
+
+def run_with_timeout(pipeline, *args, **kwargs):
+    """Ejecuta `pipeline.run` en un hilo; falla si no termina (en vez de colgar la suite)."""
+    outcome = {}
+
+    def target():
+        try:
+            outcome["result"] = pipeline.run(*args, **kwargs)
+        except BaseException as e:
+            outcome["error"] = e
+
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    thread.join(timeout=10)
+    assert not thread.is_alive(), "IngestionPipeline.run no ha terminado"
+    return outcome
+
+
+def pipeline(write, embed=embed, **kwargs):
+    return IngestionPipeline(embed, write, workers=0, batch_size=2, queue_size=1, verbose=False, **kwargs)
+
+
+def test_dedups_and_skips_existing_chunks():
+    batches = []
+    texts = ["a\nb\na", ("c\nb", {"source": "x"}), "d"]
+    existing = {chunk_id("d")}
+
+    result = run_with_timeout(pipeline(lambda *batch: batches.append(batch)), texts, existing_ids=existing)["result"]
+
+    written = [cid for ids, *_ in batches for cid in ids]
+    assert written == [chunk_id("a"), chunk_id("b"), chunk_id("c", {"source": "x"}), chunk_id("b", {"source": "x"})]
+    assert result["added"] == 4 and result["unchanged"] == 1
+    assert result["seen_ids"] == set(written) | existing
+    assert all(len(ids) <= 2 for ids, *_ in batches)
+
+
+def test_max_chunks_stops_reading():
+    batches = []
+    texts = ("\n".join(f"t{i}-{j}" for j in range(10)) for i in range(1000))
+
+    result = run_with_timeout(pipeline(lambda *batch: batches.append(batch)), texts, max_chunks=5)["result"]
+
+    assert len(result["seen_ids"]) == 5 and result["added"] == 5
+
+
+def test_embedding_error_is_raised_without_hanging():
+    calls = []
+
+    def failing_embed(texts):
+        calls.append(len(texts))
+        if len(calls) > 1:
+            raise RuntimeError("sin GPU")
+        return embed(texts)
+
+    writes = []
+    texts = [f"linea {i}" for i in range(50)]
+    outcome = run_with_timeout(pipeline(lambda *batch: writes.append(batch), embed=failing_embed), texts)
+
+    assert isinstance(outcome.get("error"), RuntimeError)
+    assert len(writes) <= 1
+
+
+def test_write_error_is_raised_without_hanging():
+    def failing_write(*batch):
+        raise OSError("disco lleno")
+
+    texts = [f"linea {i}" for i in range(50)]
+    outcome = run_with_timeout(pipeline(failing_write), texts)
+
+    assert isinstance(outcome.get("error"), OSError)
+
+
+def test_reader_error_is_raised_without_hanging():
+    def texts():
+        yield "a"
+        raise ValueError("fichero corrupto")
+
+    outcome = run_with_timeout(pipeline(lambda *batch: None), texts())
+
+    assert isinstance(outcome.get("error"), ValueError)
@@ -0,0 +1,79 @@
+import pytest
+
+from project.rag.lexical_index import LexicalIndex, build_match_query
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = LexicalIndex(str(tmp_path / "lexical.sqlite"))
+    yield index
+    index.close()
+
+
+def test_match_query_quotes_terms_and_adds_expressions_as_phrases():
+    assert build_match_query("¿Cuánto vale E[X] si X es Markov?") == (
+        '"e x" OR "cuánto" OR "vale" OR "e" OR "x" OR "si" OR "es" OR "markov"'
+    )
+    # Sin operadores de FTS5 que rompan la consulta
+    assert build_match_query('NOT "a" OR b*') == '"not" OR "a" OR "or" OR "b"'
+    assert build_match_query("¿?") == ""
+
+
+def test_search_ranks_exact_terms_and_phrases(index):
+    index.upsert(
+        ["markov", "expectation", "other"],
+        [
+            "A Markov chain is a martingale only in special cases",
+            "The expectation E[X] of a fair die is 3.5",
+            "Brownian motion has independent increments",
+        ],
+    )
+    assert [r[0] for r in index.search("martingale", k=3)] == ["markov"]
+    ranked = index.search("What is E[X] for a chain?", k=3)
+    assert ranked[0][0] == "expectation"
+    assert all(score > 0 for *_, score in ranked)
+    # Sin acentos ni mayúsculas: remove_diacritics
+    index.upsert(["es"], ["La esperanza de una cadena de Márkov"])
+    assert {r[0] for r in index.search("MARKOV", k=5)} == {"markov", "es"}
+
+
+def test_upsert_is_idempotent_and_delete_keeps_fts_in_sync(index):
+    index.upsert(["a", "b"], ["martingale stopping time", "poisson process"])
+    index.upsert(["a"], ["otro texto con el mismo id"])
+    assert len(index) == 2 and index.ids() == {"a", "b"}
+
+    index.delete(["a"])
+    assert index.search("martingale") == []
+    assert index.ids() == {"b"}
+
+    index.clear()
+    assert len(index) == 0 and index.search("poisson") == []
+
+
+def test_filters_use_flattened_metadata(index):
+    index.upsert(
+        ["c1", "c2", "c3"],
+        ["markov question"] * 3,
+        [
+            {"firm": "citadel", "tag:markov-chains": True, "difficulty": "Dificil"},
+            {"firm": "jane-street", "tag:markov-chains": True},
+            None,
+        ],
+    )
+    assert {r[0] for r in index.search("markov", filters={"tag:markov-chains": True})} == {"c1", "c2"}
+    hits = index.search("markov", filters={"firm": "citadel", "difficulty": "Dificil"})
+    assert [(cid, meta["firm"]) for cid, _, meta, _ in hits] == [("c1", "citadel")]
+    assert index.search("markov", filters={"firm": "two-sigma"}) == []
+
+
+def test_index_persists_across_connections(tmp_path):
+    path = str(tmp_path / "lexical.sqlite")
+    first = LexicalIndex(path)
+    first.upsert(["a"], ["stochastic calculus"], [{"source": "x"}])
+    first.close()
+
+    reopened = LexicalIndex(path)
+    try:
+        assert reopened.search("calculus")[0][:3] == ("a", "stochastic calculus", {"source": "x"})
+    finally:
+        reopened.close()
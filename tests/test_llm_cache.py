@@ -0,0 +1,138 @@
+import time
+import asyncio
+
+import pytest
+
+from project.llm import LLMProvider
+from project.llm.cache import DiskCacheBackend, LLMCache, RedisCacheBackend, make_cache_key
+from project.llm.config import LLMSettings
+
+
+def test_cache_key_ignores_whitespace_but_not_inputs():
+    a = make_cache_key("GROQ", "m", "normalize_question", 1, {"q": "hola   mundo "})
+    assert a == make_cache_key("GROQ", "m", "normalize_question", 1, {"q": "hola mundo"})
+    assert a != make_cache_key("GROQ", "m", "normalize_question", 2, {"q": "hola mundo"})
+    assert a != make_cache_key("GEMINI", "m", "normalize_question", 1, {"q": "hola mundo"})
+
+
+def test_disk_backend_ttl_and_periodic_lru_eviction(tmp_path):
+    backend = DiskCacheBackend(str(tmp_path / "c.sqlite"), ttl=60, max_entries=3, evict_every=4)
+
+    async def main():
+        for i in range(3):
+            await backend.set(f"k{i}", f"v{i}")
+        assert await backend.get("k0") == "v0"  # k0 pasa a ser el más reciente
+        await backend.set("k3", "v3")  # 4ª escritura: expulsión LRU (sobra k1)
+        assert await backend.get("k1") is None
+        assert await backend.size() == 3
+
+        # Las entradas caducadas no se sirven y se purgan en la siguiente pasada
+        backend.conn.execute("UPDATE llm_cache SET expires_at = ? WHERE key = 'k2'", (time.time() - 1,))
+        assert await backend.get("k2") is None
+        assert await backend.get("k0") == "v0"
+
+    asyncio.run(main())
+    indexes = {row[1] for row in backend.conn.execute("PRAGMA index_list(llm_cache)")}
+    assert "idx_llm_cache_expires" in indexes
+
+
+def test_disk_backend_does_not_block_the_event_loop(tmp_path):
+    backend = DiskCacheBackend(str(tmp_path / "c.sqlite"), ttl=60, max_entries=10)
+    original = backend._get
+
+    def slow_get(key):
+        time.sleep(0.3)
+        return original(key)
+
+    backend._get = slow_get
+    cache = LLMCache(backend, ["p"])
+
+    async def main():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        await cache.get("k", "p")
+        task.cancel()
+        return ticks
+
+    assert asyncio.run(main()) >= 10
+
+
+def test_redis_backend_lru_eviction():
+    fakeredis = pytest.importorskip("fakeredis")
+    server = fakeredis.FakeServer()
+    backend = RedisCacheBackend(
+        lambda: fakeredis.FakeAsyncRedis(server=server, decode_responses=True), ttl=60, max_entries=2
+    )
+
+    async def fill():
+        await backend.set("a", "1")
+        await backend.set("b", "2")
+        assert await backend.get("a") == "1"
+        await backend.set("c", "3")
+        return await backend.get("b"), await backend.get("a"), await backend.size()
+
+    assert asyncio.run(fill()) == (None, "1", 2)
+    # Otro event loop (p.ej. un script con asyncio.run): se crea otro cliente
+    assert asyncio.run(backend.get("c")) == "3"
+
+
+def test_redis_backend_closes_the_client_of_a_previous_loop():
+    fakeredis = pytest.importorskip("fakeredis")
+    server = fakeredis.FakeServer()
+    clients = []
+
+    class TrackedRedis(fakeredis.FakeAsyncRedis):
+        closed = False
+
+        async def aclose(self, *args, **kwargs):
+            self.closed = True
+            await super().aclose(*args, **kwargs)
+
+    def factory():
+        clients.append(TrackedRedis(server=server, decode_responses=True))
+        return clients[-1]
+
+    cache = LLMCache(RedisCacheBackend(factory, ttl=60, max_entries=10), ["p"])
+    provider = LLMProvider(LLMSettings("GROQ", "k", "u", "m", "m"), cache=cache)
+    asyncio.run(cache.set("a", "1"))
+    assert asyncio.run(cache.get("a", "p")) == "1"
+    assert [c.closed for c in clients] == [True, False]
+
+    # Al cerrar el proveedor (fin de la app o del script) se cierra también la caché
+    async def finish():
+        await cache.get("a", "p")
+        await provider.aclose()
+
+    asyncio.run(finish())
+    assert all(c.closed for c in clients)
+
+
+def test_provider_serves_repeated_prompts_from_cache(tmp_path):
+    cache = LLMCache(DiskCacheBackend(str(tmp_path / "c.sqlite"), ttl=60, max_entries=10), ["normalize_question"])
+    provider = LLMProvider(LLMSettings("GROQ", "k", "u", "m", "m"), cache=cache)
+    calls = []
+
+    async def fake_complete(prompt, *args):
+        calls.append(prompt)
+        return "respuesta"
+
+    provider._complete = fake_complete
+
+    async def main():
+        kwargs = dict(prompt_type="normalize_question", cache_inputs={"question": "q"})
+        first = await provider.complete("prompt", **kwargs)
+        second = await provider.complete("prompt", **kwargs)
+        uncached = await provider.complete("prompt", prompt_type="explanation", cache_inputs={"question": "q"})
+        return first, second, uncached
+
+    assert asyncio.run(main()) == ("respuesta",) * 3
+    assert len(calls) == 2
+    stats = asyncio.run(cache.stats())
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 1, 1)
@@ -0,0 +1,109 @@
+import json
+import asyncio
+
+import httpx
+import pytest
+
+from project.llm import LLMGenerationError, LLMProvider
+from project.llm.config import PROVIDERS, LLMSettings
+
+
+def settings(provider="GEMINI", timeout=5.0):
+    defaults = PROVIDERS[provider]
+    return LLMSettings(
+        provider=provider, api_key="k", base_url=defaults["base_url"],
+        model=defaults["model"], reasoning_model=defaults["reasoning_model"], timeout=timeout,
+    )
+
+
+@pytest.fixture(autouse=True)
+def no_cache(monkeypatch):
+    monkeypatch.setenv("LLM_CACHE_BACKEND", "none")
+
+
+def run_with_transport(provider, handler, coro_fn):
+    """Ejecuta coro_fn(provider) con el pool HTTP servido por `handler`."""
+    async def main():
+        provider._http = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        provider._loop = asyncio.get_running_loop()
+        try:
+            return await coro_fn(provider)
+        finally:
+            await provider.aclose()
+
+    return asyncio.run(main())
+
+
+def gemini_reply(*parts):
+    return {"candidates": [{"content": {"parts": list(parts)}}]}
+
+
+def test_missing_api_key_is_rejected():
+    with pytest.raises(LLMGenerationError):
+        LLMProvider(LLMSettings("GROQ", None, "u", "m", "m"))
+
+
+def test_gemini_complete_sends_generation_config_and_skips_thoughts():
+    seen = {}
+
+    def handler(request):
+        seen["url"] = str(request.url)
+        seen["key"] = request.headers["x-goog-api-key"]
+        seen["body"] = json.loads(request.content)
+        return httpx.Response(200, json=gemini_reply({"text": "pienso", "thought": True}, {"text": " 42 "}))
+
+    provider = LLMProvider(settings())
+    text = run_with_transport(
+        provider, handler, lambda p: p.complete("¿?", temperature=0.2, max_tokens=8, json_mode=True)
+    )
+    assert text == "42"
+    assert seen["url"].endswith("/models/gemini-2.5-flash:generateContent")
+    assert seen["key"] == "k"
+    # Solo el texto del prompt: no se adjuntan ficheros remotos
+    assert seen["body"]["contents"] == [{"role": "user", "parts": [{"text": "¿?"}]}]
+    assert seen["body"]["generationConfig"] == {
+        "temperature": 0.2, "maxOutputTokens": 8, "responseMimeType": "application/json"
+    }
+
+
+def test_openai_compatible_complete():
+    def handler(request):
+        body = json.loads(request.content)
+        assert body["model"] == "deepseek-chat"
+        assert body["messages"] == [{"role": "user", "content": "hola"}]
+        return httpx.Response(200, json={
+            "id": "x", "object": "chat.completion", "created": 0, "model": body["model"],
+            "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": " hola "}}],
+        })
+
+    provider = LLMProvider(settings("DEEPSEEK"))
+    assert run_with_transport(provider, handler, lambda p: p.complete("hola")) == "hola"
+
+
+def test_http_errors_and_timeouts_become_generation_errors():
+    provider = LLMProvider(settings())
+    with pytest.raises(LLMGenerationError):
+        run_with_transport(provider, lambda r: httpx.Response(500), lambda p: p.complete("x"))
+
+    async def slow(prompt, *args, **kwargs):
+        await asyncio.sleep(1)
+
+    provider._complete_gemini = slow
+    with pytest.raises(LLMGenerationError, match="Timeout"):
+        asyncio.run(provider.complete("x", timeout=0.05))
+
+
+def test_concurrent_calls_do_not_block_each_other():
+    async def handler(request):
+        await asyncio.sleep(0.2)
+        return httpx.Response(200, json=gemini_reply({"text": "ok"}))
+
+    async def twenty_calls(provider):
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        results = await asyncio.gather(*(provider.complete(str(i)) for i in range(20)))
+        return results, loop.time() - start
+
+    results, elapsed = run_with_transport(LLMProvider(settings()), handler, twenty_calls)
+    assert results == ["ok"] * 20
+    assert elapsed < 1.0
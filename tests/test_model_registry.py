@@ -0,0 +1,148 @@
+import time
+import threading
+
+import numpy as np
+import pytest
+
+from project import model_registry
+
+
+@pytest.fixture(autouse=True)
+def empty_registry(monkeypatch):
+    monkeypatch.setattr(model_registry, "_models", {})
+    monkeypatch.setattr(model_registry, "_load_stats", {})
+    for var in ("SHARED_EMBEDDING_MODEL", "RETRIEVAL_EMBEDDING_MODEL", "SCORING_EMBEDDING_MODEL", "EMBEDDING_BACKEND"):
+        monkeypatch.delenv(var, raising=False)
+
+
+class FakeModel:
+    """Modelo que detecta llamadas concurrentes a encode."""
+
+    def __init__(self):
+        self.active = 0
+        self.overlaps = 0
+        self.max_seq_length = 384
+
+    def encode(self, texts, **kwargs):
+        self.active += 1
+        if self.active > 1:
+            self.overlaps += 1
+        time.sleep(0.01)
+        self.active -= 1
+        return np.array([[float(len(t)), 0.0] for t in texts])
+
+
+def test_model_names_follow_shared_override(monkeypatch):
+    assert model_registry.retrieval_model_name() == model_registry.DEFAULT_RETRIEVAL_MODEL
+    assert model_registry.scoring_model_name() == model_registry.DEFAULT_SCORING_MODEL
+    monkeypatch.setenv("SHARED_EMBEDDING_MODEL", "shared")
+    assert model_registry.retrieval_model_name() == model_registry.scoring_model_name() == "shared"
+
+
+def test_get_or_load_loads_once_across_threads():
+    loads = []
+
+    def loader():
+        loads.append(1)
+        time.sleep(0.05)
+        return object()
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(model_registry._get_or_load("m", loader)))
+        for _ in range(8)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(loads) == 1
+    assert len({id(r) for r in results}) == 1
+    assert "rss_delta_mb" in model_registry._load_stats["m"]
+
+
+def test_shared_handle_serializes_encode_and_delegates_attributes():
+    model = FakeModel()
+    shared = model_registry.SharedSentenceTransformer("m", model)
+    threads = [threading.Thread(target=shared.encode, args=(["abc"],)) for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert model.overlaps == 0
+    assert shared.max_seq_length == 384
+
+
+def test_shared_embeddings_and_memory_report_use_registry_instances(monkeypatch):
+    model = FakeModel()
+    monkeypatch.setattr(
+        model_registry, "_models",
+        {"sentence-transformers:m@cpu:torch": model_registry.SharedSentenceTransformer("m", model)},
+    )
+    monkeypatch.setattr(
+        model_registry, "get_sentence_transformer",
+        lambda name, device=None, backend=None: model_registry._models[f"sentence-transformers:{name}@cpu:torch"],
+    )
+
+    embeddings = model_registry.SharedEmbeddings("m")
+    assert embeddings.embed_documents(["ab", "abcd"]) == [[2.0, 0.0], [4.0, 0.0]]
+    assert embeddings.embed_query("abc") == [3.0, 0.0]
+    assert embeddings.model.model is model
+
+    report = model_registry.memory_report()
+    assert set(report["models"]) == {"sentence-transformers:m@cpu:torch"}
+    assert report["embedding_backend"] == "torch"
+
+
+def test_unknown_backend_falls_back_to_torch(monkeypatch):
+    monkeypatch.setenv("EMBEDDING_BACKEND", "ONNX-INT8")
+    assert model_registry.embedding_backend() == "onnx-int8"
+    monkeypatch.setenv("EMBEDDING_BACKEND", "tensorrt")
+    assert model_registry.embedding_backend() == "torch"
+
+
+def test_quantization_config_from_env_and_cpu(monkeypatch):
+    monkeypatch.setenv("ONNX_QUANTIZATION", "avx2")
+    assert model_registry._quantization_config() == "avx2"
+    monkeypatch.delenv("ONNX_QUANTIZATION")
+    monkeypatch.setattr(model_registry.platform, "machine", lambda: "aarch64")
+    assert model_registry._quantization_config() == "arm64"
+
+
+def test_onnx_backends_are_cpu_only_and_cached_separately(monkeypatch):
+    keys = []
+    monkeypatch.setattr(model_registry, "_get_or_load", lambda key, loader: keys.append(key) or key)
+    monkeypatch.setattr(model_registry, "default_device", lambda: "cuda")
+
+    model_registry.get_sentence_transformer("m")
+    model_registry.get_sentence_transformer("m", device="cuda", backend="onnx")
+    monkeypatch.setenv("EMBEDDING_BACKEND", "onnx-int8")
+    model_registry.get_sentence_transformer("m")
+
+    assert keys == [
+        "sentence-transformers:m@cuda:torch",
+        "sentence-transformers:m@cpu:onnx",
+        "sentence-transformers:m@cpu:onnx-int8",
+    ]
+
+
+def test_quantized_export_is_reused(monkeypatch, tmp_path):
+    pytest.importorskip("sentence_transformers")
+    monkeypatch.setattr(model_registry, "ONNX_MODELS_DIR", str(tmp_path))
+    target = tmp_path / "org__model"
+    (target / "onnx").mkdir(parents=True)
+    (target / "onnx" / "model_qint8_avx2.onnx").write_bytes(b"onnx")
+
+    # Ya exportado: no se vuelve a cargar ni a cuantizar el modelo
+    assert model_registry._export_quantized_onnx("org/model", "avx2") == str(target)
+
+
+def test_memory_report_uses_onnx_file_size(monkeypatch, tmp_path):
+    onnx_file = tmp_path / "model_qint8_avx2.onnx"
+    onnx_file.write_bytes(b"\0" * 2**20)
+    shared = model_registry.SharedSentenceTransformer("m", FakeModel(), "onnx-int8", onnx_file=str(onnx_file))
+    monkeypatch.setattr(model_registry, "_models", {"sentence-transformers:m@cpu:onnx-int8": shared})
+
+    report = model_registry.memory_report()
+    assert report["models"]["sentence-transformers:m@cpu:onnx-int8"]["weights_mb"] == 1.0
@@ -0,0 +1,76 @@
+from types import SimpleNamespace
+
+import pytest
+
+from project.rag.utils import pdf_reader
+from project.rag.utils.pdf_reader import _HEADING, read_pdf_sections
+
+
+@pytest.mark.parametrize("line, title", [
+    ("Chapter 3 Martingales", "Chapter 3 Martingales"),
+    ("Capítulo 2 Procesos de Poisson", "Capítulo 2 Procesos de Poisson"),
+    ("2.4 Stopping Times", "2.4 Stopping Times"),
+    ("2.6.2. Objetos aleatorios . . . 41", "2.6.2. Objetos aleatorios . . ."),
+])
+def test_heading_matches_section_titles(line, title):
+    assert _HEADING.search(line).group(1) == title
+
+
+@pytest.mark.parametrize("line", ["1.5 2.3 4.1", "2.1 Media 0.35", "See section 2.4 for details", "12 monkeys"])
+def test_heading_ignores_tables_and_prose(line):
+    assert _HEADING.search(line) is None
+
+
+class FakePage:
+    def __init__(self, text):
+        self.text = text
+
+    def extract_text(self):
+        if self.text is None:
+            raise ValueError("stream corrupto")
+        return self.text
+
+
+def fake_reader(pages, outline=()):
+    class Reader:
+        def __init__(self, path):
+            self.pages = [FakePage(t) for t in pages]
+            self.outline = [SimpleNamespace(title=title, page=page) for page, title in outline]
+
+        def get_destination_page_number(self, item):
+            return item.page
+
+    return Reader
+
+
+def test_outline_sections_follow_the_pages(monkeypatch):
+    monkeypatch.setattr(pdf_reader, "PdfReader", fake_reader(
+        ["Prefacio", "Una martin-\ngala   es...", None, "", "Parada opcional"],
+        outline=[(4, "2 Parada"), (1, "1 Martingalas")],
+    ))
+
+    assert list(read_pdf_sections("/libros/Shreve.pdf")) == [
+        ("Prefacio", {"book": "Shreve", "section": "Shreve", "page": 1}),
+        ("Una martingala es...", {"book": "Shreve", "section": "1 Martingalas", "page": 2}),
+        ("Parada opcional", {"book": "Shreve", "section": "2 Parada", "page": 5}),
+    ]
+
+
+def test_headings_split_pages_without_outline(monkeypatch):
+    monkeypatch.setattr(pdf_reader, "PdfReader", fake_reader([
+        "Intro text\nChapter 1 Probability\nSample spaces",
+        "more on sample spaces\n1.2 Conditional Expectation\nE[X|G] is...",
+    ]))
+
+    assert [(text, meta["section"], meta["page"]) for text, meta in read_pdf_sections("libro.pdf")] == [
+        ("Intro text", "libro", 1),
+        ("Chapter 1 Probability\nSample spaces", "Chapter 1 Probability", 1),
+        ("more on sample spaces", "Chapter 1 Probability", 2),
+        ("1.2 Conditional Expectation\nE[X|G] is...", "1.2 Conditional Expectation", 2),
+    ]
+
+
+def test_missing_pypdf_is_reported(monkeypatch):
+    monkeypatch.setattr(pdf_reader, "PdfReader", None)
+    with pytest.raises(ImportError):
+        list(read_pdf_sections("libro.pdf"))
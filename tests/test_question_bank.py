@@ -0,0 +1,108 @@
+import asyncio
+
+import pytest
+
+from project.rag import question_bank, question_generator
+from project.rag.question_bank import QuestionBank, build_question_bank, question_id
+
+
+class FakeGenerator:
+    """Clasificador sin LLM: la dificultad va en la pregunta; 'fallo' simula un error."""
+
+    calls = []
+
+    def __init__(self, dataset_type):
+        self.dataset_type = dataset_type
+
+    async def _classify_answer_difficulty(self, question, answer, fallback="Medio"):
+        FakeGenerator.calls.append(question)
+        if "fallo" in question:
+            return fallback
+        return question.split()[0]
+
+
+@pytest.fixture
+def build(tmp_path, monkeypatch):
+    monkeypatch.setattr(question_generator, "QuestionGenerator", FakeGenerator)
+    FakeGenerator.calls = []
+
+    def run(items, **kwargs):
+        monkeypatch.setattr(question_bank, "_iter_source_items", lambda dataset_type, limit: iter(items))
+        bank = asyncio.run(build_question_bank("squad", db_path=str(tmp_path), verbose=False, **kwargs))
+        bank.close()
+        return QuestionBank(question_bank.bank_path("squad", str(tmp_path)))
+
+    return run
+
+
+def item(question, answer="a"):
+    return {"question": question, "answer": answer, "firm": None, "tags": []}
+
+
+def test_failed_classification_is_not_stored_and_is_retried(build):
+    bank = build([item("Facil uno"), item("fallo dos")])
+    assert bank.counts() == {"Facil": 1}
+    assert not bank.contains(question_id("fallo dos", "a"))
+
+    FakeGenerator.calls = []
+    build([item("Facil uno"), item("fallo dos")])
+    # El par ya clasificado no se repite; el fallido sí
+    assert FakeGenerator.calls == ["fallo dos"]
+
+
+def test_refresh_prunes_items_removed_from_dataset(build):
+    build([item("Facil uno"), item("Facil dos"), item("Facil tres"), item("Medio cuatro")])
+    bank = build([item("Facil uno"), item("Facil tres")])
+
+    assert bank.ids() == {question_id("Facil uno", "a"), question_id("Facil tres", "a")}
+    assert bank.counts() == {"Facil": 2}
+    # Los slots siguen siendo contiguos: el muestreo por índice siempre encuentra fila
+    slots = sorted(r[0] for r in bank.conn.execute("SELECT slot FROM questions WHERE difficulty = 'Facil'"))
+    assert slots == [0, 1]
+    assert all(bank.sample("Facil") for _ in range(20))
+    assert bank.sample("Dificil")["difficulty"] == "Facil"
+
+
+def test_limited_refresh_does_not_prune(build):
+    build([item("Facil uno"), item("Medio dos")])
+    bank = build([item("Facil uno")], limit=1)
+    assert bank.size() == 2
+
+
+def test_empty_read_does_not_empty_the_bank(build):
+    build([item("Facil uno")])
+    assert build([]).size() == 1
+
+
+def test_remove_recompacts_slots_per_level(tmp_path):
+    bank = QuestionBank(str(tmp_path / "bank.sqlite"))
+    for i in range(4):
+        bank.add(f"q{i}", "a", "Medio", tags=["Prob"])
+    bank.add("x", "a", "Dificil")
+
+    assert bank.remove([question_id("q1", "a"), "no-existe"]) == 1
+
+    rows = bank.conn.execute("SELECT question, slot FROM questions WHERE difficulty = 'Medio' ORDER BY slot").fetchall()
+    assert [(r[0], r[1]) for r in rows] == [("q0", 0), ("q2", 1), ("q3", 2)]
+    assert bank.counts() == {"Medio": 3, "Dificil": 1}
+    assert bank.conn.execute("SELECT COUNT(*) FROM question_tags").fetchone()[0] == 3
+    # Tras compactar se puede seguir añadiendo sin chocar con el índice (difficulty, slot)
+    assert bank.add("q4", "a", "Medio")
+    assert bank.counts()["Medio"] == 4
+
+
+@pytest.mark.parametrize("reply", ["Tal vez intermedio", RuntimeError("timeout")])
+def test_classifier_reports_failures_with_explicit_fallback(reply):
+    class LLM:
+        is_gemini = False
+
+        async def complete(self, prompt, **kwargs):
+            if isinstance(reply, Exception):
+                raise reply
+            return reply
+
+    generator = object.__new__(question_generator.QuestionGenerator)
+    generator.llm = LLM()
+    classify = generator._classify_answer_difficulty
+    assert asyncio.run(classify("q", "a")) == "Medio"
+    assert asyncio.run(classify("q", "a", fallback=None)) is None
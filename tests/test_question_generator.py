@@ -0,0 +1,101 @@
+import json
+import asyncio
+
+import pytest
+
+from project.rag.question_generator import QuestionGenerator, _normalize_level, _parse_json_object
+
+
+class FakeLLM:
+    provider = "FAKE"
+    is_gemini = False
+
+    def __init__(self, *replies):
+        self.replies = list(replies)
+        self.calls = []
+
+    async def complete(self, prompt, **kwargs):
+        self.calls.append(kwargs.get("prompt_type"))
+        reply = self.replies.pop(0)
+        if isinstance(reply, Exception):
+            raise reply
+        return reply
+
+
+class FakeRAG:
+    def __init__(self, texts):
+        self.texts = texts
+
+    def read_dataset(self, max_texts=None, sample_random=False):
+        return self.texts[:max_texts]
+
+
+class FakeBank:
+    def __init__(self, item):
+        self.item = item
+
+    def sample(self, difficulty):
+        return self.item
+
+
+class FakeAnswers:
+    async def clean_answer(self, raw):
+        return f"limpia:{raw}"
+
+
+def make_generator(llm, texts=(), bank=None):
+    generator = object.__new__(QuestionGenerator)
+    generator.llm, generator.provider = llm, llm.provider
+    generator.rag = FakeRAG(list(texts))
+    generator.bank = bank
+    generator._answer_generator = FakeAnswers()
+    return generator
+
+
+TEXTS = [f"Pregunta: q{i}\nRespuesta: a{i}" for i in range(4)]
+
+
+@pytest.mark.parametrize("text, level", [("Fácil", "Facil"), ("difícil.", "Dificil"), ("Medio", "Medio"), ("Hard", None), ("", None)])
+def test_normalize_level(text, level):
+    assert _normalize_level(text) == level
+
+
+def test_parse_json_object_tolerates_fences_and_noise():
+    assert _parse_json_object('```json\n{"chosen": 1}\n```') == {"chosen": 1}
+    assert _parse_json_object('Aquí tienes: {"a": [1, 2]} ¡suerte!') == {"a": [1, 2]}
+    assert _parse_json_object("sin json") is None
+    assert _parse_json_object("[1, 2]") is None
+
+
+def test_prepare_question_uses_a_single_structured_call():
+    reply = json.dumps({"difficulties": ["Facil", "Dificil", "Medio", "Facil"], "chosen": 1, "question": "P", "answer": "R"})
+    llm = FakeLLM(reply)
+    question, answer, level = asyncio.run(make_generator(llm, TEXTS).prepare_question("Dificil"))
+    assert (question, answer, level) == ("P", "R", "Dificil")
+    assert llm.calls == ["prepare_question"]
+
+
+def test_prepare_question_redoes_text_when_model_picks_wrong_candidate():
+    reply = json.dumps({"difficulties": ["Facil", "Dificil", "Medio", "Facil"], "chosen": 0, "question": "P", "answer": "R"})
+    llm = FakeLLM(reply, "q1 normalizada")
+    question, answer, level = asyncio.run(make_generator(llm, TEXTS).prepare_question("Dificil"))
+    assert (question, answer, level) == ("q1 normalizada", "limpia:a1", "Dificil")
+    assert llm.calls == ["prepare_question", "normalize_question"]
+
+
+def test_prepare_question_with_bank_keeps_known_difficulty():
+    bank = FakeBank({"question": "qb", "answer": "ab", "difficulty": "Medio"})
+    # El modelo no debe poder cambiar la dificultad ya conocida del banco
+    llm = FakeLLM(json.dumps({"difficulties": ["Dificil"], "chosen": 0, "question": "P", "answer": "R"}))
+    assert asyncio.run(make_generator(llm, bank=bank).prepare_question("Dificil")) == ("P", "R", "Medio")
+
+
+def test_prepare_question_falls_back_to_individual_calls_on_invalid_json():
+    bank = FakeBank({"question": "qb", "answer": "ab", "difficulty": "Facil"})
+    llm = FakeLLM("no es json", "qb normalizada")
+    result = asyncio.run(make_generator(llm, bank=bank).prepare_question("Facil"))
+    assert result == ("qb normalizada", "limpia:ab", "Facil")
+
+
+def test_prepare_question_without_data():
+    assert asyncio.run(make_generator(FakeLLM()).prepare_question("Medio")) == (None, None, "Medio")
@@ -0,0 +1,112 @@
+import json
+import time
+import asyncio
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+pytest.importorskip("lupa")  # scripts Lua en fakeredis
+
+from project.rag.generator_registry import GeneratorRegistry
+from project.rag.question_pool import QuestionPool
+
+
+def entry(i, age=0.0):
+    return {"id": f"id{i}", "question": f"q{i}", "answer": "a", "difficulty": "Facil", "created_at": time.time() - age}
+
+
+async def make_pool(entries=(), generator_for=lambda d: None, **kwargs):
+    redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+    pool = QuestionPool(redis, generator_for, datasets=["squad"], **kwargs)
+    # LPUSH: la primera entrada pasada acaba al final (la más antigua)
+    for e in entries:
+        await redis.lpush(pool._key("squad", "Facil"), json.dumps(e))
+    return redis, pool
+
+
+async def ids_in(redis, pool):
+    return [json.loads(r)["id"] for r in await redis.lrange(pool._key("squad", "Facil"), 0, -1)]
+
+
+def test_pop_skips_served_in_place_and_drops_stale():
+    async def main():
+        redis, pool = await make_pool([entry(0, age=100), entry(1), entry(2), entry(3)], ttl=50)
+        got = await pool.pop("squad", "Facil", served=["id1"])
+        assert got["id"] == "id2"
+        # id1 (servida en la sesión) sigue en su sitio, id0 (caducada) se ha borrado
+        assert await ids_in(redis, pool) == ["id3", "id1"]
+        assert (await pool.pop("squad", "Facil", served=["id1", "id3"])) is None
+        stats = await pool.stats()
+        assert stats["counters"] == {"squad:Facil:hits": 1, "squad:Facil:misses": 1}
+
+    asyncio.run(main())
+
+
+def test_concurrent_pops_serve_each_entry_once():
+    async def main():
+        redis, pool = await make_pool([entry(i) for i in range(10)])
+        results = await asyncio.gather(*(pool.pop("squad", "Facil") for _ in range(25)))
+        served = [r["id"] for r in results if r]
+        assert sorted(served) == sorted(f"id{i}" for i in range(10))
+        assert await ids_in(redis, pool) == []
+
+    asyncio.run(main())
+
+
+class Generator:
+    def __init__(self, on_prepare=None):
+        self.on_prepare = on_prepare
+        self.calls = 0
+
+    async def prepare_question(self, target_difficulty):
+        self.calls += 1
+        if self.on_prepare:
+            await self.on_prepare()
+        return f"q{self.calls}", "a", target_difficulty
+
+
+def test_refill_only_for_resident_generators():
+    async def main():
+        redis, pool = await make_pool(size=4, low_water=2)
+        assert await pool.refill("squad", "Facil") == 0
+        assert await redis.keys("pool:lock:*") == []
+
+        generator = Generator()
+        pool.generator_for = lambda d: generator
+        assert await pool.refill("squad", "Facil") == 4
+        assert await redis.llen(pool._key("squad", "Facil")) == 4
+        assert await redis.keys("pool:lock:*") == []
+
+    asyncio.run(main())
+
+
+def test_refill_does_not_release_a_lock_taken_by_another_worker():
+    async def main():
+        redis, pool = await make_pool(size=1, low_water=1)
+        lock_key = "pool:lock:squad:Facil"
+
+        async def lock_expires_and_is_taken():
+            # Nuestro lock caduca durante la generación y otro worker lo toma
+            await redis.set(lock_key, "otro-worker", ex=120)
+
+        pool.generator_for = lambda d: Generator(lock_expires_and_is_taken)
+        assert await pool.refill("squad", "Facil") == 1
+        assert await redis.get(lock_key) == "otro-worker"
+
+    asyncio.run(main())
+
+
+def test_registry_peek_does_not_load_or_touch_lru():
+    loaded = []
+    registry = GeneratorRegistry(lambda d: loaded.append(d) or d, max_resident=2)
+
+    async def main():
+        await registry.get("a")
+        await registry.get("b")
+        assert registry.peek("c") is None
+        assert registry.peek("a") == "a"
+        await registry.get("c")  # expulsa "a": peek no lo ha marcado como usado
+
+    asyncio.run(main())
+    assert loaded == ["a", "b", "c"]
+    assert registry.stats()["resident"] == ["b", "c"]
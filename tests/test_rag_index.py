@@ -0,0 +1,106 @@
+import pytest
+
+pytest.importorskip("langchain_text_splitters")
+pytest.importorskip("langchain_community")
+pytest.importorskip("chromadb")
+
+from project.rag import rag as rag_module
+from project.rag.rag import RAG
+
+
+class FakeEmbeddings:
+    """Embeddings deterministas sin modelo (interfaz Embeddings de LangChain)."""
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def embed_documents(self, texts):
+        return [[float(len(t)), float(sum(map(ord, t)) % 97), 1.0] for t in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+@pytest.fixture
+def make_rag(monkeypatch, tmp_path):
+    monkeypatch.setenv("INGEST_WORKERS", "0")
+    monkeypatch.setattr(rag_module, "SharedEmbeddings", FakeEmbeddings)
+    monkeypatch.setattr(rag_module, "default_device", lambda: "cpu")
+    corpus = {"records": []}
+
+    def read_dataset(self, max_texts=None, sample_random=False, stream=False, with_metadata=False):
+        records = corpus["records"][:max_texts] if max_texts is not None else corpus["records"]
+        return iter([(text, {"source": "test"}) for text in records])
+
+    monkeypatch.setattr(RAG, "read_dataset", read_dataset)
+
+    def make(records):
+        corpus["records"] = records
+        return RAG(db_path=str(tmp_path), dataset_type="squad")
+    return make, corpus
+
+
+def indexed_ids(rag):
+    return set(rag.db.get(include=[])["ids"])
+
+
+def test_full_reads_prune_removed_chunks(make_rag):
+    make, corpus = make_rag
+    rag = make([f"Pregunta {i}: respuesta {i}" for i in range(6)])
+    first = rag.create_chroma_db(chunk_size=200)
+    assert (first["added"], first["deleted"]) == (6, 0)
+
+    corpus["records"] = corpus["records"][2:] + ["Pregunta nueva"]
+    second = rag.create_chroma_db(chunk_size=200)
+    assert (second["added"], second["deleted"], second["unchanged"]) == (1, 2, 4)
+    assert len(indexed_ids(rag)) == 5
+    assert rag._get_lexical().ids() == indexed_ids(rag)
+    assert rag._read_manifest()["partial"] is False
+
+
+@pytest.mark.parametrize("limit", [{"sample_size": 2}, {"max_chunks": 2}, {"sample_random": True}])
+def test_partial_reads_never_prune(make_rag, limit):
+    make, corpus = make_rag
+    rag = make([f"Pregunta {i}: respuesta {i}" for i in range(6)])
+    rag.create_chroma_db(chunk_size=200)
+    before = indexed_ids(rag)
+
+    corpus["records"] = ["Pregunta nueva"] + corpus["records"]
+    result = rag.create_chroma_db(chunk_size=200, **limit)
+
+    assert result["deleted"] == 0
+    assert before <= indexed_ids(rag)
+    # El índice BM25 sigue reflejando exactamente lo que hay en Chroma
+    assert rag._get_lexical().ids() == indexed_ids(rag)
+    manifest = rag._read_manifest()
+    assert manifest["partial"] is True and manifest["chunks"] == len(indexed_ids(rag))
+
+
+def test_hybrid_search_fuses_both_rankings(make_rag, monkeypatch):
+    make, _ = make_rag
+    rag = make([
+        "A martingale has constant expectation",
+        "Markov chains forget their past",
+        "Brownian motion is a martingale and a Markov process",
+    ])
+    rag.create_chroma_db(chunk_size=200)
+
+    lexical = rag.hybrid_search("martingale Markov", k=3, mode="lexical")
+    assert lexical[0].page_content.startswith("Brownian") and "bm25" in lexical[0].metadata
+
+    # Chroma devuelve sus metadatos, sin los que añade el índice BM25
+    def as_dense(doc):
+        return rag_module.Document(page_content=doc.page_content, metadata={
+            key: v for key, v in doc.metadata.items() if key not in ("id", "bm25")
+        })
+
+    # El mejor de BM25 no aparece en la búsqueda vectorial: la fusión premia los que están en ambas
+    dense = [as_dense(lexical[2]), as_dense(lexical[1])]
+    monkeypatch.setattr(RAG, "search", lambda self, query, k=5, filters=None, verbose=None: dense[:k])
+    fused = rag.hybrid_search("martingale Markov", k=3)
+    assert [d.page_content for d in fused] == [lexical[i].page_content for i in (2, 1, 0)]
+    assert all("bm25" not in d.metadata and d.metadata["rrf_score"] > 0 for d in fused)
+    assert len({d.metadata["id"] for d in fused}) == len(fused)
+
+    with pytest.raises(ValueError):
+        rag.hybrid_search("martingale", mode="sparse")
@@ -0,0 +1,57 @@
+import asyncio
+
+from project.metrics.evaluation_executor import EvaluationExecutor
+from project.session_store import MemorySessionStore
+
+run = asyncio.run
+
+
+class RecordingExecutor(EvaluationExecutor):
+    def __init__(self):
+        super().__init__(workers=0)
+        self.references = []
+
+    async def reference_features(self, correct_answer):
+        return {"numbers": [0.5], "concepts": ["esperanza"], "math_expr": correct_answer}
+
+    async def evaluate_full(self, correct_answer, user_answer, reference=None):
+        self.references.append(reference)
+        return {"final_score": 1.0}
+
+
+def test_features_are_attached_to_the_served_question(app_module, monkeypatch):
+    store = MemorySessionStore()
+    monkeypatch.setattr(app_module, "session_store", store)
+    monkeypatch.setattr(app_module, "evaluation_executor", RecordingExecutor())
+
+    async def main():
+        await store.create("s1", {"current_question": 0})
+        await store.set_question("s1", 1, {"question": "¿E[X]?", "correct_answer": "1/2"})
+        await store.set_question("s1", 2, {"question": "¿Var?", "correct_answer": "1/4"})
+        await app_module.attach_reference_features("s1", 1, "1/2")
+        # La pregunta 2 se regeneró mientras se calculaban: no se adjuntan features viejos
+        await store.set_question("s1", 2, {"question": "¿Var(Y)?", "correct_answer": "2"})
+        await app_module.attach_reference_features("s1", 2, "1/4")
+        return await store.get_question("s1", 1), await store.get_question("s1", 2)
+
+    first, second = run(main())
+    assert first["reference_features"]["math_expr"] == "1/2"
+    assert "reference_features" not in second
+
+
+def test_background_evaluation_uses_reference_and_saves_metrics(app_module, monkeypatch):
+    store = MemorySessionStore()
+    executor = RecordingExecutor()
+    monkeypatch.setattr(app_module, "session_store", store)
+    monkeypatch.setattr(app_module, "evaluation_executor", executor)
+    reference = {"numbers": [0.5]}
+
+    async def main():
+        await store.create("s1", {"current_question": 0})
+        await store.record_answer("s1", 0, {"question_number": 1, "answer": "0.5"}, {})
+        await app_module.process_evaluation_task("s1", 1, "0.5", "1/2", reference)
+        return await store.get_answer("s1", 1)
+
+    answer = run(main())
+    assert executor.references == [reference]
+    assert answer["metrics"] == {"final_score": 1.0}
@@ -0,0 +1,345 @@
+import time
+import asyncio
+import threading
+
+import pytest
+from redis.crc import key_slot
+
+from project.session_store import (
+    MemorySessionStore, RedisSessionStore, SQLiteSessionStore, create_session_store,
+)
+
+fakeredis = pytest.importorskip("fakeredis")
+pytest.importorskip("lupa")  # scripts Lua en fakeredis
+
+BACKENDS = ["redis", "sqlite", "memory"]
+
+
+@pytest.fixture(params=BACKENDS)
+def run_with_store(request, tmp_path):
+    """Ejecuta `fn(store)` en un event loop nuevo con el backend del parámetro."""
+
+    def run(fn, ttl=3600):
+        async def main():
+            if request.param == "redis":
+                store = RedisSessionStore(fakeredis.FakeAsyncRedis(decode_responses=True), ttl=ttl)
+            elif request.param == "sqlite":
+                store = SQLiteSessionStore(str(tmp_path / "sessions.sqlite"), ttl=ttl)
+            else:
+                store = MemorySessionStore(ttl=ttl)
+            return await fn(store)
+        return asyncio.run(main())
+
+    return run
+
+
+def answer(n, text="x"):
+    return {"question_number": n, "answer": text, "correct_answer": "1/2"}
+
+
+def test_concurrent_record_answer_accepts_exactly_one(run_with_store):
+    async def main(store):
+        await store.create("s1", {"current_question": 0, "total_questions": 3, "streak_correctas": 0})
+        results = await asyncio.gather(*(
+            store.record_answer("s1", 0, answer(1, f"intento {i}"), {"streak_correctas": i})
+            for i in range(5)
+        ))
+        return results, await store.get("s1"), await store.get_answers("s1")
+
+    results, session, answers = run_with_store(main)
+    assert sorted(results) == [False] * 4 + [True]
+    assert session["current_question"] == 1
+    assert len(answers) == 1
+    # La respuesta y la actualización de la sesión son las de la misma petición
+    assert answers[0]["answer"] == f"intento {session['streak_correctas']}"
+
+
+def test_record_answer_requires_expected_question(run_with_store):
+    async def main(store):
+        await store.create("s1", {"current_question": 1})
+        stale = await store.record_answer("s1", 0, answer(1), {})
+        missing = await store.record_answer("nope", 0, answer(1), {})
+        return stale, missing, await store.get_answers("s1")
+
+    assert run_with_store(main) == (False, False, [])
+
+
+def test_set_answer_field_only_if_missing_first_wins(run_with_store):
+    async def main(store):
+        await store.create("s1", {"current_question": 0})
+        await store.record_answer("s1", 0, answer(1), {})
+        written = await asyncio.gather(*(
+            store.set_answer_field("s1", 1, "explanation", f"exp {i}", only_if_missing=True) for i in range(5)
+        ))
+        overwritten = await store.set_answer_field("s1", 1, "metrics", {"final_score": 0.5})
+        on_missing = await store.set_answer_field("s1", 2, "metrics", {"final_score": 1.0})
+        return written, overwritten, on_missing, await store.get_answer("s1", 1)
+
+    written, overwritten, on_missing, stored = run_with_store(main)
+    assert sorted(written) == [False] * 4 + [True]
+    assert stored["explanation"].startswith("exp ")
+    assert overwritten and not on_missing
+    assert stored["metrics"] == {"final_score": 0.5} and stored["feedback"] is None
+
+
+def test_updates_touch_only_their_fields(run_with_store):
+    async def main(store):
+        await store.create("s1", {"current_question": 0, "current_difficulty": "Facil", "dataset": "squad"})
+        await asyncio.gather(
+            store.update("s1", {"current_difficulty": "Medio"}),
+            store.set_question("s1", 1, {"question": "q", "correct_answer": "1/2"}, served_id="id1"),
+            store.set_question("s1", 2, {"question": "q2", "correct_answer": "3"}, served_id="id2"),
+        )
+        stale = await store.set_reference_features("s1", 1, "otra", {"numbers": [1]})
+        fresh = await store.set_reference_features("s1", 1, "1/2", {"numbers": [0.5]})
+        return stale, fresh, await store.get_with_question("s1", 1)
+
+    stale, fresh, (session, question) = run_with_store(main)
+    assert (stale, fresh) == (False, True)
+    assert session["current_difficulty"] == "Medio" and session["dataset"] == "squad"
+    assert sorted(session["served_questions"]) == ["id1", "id2"]
+    assert question["reference_features"] == {"numbers": [0.5]}
+
+
+def test_replacing_a_question_drops_its_features(run_with_store):
+    async def main(store):
+        await store.create("s1", {"current_question": 0})
+        await store.set_question("s1", 1, {"question": "q", "correct_answer": "1/2"})
+        await store.set_reference_features("s1", 1, "1/2", {"numbers": [0.5]})
+        await store.set_question("s1", 1, {"question": "q'", "correct_answer": "2"})
+        return await store.get_question("s1", 1)
+
+    assert "reference_features" not in run_with_store(main)
+
+
+def test_redis_layout_and_sliding_ttl():
+    keys = ("session:{s1}", "qmap:{s1}", "answers:{s1}")
+
+    async def main():
+        redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+        store = RedisSessionStore(redis, ttl=100)
+        await store.create("s1", {"current_question": 0, "dataset": "squad"})
+        await store.set_question("s1", 1, {"question": "q", "correct_answer": "1/2"})
+        await store.record_answer("s1", 0, answer(1), {"streak_correctas": 1})
+        # Un campo por clave: actualizar la sesión no reescribe el resto
+        fields = await redis.hgetall("session:{s1}")
+        answer_fields = await redis.hgetall("answers:{s1}")
+        for key in keys:
+            await redis.expire(key, 5)
+        await store.get("s1")
+        ttls = [await redis.ttl(k) for k in keys]
+        ids = await store.session_ids()
+        await store.delete("s1")
+        return fields, answer_fields, ttls, ids, await redis.keys("*")
+
+    fields, answer_fields, ttls, ids, left = asyncio.run(main())
+    assert fields == {"current_question": "1", "dataset": '"squad"', "streak_correctas": "1"}
+    # Los campos que aún son None (feedback, métricas...) no se guardan
+    assert set(answer_fields) == {"1:question_number", "1:answer", "1:correct_answer"}
+    assert all(ttl > 50 for ttl in ttls)
+    assert ids == ["s1"] and left == []
+    # Hash tag: todas las claves de la sesión van al mismo slot de Redis Cluster
+    assert len({key_slot(k.encode()) for k in keys}) == 1
+
+
+class InterleavingRedis:
+    """Cliente que ejecuta `hook` justo después del primer comando que recibe."""
+
+    def __init__(self, redis, hook):
+        self.redis = redis
+        self.hook = hook
+
+    def __getattr__(self, name):
+        attr = getattr(self.redis, name)
+        if not callable(attr):
+            return attr
+
+        async def call(*args, **kwargs):
+            result = await attr(*args, **kwargs)
+            hook, self.hook = self.hook, None
+            if hook:
+                await hook()
+            return result
+        return call
+
+
+def test_delete_leaves_no_orphans_when_an_answer_lands_midway():
+    async def main():
+        redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+        store = RedisSessionStore(redis)
+        await store.create("s1", {"current_question": 0})
+        await store.set_question("s1", 1, {"question": "q", "correct_answer": "1/2"})
+
+        async def answer_midway():
+            await store.record_answer("s1", 0, answer(1), {})
+
+        await RedisSessionStore(InterleavingRedis(redis, answer_midway)).delete("s1")
+        return await redis.keys("*")
+
+    assert asyncio.run(main()) == []
+
+
+class CountingRedis:
+    """Cliente que cuenta los round trips (comandos sueltos y pipelines ejecutados)."""
+
+    def __init__(self, redis):
+        self.redis = redis
+        self.round_trips = 0
+
+    def pipeline(self, transaction=True):
+        pipe = self.redis.pipeline(transaction=transaction)
+        execute = pipe.execute
+
+        async def counted_execute(*args, **kwargs):
+            self.round_trips += 1
+            return await execute(*args, **kwargs)
+
+        pipe.execute = counted_execute
+        return pipe
+
+    def __getattr__(self, name):
+        attr = getattr(self.redis, name)
+        if not callable(attr) or name == "scan_iter":
+            return attr
+
+        async def counted(*args, **kwargs):
+            self.round_trips += 1
+            return await attr(*args, **kwargs)
+        return counted
+
+
+def test_related_reads_and_writes_share_a_round_trip():
+    async def main():
+        redis = CountingRedis(fakeredis.FakeAsyncRedis(decode_responses=True))
+        store = RedisSessionStore(redis)
+        await store.create("s1", {"current_question": 0})
+        await store.set_question("s1", 1, {"question": "q", "correct_answer": "1/2"}, served_id="id1")
+        await store.record_answer("s1", 0, answer(1), {})
+        # El primer uso carga los scripts (SCRIPT LOAD): se cuenta a partir de aquí
+        redis.round_trips = 0
+        session, question = await store.get_with_question("s1", 1)
+        after_question = redis.round_trips
+        session, answers = await store.get_with_answers("s1")
+        after_answers = redis.round_trips
+        await store.record_answer("s1", 1, answer(2), {"streak_correctas": 1})
+        return after_question, after_answers, redis.round_trips, question, answers
+
+    after_question, after_answers, after_record, question, answers = asyncio.run(main())
+    assert (after_question, after_answers, after_record) == (1, 2, 3)
+    assert question["correct_answer"] == "1/2" and len(answers) == 1
+
+
+def test_answers_come_back_in_question_order(run_with_store):
+    async def main(store):
+        await store.create("s1", {"current_question": 0})
+        for n in range(12):
+            await store.record_answer("s1", n, answer(n + 1, f"r{n + 1}"), {})
+        await store.set_answer_field("s1", 10, "feedback", "bien")
+        return await store.get_with_answers("s1"), await store.get_answer("s1", 10)
+
+    (session, answers), tenth = run_with_store(main)
+    assert [a["question_number"] for a in answers] == list(range(1, 13))
+    assert answers[9] == tenth == {**answer(10, "r10"), "feedback": "bien", "explanation": None, "metrics": None}
+
+
+def test_scripts_are_reloaded_after_a_flush():
+    async def main():
+        redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+        store = RedisSessionStore(redis)
+        await store.create("s1", {"current_question": 0})
+        assert await store.record_answer("s1", 0, answer(1), {})
+        await redis.script_flush()
+        assert await store.record_answer("s1", 1, answer(2), {})
+        return await store.get("s1")
+
+    assert asyncio.run(main())["current_question"] == 2
+
+
+def test_sqlite_workers_sharing_a_file_accept_exactly_one(tmp_path):
+    path = str(tmp_path / "sessions.sqlite")
+    asyncio.run(SQLiteSessionStore(path).create("s1", {"current_question": 0}))
+    # Un almacén (conexión) por "worker", cada uno en su hilo y su event loop
+    workers = [SQLiteSessionStore(path) for _ in range(5)]
+    barrier = threading.Barrier(len(workers))
+    results = []
+
+    def submit(store, i):
+        barrier.wait()
+        results.append(asyncio.run(store.record_answer("s1", 0, answer(1, f"w{i}"), {"worker": i})))
+
+    threads = [threading.Thread(target=submit, args=(store, i)) for i, store in enumerate(workers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    session, answers = asyncio.run(SQLiteSessionStore(path).get_with_answers("s1"))
+    assert sorted(results) == [False] * 4 + [True]
+    assert session["current_question"] == 1
+    assert [a["answer"] for a in answers] == [f"w{session['worker']}"]
+
+
+def test_sqlite_expired_sessions_are_hidden_and_purged(tmp_path):
+    store = SQLiteSessionStore(str(tmp_path / "sessions.sqlite"), ttl=3600)
+
+    async def main():
+        await store.create("old", {"current_question": 0})
+        await store.record_answer("old", 0, answer(1), {})
+        store.conn.execute("UPDATE sessions SET expires_at = 0 WHERE session_id = 'old'")
+        hidden = await store.get("old"), await store.session_ids()
+        store._last_eviction = 0
+        await store.create("new", {"current_question": 0})
+        return hidden
+
+    assert asyncio.run(main()) == (None, [])
+    assert [r[0] for r in store.conn.execute("SELECT session_id FROM sessions")] == ["new"]
+    # Las respuestas se borran en cascada con la sesión
+    assert store.conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0] == 0
+
+
+def test_sqlite_expired_rows_are_neither_served_nor_written(tmp_path):
+    store = SQLiteSessionStore(str(tmp_path / "sessions.sqlite"))
+
+    async def main():
+        await store.create("old", {"current_question": 0})
+        await store.set_question("old", 1, {"question": "q", "correct_answer": "1/2"})
+        await store.record_answer("old", 0, answer(1), {})
+        store.conn.execute("UPDATE sessions SET expires_at = 0 WHERE session_id = 'old'")
+        # Caducada pero aún sin purgar
+        store._last_eviction = time.time()
+        return (
+            await store.get_question("old", 1),
+            await store.get_answer("old", 1),
+            await store.get_answers("old"),
+            await store.set_reference_features("old", 1, "1/2", {"numbers": [0.5]}),
+            await store.set_answer_field("old", 1, "feedback", "tarde"),
+        )
+
+    assert asyncio.run(main()) == (None, None, [], False, False)
+    assert store.conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0] == 1
+
+
+def test_sqlite_readers_purge_expired_sessions(tmp_path):
+    path = str(tmp_path / "sessions.sqlite")
+    writer = SQLiteSessionStore(path)
+    asyncio.run(writer.create("old", {"current_question": 0}))
+    writer.conn.execute("UPDATE sessions SET expires_at = 0")
+
+    # Un worker que nunca crea sesiones también purga al leer
+    reader = SQLiteSessionStore(path)
+    assert asyncio.run(reader.get_answers("old")) == []
+    assert reader.conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0] == 0
+
+
+def test_create_session_store_picks_the_backend(monkeypatch, tmp_path):
+    monkeypatch.setenv("SESSION_DB_PATH", str(tmp_path / "sessions.sqlite"))
+    client = fakeredis.FakeAsyncRedis(decode_responses=True)
+    monkeypatch.delenv("SESSION_BACKEND", raising=False)
+    assert isinstance(create_session_store(client), RedisSessionStore)
+    assert isinstance(create_session_store(None), SQLiteSessionStore)
+    monkeypatch.setenv("SESSION_BACKEND", "redis")
+    assert isinstance(create_session_store(None), SQLiteSessionStore)
+    monkeypatch.setenv("SESSION_BACKEND", "sqlite")
+    assert isinstance(create_session_store(client), SQLiteSessionStore)
+    monkeypatch.setenv("SESSION_BACKEND", "memory")
+    assert isinstance(create_session_store(None), MemorySessionStore)
@@ -0,0 +1,81 @@
+import asyncio
+
+from project.startup import StartupReport
+
+run = asyncio.run
+
+
+async def ok():
+    pass
+
+
+async def boom():
+    raise RuntimeError("sin conexión")
+
+
+def test_optional_phases_are_recorded_but_do_not_block_readiness():
+    report = StartupReport()
+    report.expect("evaluator")
+    assert not report.ready
+
+    async def main():
+        await asyncio.gather(
+            report.run("evaluator", ok),
+            report.run("llm", boom, required=False),
+            report.run("theory_index", ok, required=False),
+        )
+
+    run(main())
+    phases = report.summary()["phases"]
+    assert report.ready
+    assert phases["llm"]["status"] == "failed" and phases["llm"]["error"] == "sin conexión"
+    assert phases["llm"]["required"] is False
+    assert phases["theory_index"]["status"] == "ready" and phases["theory_index"]["seconds"] is not None
+
+
+def test_optional_phase_is_visible_while_running():
+    report = StartupReport()
+    started = asyncio.Event()
+
+    async def main():
+        async def slow():
+            started.set()
+            await asyncio.sleep(0.05)
+
+        task = asyncio.create_task(report.run("llm", slow, required=False))
+        await asyncio.wait_for(started.wait(), 1)
+        running = dict(report.phases["llm"])
+        await task
+        return running
+
+    assert run(main()) == {"status": "running", "required": False, "seconds": None}
+    assert report.phases["llm"]["status"] == "ready"
+
+
+def test_failed_required_phase_keeps_the_app_unready():
+    report = StartupReport()
+    run(report.run("generators", boom))
+    assert not report.ready
+    assert report.phases["generators"] == {
+        "status": "failed", "required": True, "seconds": report.phases["generators"]["seconds"],
+        "error": "sin conexión",
+    }
+
+
+def test_readyz_follows_the_warm_up(app_module, client, monkeypatch):
+    report = StartupReport()
+    report.expect("evaluator", "generators")
+    monkeypatch.setattr(app_module, "startup", report)
+    monkeypatch.setattr(app_module.evaluation_executor, "start", ok)
+    monkeypatch.setattr(app_module.generators, "get", lambda dataset: ok())
+    monkeypatch.setattr(app_module.feedback_service, "warm_up", boom)
+    monkeypatch.setattr(app_module.theory_service, "warm_up", ok)
+
+    assert client.get("/healthz").status_code == 200
+    assert client.get("/readyz").status_code == 503
+
+    run(app_module.warm_up_models())
+
+    response = client.get("/readyz")
+    assert response.status_code == 200
+    assert response.json()["phases"]["llm"]["status"] == "failed"
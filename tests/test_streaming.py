@@ -0,0 +1,69 @@
+import json
+import asyncio
+
+run = asyncio.run
+
+
+def sse_events(response):
+    events = []
+    for block in response.text.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+async def chunks(*parts, error=None):
+    for part in parts:
+        yield part
+    if error:
+        raise error
+
+
+async def answered_session(store, sid="s1"):
+    await store.create(sid, {"current_question": 0, "total_questions": 3})
+    await store.record_answer(sid, 0, {"question_number": 1, "answer": "x"}, {})
+
+
+def test_feedback_stream_sends_deltas_then_done_and_persists(app_module, client, monkeypatch):
+    store = app_module.session_store
+    run(answered_session(store))
+    monkeypatch.setattr(
+        app_module.feedback_service, "stream_feedback", lambda **kwargs: chunks("Bien ", "planteado.")
+    )
+
+    response = client.post("/api/feedback/stream", json={"session_id": "s1", "question_number": 1})
+
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert sse_events(response) == [
+        ("delta", {"text": "Bien "}),
+        ("delta", {"text": "planteado."}),
+        ("done", {"feedback": "Bien planteado."}),
+    ]
+    assert run(store.get_answer("s1", 1))["feedback"] == "Bien planteado."
+
+
+def test_explanation_stream_reuses_stored_explanation(app_module, client, monkeypatch):
+    store = app_module.session_store
+    run(answered_session(store))
+    run(store.set_answer_field("s1", 1, "explanation", "Ya guardada"))
+
+    def must_not_call(*args):
+        raise AssertionError("no debe llamar al LLM")
+
+    monkeypatch.setattr(app_module.explanation_service, "stream_explanation", must_not_call)
+    response = client.post("/api/explanation/stream", json={"session_id": "s1", "question_number": 1})
+    assert sse_events(response) == [("delta", {"text": "Ya guardada"}), ("done", {"explanation": "Ya guardada"})]
+
+
+def test_stream_error_is_reported_and_nothing_is_saved(app_module, client, monkeypatch):
+    store = app_module.session_store
+    run(answered_session(store))
+    monkeypatch.setattr(
+        app_module.feedback_service, "stream_feedback",
+        lambda **kwargs: chunks("medio", error=RuntimeError("proveedor caído")),
+    )
+
+    response = client.post("/api/feedback/stream", json={"session_id": "s1", "question_number": 1})
+
+    assert [event for event, _ in sse_events(response)] == ["delta", "error"]
+    assert run(store.get_answer("s1", 1))["feedback"] is None
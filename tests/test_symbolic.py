@@ -0,0 +1,64 @@
+import time
+import threading
+
+import pytest
+
+from project.metrics import symbolic
+from project.metrics.symbolic import equivalent, parse
+
+
+@pytest.mark.parametrize("a, b", [
+    ("1/2", "0.5"),
+    ("(x+1)^2", "x^2+2*x+1"),
+    ("x/(x-1)", "1+1/(x-1)"),
+    ("sqrt(2)^2", "2"),
+    ("10^400", "10^400"),
+    ("2*10^400", "10^400+10^400"),
+])
+def test_equivalent_expressions(a, b):
+    assert equivalent(a, b) is True
+
+
+@pytest.mark.parametrize("a, b", [
+    ("1/3", "0.333"),
+    ("x^2", "x^3"),
+    # Desbordarían a inf como float/complex y parecerían iguales a cualquier cosa
+    ("10^400", "7"),
+    ("10^999", "5"),
+    ("exp(1000)", "2"),
+    ("factorial(100000)", "1"),
+])
+def test_different_expressions(a, b):
+    assert equivalent(a, b) is False
+
+
+@pytest.mark.parametrize("a, b", [("1/0", "5"), ("1/0", "1/0"), ("oo", "oo")])
+def test_non_finite_values_are_undecided(a, b):
+    assert equivalent(a, b) is None
+
+
+def test_oversized_expressions_are_rejected():
+    assert parse("9^9^9") is None
+    assert parse("+".join(["x"] * 150)) is None
+    assert equivalent("9^9^9", "1") is None
+
+
+def test_budget_bounds_slow_comparisons(monkeypatch):
+    def slow(a, b):
+        time.sleep(2)
+        return True
+
+    monkeypatch.setattr(symbolic, "_numeric_equivalent", slow)
+    start = time.perf_counter()
+    assert equivalent("x", "y", budget=0.1) is None
+    assert time.perf_counter() - start < 1
+
+
+def test_without_timer_simplify_is_not_used(monkeypatch):
+    monkeypatch.setattr(symbolic, "simplify", lambda expr: pytest.fail("simplify sin temporizador"))
+    monkeypatch.setattr(symbolic, "_numeric_equivalent", lambda a, b: None)
+    results = []
+    thread = threading.Thread(target=lambda: results.append(equivalent("x", "x + 0")))
+    thread.start()
+    thread.join()
+    assert results == [None]
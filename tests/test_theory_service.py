@@ -0,0 +1,111 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from project.rag import theory_service
+from project.rag.ingestion import chunk_id
+from project.rag.theory_service import TheoryService
+
+run = asyncio.run
+
+
+class FakeLLM:
+    provider = "GROQ"
+    settings = SimpleNamespace(model="llama")
+
+    def __init__(self):
+        self.calls = []
+
+    async def complete(self, prompt, **kwargs):
+        self.calls.append((prompt, kwargs))
+        return "teoría"
+
+    async def stream(self, prompt, **kwargs):
+        self.calls.append((prompt, kwargs))
+        for delta in ("teo", "ría"):
+            yield delta
+
+
+class FakeRAG:
+    def __init__(self, passages):
+        self.passages = passages
+        self.searches = []
+
+    def hybrid_search(self, query, k=5, mode="hybrid"):
+        self.searches.append((query, k, mode))
+        return self.passages[:k]
+
+
+def passage(text, page, **meta):
+    return SimpleNamespace(page_content=text, metadata={"book": "Shreve", "section": "Martingales", "page": page, **meta})
+
+
+@pytest.fixture
+def service(monkeypatch):
+    monkeypatch.setenv("THEORY_TOP_K", "2")
+    monkeypatch.setenv("THEORY_SEARCH_MODE", "lexical")
+    monkeypatch.setattr(theory_service, "get_llm", FakeLLM)
+    return TheoryService()
+
+
+def test_only_the_top_passages_are_sent_with_page_references(service):
+    service.rag = FakeRAG([
+        passage("Una martingala cumple E[X_{n+1} | F_n] = X_n", 12, id="c1"),
+        passage("Teorema de parada opcional", 15),
+        passage("Nunca se envía", 99),
+    ])
+
+    assert run(service.get_theory_explanation("¿Qué es una martingala?")) == "teoría"
+
+    assert service.rag.searches == [("¿Qué es una martingala?", 2, "lexical")]
+    prompt, kwargs = service.llm.calls[0]
+    assert "[1] (Shreve, Martingales, p. 12)\nUna martingala" in prompt
+    assert "[2] (Shreve, Martingales, p. 15)" in prompt and "Nunca se envía" not in prompt
+    # Funciona con cualquier proveedor: solo texto, sin ficheros adjuntos
+    assert kwargs == {
+        "model": "llama", "prompt_type": "theory", "prompt_version": 2,
+        "cache_inputs": {
+            "question": "¿Qué es una martingala?",
+            "passages": ["c1", chunk_id("Teorema de parada opcional")],
+        },
+    }
+
+
+def test_stream_sends_the_same_request(service):
+    service.rag = FakeRAG([passage("Movimiento browniano", 3)])
+
+    async def collect():
+        return [d async for d in service.stream_theory_explanation("browniano")]
+
+    assert run(collect()) == ["teo", "ría"]
+    prompt, kwargs = service.llm.calls[0]
+    assert prompt == service._build_prompt("browniano", service.rag.passages)
+    assert kwargs["prompt_type"] == "theory"
+
+
+def test_missing_index_is_reported_and_retried(service, monkeypatch):
+    opened = []
+
+    def open_index():
+        opened.append(1)
+        if len(opened) == 1:
+            raise FileNotFoundError("índice de teoría vacío")
+        return FakeRAG([])
+
+    monkeypatch.setattr(service, "_open_index", open_index)
+
+    first = run(service.get_theory_explanation("x"))
+    assert first == "No hay libros de teoría indexados o no se pudieron cargar: índice de teoría vacío."
+    # Tras indexar, la siguiente consulta vuelve a abrir el índice
+    assert run(service.get_theory_explanation("x")) == "No se encontraron pasajes relevantes en los libros de teoría."
+    assert len(opened) == 2 and service.llm.calls == []
+
+
+def test_llm_errors_return_a_message(service):
+    async def failing(prompt, **kwargs):
+        raise RuntimeError("503")
+
+    service.rag = FakeRAG([passage("Itô", 7)])
+    service.llm.complete = failing
+    assert run(service.get_theory_explanation("Itô")) == "Error consultando biblioteca."